@@ -13,6 +13,14 @@ DATABASE_USER = "ytdevice"
 DATABASE_PASSWORD = "ytdevicepwd"
 # 数据库名
 DATABASE_NAME = "ytdevicemgr"
+# 只读副本, 每项只需填写与主库不同的配置, 如 [{"HOST": "192.168.1.2"}]; 不配置则全部读写主库
+# 本地 SQLite 测试: 复制一份 db.sqlite3 作为副本, 配置 [{"NAME": "/path/to/backend/db_replica.sqlite3"}]
+DATABASE_REPLICAS = []
+# 持久连接秒数(CONN_MAX_AGE), 请求间复用连接; 0 表示每个请求结束后断开, None 表示不限时
+DATABASE_CONN_MAX_AGE = 60
+# PostgreSQL 连接池, ASGI 部署时使用(请求在不同线程执行, 持久连接无法复用), 不配置则不启用
+# 例: {"MIN_SIZE": 2, "MAX_SIZE": 20, "TIMEOUT": 10, "MAX_IDLE": 300}
+DATABASE_POOL = {}
 
 # ================================================= #
 # ************** redis配置，无redis 可不进行配置  ************** #
@@ -9,7 +9,6 @@ from typing import List
 
 from demo.models import Demo
 from ninja import Field, ModelSchema, Query, Router
-from ninja.pagination import paginate
 from utils.fu_crud import (
     ImportSchema,
     create,
@@ -19,7 +18,7 @@ from utils.fu_crud import (
     retrieve,
     update,
 )
-from utils.fu_ninja import FuFilters, MyPagination
+from utils.fu_ninja import FuFilters, paginate_values
 
 router = Router()
 
@@ -74,7 +73,7 @@ def update_demo(request, demo_id: int, data: DemoSchemaIn):
 
 # 获取Demo
 @router.get("/demo", response=List[DemoSchemaOut])
-@paginate(MyPagination)
+@paginate_values()
 def list_demo(request, filters: Filters = Query(...)):
     qs = retrieve(request, Demo, filters)
     return qs
@@ -46,12 +46,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'utils.rate_limit.RateLimitMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'utils.db_router.ReplicaRoutingMiddleware',
     'utils.middleware.ApiLoggingMiddleware',
 
 ]
@@ -135,6 +137,9 @@ if DATABASE_TYPE == "MYSQL":
             "USER": DATABASE_USER,
             "PASSWORD": DATABASE_PASSWORD,
             "NAME": DATABASE_NAME,
+            # 持久连接, 复用前检查连接是否可用
+            "CONN_MAX_AGE": DATABASE_CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": True,
         }
     }
 elif DATABASE_TYPE == "SQLSERVER":
@@ -147,8 +152,9 @@ elif DATABASE_TYPE == "SQLSERVER":
             "USER": DATABASE_USER,
             "PASSWORD": DATABASE_PASSWORD,
             "NAME": DATABASE_NAME,
-            # 全局开启事务，绑定的是http请求响应整个过程
-            'ATOMIC_REQUESTS': True,
+            # 持久连接, 复用前检查连接是否可用
+            "CONN_MAX_AGE": DATABASE_CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": True,
             'OPTIONS': {
                 'driver': 'ODBC Driver 17 for SQL Server',
             },
@@ -164,10 +170,14 @@ elif DATABASE_TYPE == "POSTGRESQL":
             "USER": DATABASE_USER,
             "PASSWORD": DATABASE_PASSWORD,
             "NAME": DATABASE_NAME,
-            # 全局开启事务，绑定的是http请求响应整个过程
-            'ATOMIC_REQUESTS': True,
+            # 持久连接, 复用前检查连接是否可用
+            "CONN_MAX_AGE": DATABASE_CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": True,
         }
     }
+    if DATABASE_POOL:
+        # 使用连接池时请求结束即归还连接, 由连接池负责复用
+        DATABASES['default'].update(ENGINE='utils.db_pool', POOL=DATABASE_POOL, CONN_MAX_AGE=0)
 else:
     # sqlite3 数据库
     DATABASES = {
@@ -180,6 +190,22 @@ else:
         }
     }
 
+# 只读副本: 与主库配置合并, 依次命名为 replica_1、replica_2 ..., 由 utils.db_router 路由
+for index, replica in enumerate(DATABASE_REPLICAS, start=1):
+    DATABASES[f'replica_{index}'] = {**DATABASES['default'], **replica, 'TEST': {'MIRROR': 'default'}}
+DATABASE_ROUTERS = ['utils.db_router.ReplicaRouter']
+# 接口事务策略(代替 ATOMIC_REQUESTS), 按请求方法配置默认值, 未配置的方法为 atomic
+# none: 不开启事务; read_only: 不开启事务且拒绝写操作; atomic: 接口函数在事务中执行
+# 单个接口/路由可通过 utils.fu_ninja.transaction_policy 装饰器、FuRouter(transaction_policy=...) 覆盖
+# 读接口默认 none: 部分 GET 接口会写库(登录日志、会话、get_or_create 等), read_only 需在确认不写库的接口上逐个声明
+TRANSACTION_POLICY = {
+    'GET': 'none',
+    'HEAD': 'none',
+    'OPTIONS': 'none',
+}
+# 写请求后该用户继续读主库的秒数(读自己的写), 应大于副本同步延迟
+DATABASE_REPLICA_STICKY_SECONDS = 10
+
 # 缓存配置
 CACHES = {
     "default": {
@@ -291,15 +317,62 @@ CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'  # Bac
 # token 有效时间 时 分 秒
 TOKEN_LIFETIME = 12 * 60 * 60
 # TOKEN_LIFETIME = 50
+# 已验签 token 进程内缓存条数
+TOKEN_CACHE_SIZE = 10000
+# 注销 token 本地布隆过滤器容量
+TOKEN_REVOCATION_CAPACITY = 100000
+# 权限版本号进程内缓存秒数, 其它节点的权限变更最迟在该时间后生效
+PERMISSION_VERSION_LOCAL_TTL = 5
+
+# GET 接口响应缓存(@cache_response): 缓存秒数、进程内 LRU 条数、模型版本号进程内缓存秒数
+RESPONSE_CACHE_TIMEOUT = 300
+RESPONSE_CACHE_LOCAL_SIZE = 1000
+RESPONSE_CACHE_VERSION_LOCAL_TTL = 1
+# 维护版本号的模型: @cache_response 接口(含响应 schema 中的关联模型)、字典与菜单权限树缓存依赖的模型
+RESPONSE_CACHE_MODELS = [
+    'system.Users', 'system.Dept', 'system.Post', 'system.Dict', 'system.DictItem', 'system.CategoryDict',
+    'system.Menu', 'system.MenuButton', 'system.MenuColumnField',
+]
+
+# 新建用户的默认密码; 批量创建用户等场景下计算密码哈希的线程数
+USER_DEFAULT_PASSWORD = '123456'
+PASSWORD_HASH_WORKERS = 4
+# 密码哈希算法: 首位用于新密码, 其余用于校验旧密码; PBKDF2 迭代次数变化后用户登录时自动重新哈希
+PASSWORD_HASH_ITERATIONS = 320000
+PASSWORD_HASHERS = [
+    'utils.password.FuPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+# 接口限流(令牌桶), 路由写法同 WHITE_LIST, * 匹配任意一段, 按顺序匹配第一条
+# ip/user: 每个 IP/每个登录用户的 (桶容量, 每秒补充的令牌数); 开启 REDIS_SYNC 时多个节点共享令牌桶
+RATE_LIMIT_ENABLE = True
+RATE_LIMIT_REDIS_SYNC = False
+RATE_LIMIT_LOCAL_SIZE = 100000
+RATE_LIMIT_RULES = {
+    '/api/system/login': {'ip': (10, 10 / 60)},
+    '/api/system/*/all/export': {'ip': (10, 10 / 60), 'user': (5, 5 / 60)},
+    '/api/system/*/all/import': {'ip': (10, 10 / 60), 'user': (5, 5 / 60)},
+    '/api/system/user/batch/create': {'ip': (10, 10 / 60), 'user': (5, 5 / 60)},
+    '/api/system/generator_template/code/*/*': {'ip': (10, 10 / 60), 'user': (5, 5 / 60)},
+}
 
 # 接口白名单，不需要授权直接访问
 WHITE_LIST = ['/api/system/userinfo', '/api/system/permCode', '/api/system/menu/route/tree', '/api/system/user/*',
-              '/api/system/user/set/repassword']
+              '/api/system/user/set/repassword', '/api/system/dict_item/by/codes']
 
 # 接口日志记录
 API_LOG_ENABLE = True
-API_LOG_METHODS = ['POST', 'GET', 'DELETE', 'PUT']
+API_LOG_METHODS = ['POST', 'GET', 'DELETE', 'PUT', 'PATCH']
 API_MODEL_MAP = {}
+# 日志采集策略: 跳过的请求内容类型(前缀匹配)、入库字节上限、脱敏字段、超过该字节数压缩存储
+API_LOG_SKIP_CONTENT_TYPES = ['multipart/form-data', 'application/octet-stream', 'image/', 'video/', 'audio/']
+API_LOG_MAX_BODY_SIZE = 4 * 1024
+API_LOG_REDACT_FIELDS = ['password', 'old_password', 'new_password', 'token']
+API_LOG_COMPRESS_THRESHOLD = 1024
 
 # 初始化需要执行的列表，用来初始化后执行
 INITIALIZE_RESET_LIST = []
@@ -1,7 +1,6 @@
 from typing import List
 from .model import TemplateTest
 from ninja import Field, ModelSchema, Query, Router
-from ninja.pagination import paginate
 from utils.fu_crud import (
     ImportSchema,
     create,
@@ -11,7 +10,7 @@ from utils.fu_crud import (
     retrieve,
     update,
 )
-from utils.fu_ninja import FuFilters, MyPagination
+from utils.fu_ninja import FuFilters, paginate_values
 
 router = Router()
 
@@ -62,7 +61,7 @@ def update_template_test(request, id: int, data: TemplateTestSchemaIn):
 
 # 获取TemplateTest
 @router.get('/template_test', response=List[TemplateTestSchemaOut])
-@paginate(MyPagination)
+@paginate_values()
 def list_template_test(request, filters: Filters = Query(...)):
     qs = retrieve(request, TemplateTest, filters)
     return qs
@@ -1,7 +1,6 @@
 from typing import List
 from .model import Test
 from ninja import Field, ModelSchema, Query, Router
-from ninja.pagination import paginate
 from utils.fu_crud import (
     ImportSchema,
     create,
@@ -11,7 +10,7 @@ from utils.fu_crud import (
     retrieve,
     update,
 )
-from utils.fu_ninja import FuFilters, MyPagination
+from utils.fu_ninja import FuFilters, paginate_values
 
 router = Router()
 
@@ -64,7 +63,7 @@ def update_test(request, id: int, data: TestSchemaIn):
 
 # 获取Test
 @router.get('/test', response=List[TestSchemaOut])
-@paginate(MyPagination)
+@paginate_values()
 def list_test(request, filters: Filters = Query(...)):
     qs = retrieve(request, Test, filters)
     return qs
@@ -1,7 +1,6 @@
 from typing import List
 from .model import TestDemo
 from ninja import Field, ModelSchema, Query, Router
-from ninja.pagination import paginate
 from utils.fu_crud import (
     ImportSchema,
     create,
@@ -11,7 +10,7 @@ from utils.fu_crud import (
     retrieve,
     update,
 )
-from utils.fu_ninja import FuFilters, MyPagination
+from utils.fu_ninja import FuFilters, paginate_values
 
 router = Router()
 
@@ -63,7 +62,7 @@ def update_test_demo(request, id: int, data: TestDemoSchemaIn):
 
 # 获取TestDemo
 @router.get('/test_demo', response=List[TestDemoSchemaOut])
-@paginate(MyPagination)
+@paginate_values()
 def list_test_demo(request, filters: Filters = Query(...)):
     qs = retrieve(request, TestDemo, filters)
     return qs
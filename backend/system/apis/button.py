@@ -10,9 +10,8 @@ from typing import List
 
 from django.shortcuts import get_object_or_404
 from ninja import Field, ModelSchema, Query, Router, Schema
-from ninja.pagination import paginate
 from system.models import Button
-from utils.fu_ninja import MyPagination
+from utils.fu_ninja import paginate_values
 
 router = Router()
 
@@ -50,7 +49,7 @@ def get_button(request, button_id: int):
 
 
 @router.get("/button", response=List[SchemaOut])
-@paginate(MyPagination)
+@paginate_values()
 def list_button(request, filters: Filters = Query(...)):
     qs = Button.objects.filter(**filters.dict(exclude_none=True))
     return qs
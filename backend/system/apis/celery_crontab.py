@@ -8,9 +8,8 @@ from typing import List
 from django.shortcuts import get_object_or_404
 from django_celery_beat.models import CrontabSchedule
 from ninja import ModelSchema, Router
-from ninja.pagination import paginate
 from utils.fu_crud import create, delete, retrieve, update
-from utils.fu_ninja import MyPagination
+from utils.fu_ninja import paginate_values
 
 router = Router()
 
@@ -49,7 +48,7 @@ def update_crontab_schedule(request, crontab_schedule_id: int, data: SchemaIn):
 
 
 @router.get("/crontab_schedule", response=List[SchemaOut])
-@paginate(MyPagination)
+@paginate_values()
 def list_crontab_schedule(request):
     qs = retrieve(request, CrontabSchedule)
     return qs
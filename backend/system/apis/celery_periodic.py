@@ -9,11 +9,10 @@ from django.forms import model_to_dict
 from django.shortcuts import get_object_or_404
 from django_celery_beat.models import CrontabSchedule, IntervalSchedule, PeriodicTask
 from ninja import ModelSchema, Router, Schema
-from ninja.pagination import paginate
 from pydantic import Field
 from system.apis import celery_crontab, celery_interval
 from utils.fu_crud import create, delete, retrieve, update
-from utils.fu_ninja import MyPagination
+from utils.fu_ninja import paginate_values
 from utils.fu_response import FuResponse
 
 router = Router()
@@ -59,9 +58,9 @@ def update_periodic_task(request, periodic_task_id: int, data: SchemaIn):
 
 
 @router.get("/periodic_task", response=List[SchemaOut])
-@paginate(MyPagination)
+@paginate_values()
 def list_periodic_task(request):
-    qs = retrieve(request, PeriodicTask)
+    qs = retrieve(request, PeriodicTask, schema=SchemaOut)
     return qs
 
 
@@ -73,7 +72,7 @@ def get_periodic_task(request, periodic_task_id: int):
 
 @router.get("/periodic_task/all/list", response=List[SchemaOut])
 def all_list_role(request):
-    qs = retrieve(request, PeriodicTask)
+    qs = retrieve(request, PeriodicTask, schema=SchemaOut)
     return qs
 
 
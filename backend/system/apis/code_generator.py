@@ -11,7 +11,6 @@ from typing import List
 from django.core import management
 from django.shortcuts import get_object_or_404
 from ninja import Field, ModelSchema, Query, Router
-from ninja.pagination import paginate
 
 from system.code_template.backend.api import generator_backend_api
 from system.code_template.backend.model import generator_backend_model
@@ -23,13 +22,17 @@ from system.code_template.web.index_template import generator_index
 from system.models import GeneratorTemplate, Menu, MenuButton, MenuColumnField
 from utils.fu_crud import (
     ImportSchema,
+    add_batch_routes,
+    add_partial_update_route,
+    batch_create,
     create,
     delete,
     export_data,
     import_data,
     retrieve,
-    update, batch_create, )
-from utils.fu_ninja import FuFilters, MyPagination
+    update,
+)
+from utils.fu_ninja import FuFilters, paginate_values
 from utils.fu_response import FuResponse
 from utils.usual import insert_content_after_line
 
@@ -72,8 +75,14 @@ def update_generator_template(request, generator_template_id: int, data: Generat
     return generator_template
 
 
+add_batch_routes(router, "/generator_template", GeneratorTemplate, GeneratorTemplateSchemaIn)
+
+
+add_partial_update_route(router, "/generator_template/{generator_template_id}", GeneratorTemplate, GeneratorTemplateSchemaIn)
+
+
 @router.get("/generator_template", response=List[GeneratorTemplateSchemaOut])
-@paginate(MyPagination)
+@paginate_values()
 def list_generator_template(request, filters: Filters = Query(...)):
     qs = retrieve(request, GeneratorTemplate, filters)
     return qs
@@ -10,12 +10,13 @@ from typing import List
 
 from django.shortcuts import get_object_or_404
 from ninja import Field, ModelSchema, Query, Router, Schema
-from ninja.pagination import paginate
 from system.models import CategoryDict
-from utils.fu_crud import create, delete, retrieve, update
-from utils.fu_ninja import FuFilters, MyPagination
+from utils.db_router import read_replica
+from utils.fu_crud import add_batch_routes, add_partial_update_route, create, delete, retrieve, update
+from utils.fu_ninja import FuFilters, paginate_values
 from utils.fu_response import FuResponse
 from utils.list_to_tree import list_to_tree
+from utils.response_cache import cache_response
 
 router = Router()
 
@@ -31,13 +32,13 @@ class SchemaIn(ModelSchema):
 
     class Config:
         model = CategoryDict
-        model_exclude = ['id', 'parent', 'create_datetime', 'update_datetime']
+        model_exclude = ['id', 'parent', 'create_datetime', 'update_datetime', 'tree_path', 'tree_depth']
 
 
 class SchemaOut(ModelSchema):
     class Config:
         model = CategoryDict
-        model_fields = "__all__"
+        model_exclude = ['tree_path', 'tree_depth']
     # model_fields = []
 
 
@@ -59,8 +60,15 @@ def update_category_dict(request, category_dict_id: int, data: SchemaIn):
     return category_dict
 
 
+add_batch_routes(router, "/category_dict", CategoryDict, SchemaIn)
+
+
+add_partial_update_route(router, "/category_dict/{category_dict_id}", CategoryDict, SchemaIn)
+
+
 @router.get("/category_dict", response=List[SchemaOut])
-@paginate(MyPagination)
+@cache_response(CategoryDict)
+@paginate_values()
 def list_category_dict(request, filters: Filters = Query(...)):
     qs = retrieve(request, CategoryDict, filters)
     return qs
@@ -73,7 +81,9 @@ def get_category_dict(request, category_dict_id: int):
 
 
 @router.get("/category_dict/list/tree")
+@cache_response(CategoryDict)
+@read_replica
 def list_category_dict_tree(request, filters: Filters = Query(...)):
-    qs = retrieve(request, CategoryDict, filters).values()
+    qs = retrieve(request, CategoryDict, filters).public_values()
     category_dict_tree = list_to_tree(list(qs))
     return FuResponse(data=category_dict_tree)
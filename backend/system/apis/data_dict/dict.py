@@ -7,10 +7,10 @@ from typing import List
 
 from django.shortcuts import get_object_or_404
 from ninja import Field, ModelSchema, Query, Router, Schema
-from ninja.pagination import paginate
 from system.models import Dict
-from utils.fu_crud import create, delete, retrieve, update
-from utils.fu_ninja import FuFilters, MyPagination
+from utils.fu_crud import add_batch_routes, add_partial_update_route, create, delete, retrieve, retrieve_one, update
+from utils.fu_ninja import FuFilters, paginate_values
+from utils.response_cache import cache_response
 
 router = Router()
 
@@ -51,16 +51,23 @@ def update_dict(request, dict_id: int, data: SchemaIn):
     return qs
 
 
+add_batch_routes(router, "/dict", Dict, SchemaIn)
+
+
+add_partial_update_route(router, "/dict/{dict_id}", Dict, SchemaIn)
+
+
 @router.get("/dict", response=List[SchemaOut])
-@paginate(MyPagination)
+@cache_response(Dict)
+@paginate_values()
 def list_dict(request, filters: Filters = Query(...)):
     qs = retrieve(request, Dict, filters)
     return qs
 
 
 @router.get("/dict/{dict_id}", response=SchemaOut)
-def get_dict(request, dict_id: int):
-    qs = get_object_or_404(Dict, id=dict_id)
+def get_dict(request, dict_id: int, fields: str = None):
+    qs = retrieve_one(request, Dict, dict_id, SchemaOut, fields)
     return qs
 
 
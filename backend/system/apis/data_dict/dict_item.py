@@ -5,12 +5,15 @@
 # @Software: PyCharm
 from typing import List
 
+from django.http import HttpResponse, HttpResponseNotModified
 from django.shortcuts import get_object_or_404
+from django.utils.http import parse_etags
 from ninja import Field, ModelSchema, Query, Router, Schema
-from ninja.pagination import paginate
 from system.models import Dict, DictItem
-from utils.fu_crud import create, delete, retrieve, update
-from utils.fu_ninja import FuFilters, MyPagination
+from utils.dict_map import get_dict_map
+from utils.fu_crud import add_batch_routes, add_partial_update_route, create, delete, retrieve, retrieve_one, update
+from utils.fu_ninja import FuFilters, paginate_values
+from utils.fu_response import set_response_meta
 
 router = Router()
 
@@ -55,16 +58,22 @@ def update_dict_item(request, dict_item_id: int, data: SchemaIn):
     return qs
 
 
+add_batch_routes(router, "/dict_item", DictItem, SchemaIn)
+
+
+add_partial_update_route(router, "/dict_item/{dict_item_id}", DictItem, SchemaIn)
+
+
 @router.get("/dict_item", response=List[SchemaOut])
-@paginate(MyPagination)
+@paginate_values()
 def list_dict_item(request, filters: Filters = Query(...)):
     qs = retrieve(request, DictItem, filters)
     return qs
 
 
 @router.get("/dict_item/{dict_item_id}", response=SchemaOut)
-def get_dict_item(request, dict_item_id: int):
-    qs = get_object_or_404(DictItem, id=dict_item_id)
+def get_dict_item(request, dict_item_id: int, fields: str = None):
+    qs = retrieve_one(request, DictItem, dict_item_id, SchemaOut, fields)
     return qs
 
 
@@ -83,3 +92,33 @@ def list_dict_item_by_code(request, filters: Filters = Query(...)):
     else:
         item_qs = dict_qs.dictItem.filter(status=True)
         return item_qs
+
+
+def etag_matches(header, etag):
+    """
+    If-None-Match 比较(弱比较): 支持逗号分隔的多个 ETag、W/ 前缀和 *
+    """
+    if not header:
+        return False
+    etags = parse_etags(header)
+    if '*' in etags:
+        return True
+    return etag.removeprefix('W/') in {value.removeprefix('W/') for value in etags}
+
+
+@router.get("/dict_item/by/codes")
+def list_dict_item_by_codes(request, response: HttpResponse, codes: str = None):
+    """
+    批量获取字典项: codes 为逗号分隔的字典编码, 返回 {code: [item, ...]}, 不传 codes 时返回全部启用的字典
+    响应携带 ETag, 客户端以 If-None-Match 重新验证, 字典未变化时返回 304
+    """
+    items, etag = get_dict_map()
+    if etag_matches(request.headers.get('If-None-Match'), etag):
+        not_modified = HttpResponseNotModified()
+        not_modified['ETag'] = etag
+        return set_response_meta(not_modified, 2000, 'not modified')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    if not codes:
+        return items
+    return {code: items.get(code, []) for code in codes.split(',') if code}
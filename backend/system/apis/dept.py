@@ -10,12 +10,13 @@ from typing import List
 
 from django.shortcuts import get_object_or_404
 from ninja import Field, ModelSchema, Query, Router, Schema
-from ninja.pagination import paginate
 from system.models import Dept
-from utils.fu_crud import create, delete, retrieve, update
-from utils.fu_ninja import FuFilters, MyPagination
+from utils.db_router import read_replica
+from utils.fu_crud import add_batch_routes, add_partial_update_route, create, delete, retrieve, update
+from utils.fu_ninja import FuFilters, paginate_values
 from utils.fu_response import FuResponse
 from utils.list_to_tree import list_to_route, list_to_tree
+from utils.response_cache import cache_response
 
 router = Router()
 
@@ -86,8 +87,15 @@ def update_dept(request, dept_id: int, data: SchemaIn):
         return FuResponse(code=500, msg=f"更新部门失败: {e}")
 
 
+add_batch_routes(router, "/dept", Dept, SchemaIn)
+
+
+add_partial_update_route(router, "/dept/{dept_id}", Dept, SchemaIn)
+
+
 @router.get("/dept", response=List[SchemaOut])
-@paginate(MyPagination)
+@cache_response(Dept)
+@paginate_values()
 def list_dept(request, filters: Filters = Query(...)):
     """获取部门列表(分页)
     支持通过部门名称、状态进行过滤
@@ -120,6 +128,8 @@ def get_dept(request, dept_id: int):
 
 
 @router.get("/dept/list/tree")
+@cache_response(Dept)
+@read_replica
 def list_dept_tree(request, filters: Filters = Query(...)):
     """获取部门树形列表
     支持通过部门名称、状态进行过滤
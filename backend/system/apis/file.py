@@ -8,19 +8,19 @@ from datetime import datetime
 from typing import List
 from urllib.parse import unquote
 
+from asgiref.sync import sync_to_async
 from django.http import FileResponse, StreamingHttpResponse, HttpResponse
 from django.shortcuts import get_object_or_404
 from fuadmin.settings import BASE_DIR, STATIC_URL
 from ninja import Field
 from ninja import File as NinjaFile
-from ninja import ModelSchema, Query, Router, Schema
+from ninja import ModelSchema, Query, Schema
 from ninja.files import UploadedFile
-from ninja.pagination import paginate
 from system.models import File
-from utils.fu_crud import create, delete, retrieve, update
-from utils.fu_ninja import FuFilters, MyPagination
+from utils.fu_crud import acreate, aget_object_or_404, delete, retrieve
+from utils.fu_ninja import FuFilters, FuRouter, paginate_values
 
-router = Router()
+router = FuRouter()
 
 
 class Filters(FuFilters):
@@ -55,7 +55,7 @@ def delete_file(request, file_id: int):
 
 
 @router.get("/file", response=List[SchemaOut])
-@paginate(MyPagination)
+@paginate_values()
 def list_file(request, filters: Filters = Query(...)):
     """获取文件记录列表(分页)
     支持通过文件名称进行过滤
@@ -102,14 +102,26 @@ def all_list_role(request): # 注意：函数名可能应为 all_list_file
         return FuResponse(code=500, msg=f"获取所有文件记录列表失败: {e}")
 
 
+def save_upload_file(file, file_save_path):
+    """分块写入上传文件, 不把整个文件读入内存"""
+    os.makedirs(os.path.dirname(file_save_path), exist_ok=True)
+    with open(file_save_path, 'wb') as f:
+        for chunk in file.chunks():
+            f.write(chunk)
+
+
+def read_file(file_path):
+    with open(file_path, 'rb') as f:
+        return f.read()
+
+
 @router.post("/upload", response=SchemaOut)
-def upload(request, file: UploadedFile = NinjaFile(...)):
+async def upload(request, file: UploadedFile = NinjaFile(...)):
     """上传文件并保存记录"""
     import logging
     logger = logging.getLogger(__name__)
     logger.info(f"开始上传文件: {file.name}, 大小: {file.size} bytes")
     try:
-        binary_data = file.read()
         current_date = datetime.now().strftime('%Y%m%d%H%M%S%f')
         current_ymd = datetime.now().strftime('%Y%m%d')
         # 防止文件名包含空格或特殊字符导致的问题，并添加时间戳确保唯一性
@@ -121,16 +133,12 @@ def upload(request, file: UploadedFile = NinjaFile(...)):
         # 为安全起见，显式拼接 BASE_DIR
         upload_dir = os.path.join(BASE_DIR, STATIC_URL.strip('/\\'), current_ymd) # 移除首尾斜杠确保路径拼接正确
 
-        if not os.path.exists(upload_dir):
-            os.makedirs(upload_dir)
-            logger.info(f"创建上传目录: {upload_dir}")
-
         file_save_path = os.path.join(upload_dir, file_name)
         # 存储在数据库中的相对路径，相对于 STATIC_URL
         db_file_url = os.path.join(STATIC_URL.strip('/\\'), current_ymd, file_name).replace('\\', '/') # 统一使用 / 作为路径分隔符
 
-        with open(file_save_path, 'wb') as f:
-            f.write(binary_data)
+        # 磁盘写入放到线程中执行, 不阻塞事件循环
+        await sync_to_async(save_upload_file, thread_sensitive=False)(file, file_save_path)
         logger.info(f"文件 {file.name} 已保存至 {file_save_path}")
 
         data = {
@@ -139,7 +147,7 @@ def upload(request, file: UploadedFile = NinjaFile(...)):
             'save_name': file_name, # 服务器保存的文件名
             'url': db_file_url, # 数据库中存储的相对访问URL
         }
-        qs = create(request, data, File)
+        qs = await acreate(request, data, File)
         logger.info(f"文件记录创建成功: {qs.id}, 文件名: {qs.name}")
         return qs
     except Exception as e:
@@ -152,7 +160,7 @@ def upload(request, file: UploadedFile = NinjaFile(...)):
 
 
 @router.post("/download") # 函数名 create_post 可能有误，应为 download_file
-def create_post(request, data: SchemaIn):
+async def create_post(request, data: SchemaIn):
     """下载文件
     通过提供的相对路径 (data.url) 找到并下载文件。
     """
@@ -171,14 +179,15 @@ def create_post(request, data: SchemaIn):
         file_path = os.path.join(BASE_DIR, relative_path)
 
         logger.info(f"尝试下载文件，绝对路径: {file_path}")
-        if not os.path.exists(file_path) or not os.path.isfile(file_path):
+        if not await sync_to_async(os.path.isfile, thread_sensitive=False)(file_path):
             logger.warning(f"下载失败：文件未找到或不是一个文件: {file_path}")
             # from utils.fu_response import FuResponse # 假设的导入路径
             # return FuResponse(code=404, msg="文件未找到")
             return HttpResponse("文件未找到", status=404)
 
         # 使用 FileResponse 提供文件下载，as_attachment=True 会提示浏览器下载
-        response = FileResponse(open(file_path, "rb"), as_attachment=True)
+        file = await sync_to_async(open, thread_sensitive=False)(file_path, "rb")
+        response = FileResponse(file, as_attachment=True)
         # 可以尝试从文件名推断 Content-Type，或让 FileResponse 自动处理
         # response['Content-Disposition'] = f'attachment; filename="{os.path.basename(file_path)}"'
         logger.info(f"文件 {os.path.basename(file_path)} 开始下载")
@@ -191,7 +200,7 @@ def create_post(request, data: SchemaIn):
 
 
 @router.get("/image/{image_id}", auth=None) # 函数名 get_file 与前面获取文件记录的函数重名，建议修改
-def get_file(request, image_id: int):
+async def get_file(request, image_id: int):
     """获取图片文件
     根据图片ID从数据库获取图片记录，并返回图片内容。
     允许匿名访问 (auth=None)。
@@ -200,7 +209,7 @@ def get_file(request, image_id: int):
     logger = logging.getLogger(__name__)
     logger.info(f"请求获取图片，图片ID: {image_id}")
     try:
-        qs = get_object_or_404(File, id=image_id)
+        qs = await aget_object_or_404(File, id=image_id)
         logger.info(f"查找到图片记录: {qs.name}, 路径: {qs.url}")
 
         # 路径处理与下载类似，需要确保 qs.url 的格式
@@ -210,7 +219,7 @@ def get_file(request, image_id: int):
         image_full_path = os.path.join(BASE_DIR, relative_path)
 
         logger.info(f"尝试打开图片文件: {image_full_path}")
-        if not os.path.exists(image_full_path) or not os.path.isfile(image_full_path):
+        if not await sync_to_async(os.path.isfile, thread_sensitive=False)(image_full_path):
             logger.warning(f"获取图片失败：文件未找到或不是一个文件: {image_full_path}")
             return HttpResponse("图片未找到", status=404)
 
@@ -223,7 +232,8 @@ def get_file(request, image_id: int):
         # return HttpResponse(open(image_full_path, "rb"), content_type=content_type)
 
         # 当前固定为 image/png，如果图片类型多样，需要调整
-        return HttpResponse(open(image_full_path, "rb"), content_type='image/png')
+        content = await sync_to_async(read_file, thread_sensitive=False)(image_full_path)
+        return HttpResponse(content, content_type='image/png')
     except File.DoesNotExist:
         logger.warning(f"图片记录未找到，ID: {image_id}")
         return HttpResponse("图片记录未找到", status=404)
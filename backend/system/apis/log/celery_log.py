@@ -7,9 +7,9 @@ from typing import List
 
 from django_celery_results.models import TaskResult
 from ninja import Field, ModelSchema, Query, Router, Schema
-from ninja.pagination import paginate
+from utils.db_router import read_replica
 from utils.fu_crud import delete, retrieve
-from utils.fu_ninja import FuFilters, MyPagination
+from utils.fu_ninja import FuFilters, paginate_values
 
 router = Router()
 
@@ -31,13 +31,14 @@ def delete_celery_log(request, celery_log_id: int):
 
 
 @router.get("/celery_log", response=List[SchemaOut])
-@paginate(MyPagination)
+@paginate_values()
 def list_celery_log(request, filters: Filters = Query(...)):
     qs = retrieve(request, TaskResult, filters)
     return qs
 
 
 @router.get("/celery_log/all/list", response=List[SchemaOut])
+@read_replica
 def all_list_role(request):
     qs = retrieve(request, TaskResult)
     return qs
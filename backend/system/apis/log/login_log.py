@@ -7,10 +7,10 @@ from typing import List
 
 from django.shortcuts import get_object_or_404
 from ninja import Field, ModelSchema, Query, Router, Schema
-from ninja.pagination import paginate
 from system.models import LoginLog
-from utils.fu_crud import create, delete, retrieve, update
-from utils.fu_ninja import FuFilters, MyPagination
+from utils.db_router import read_replica
+from utils.fu_crud import add_batch_routes, create, delete, retrieve, update
+from utils.fu_ninja import FuFilters, paginate_values
 
 router = Router()
 
@@ -33,14 +33,18 @@ def delete_login_log(request, login_log_id: int):
     return {"success": True}
 
 
+add_batch_routes(router, "/login_log", LoginLog, update=False)
+
+
 @router.get("/login_log", response=List[SchemaOut])
-@paginate(MyPagination)
+@paginate_values()
 def list_login_log(request, filters: Filters = Query(...)):
     qs = retrieve(request, LoginLog, filters)
     return qs
 
 
 @router.get("/login_log/all/list", response=List[SchemaOut])
+@read_replica
 def all_list_role(request):
     qs = retrieve(request, LoginLog)
     return qs
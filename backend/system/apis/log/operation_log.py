@@ -7,10 +7,11 @@ from typing import List
 
 from django.shortcuts import get_object_or_404
 from ninja import Field, ModelSchema, Query, Router, Schema
-from ninja.pagination import paginate
 from system.models import OperationLog
-from utils.fu_crud import create, delete, retrieve, update
-from utils.fu_ninja import FuFilters, MyPagination
+from utils.db_router import read_replica
+from utils.fu_crud import add_batch_routes, create, delete, retrieve, update
+from utils.fu_ninja import FuFilters, paginate_values
+from utils.request_util import decode_log_payload
 
 router = Router()
 
@@ -25,6 +26,14 @@ class SchemaOut(ModelSchema):
         model = OperationLog
         model_fields = "__all__"
 
+    @staticmethod
+    def resolve_request_body(obj):
+        return decode_log_payload(obj.request_body)
+
+    @staticmethod
+    def resolve_json_result(obj):
+        return decode_log_payload(obj.json_result)
+
 
 @router.delete("/operation_log/{operation_log_id}")
 def delete_operation_log(request, operation_log_id: int):
@@ -32,14 +41,18 @@ def delete_operation_log(request, operation_log_id: int):
     return {"success": True}
 
 
+add_batch_routes(router, "/operation_log", OperationLog, update=False)
+
+
 @router.get("/operation_log", response=List[SchemaOut])
-@paginate(MyPagination)
+@paginate_values()
 def list_operation_log(request, filters: Filters = Query(...)):
     qs = retrieve(request, OperationLog, filters)
     return qs
 
 
 @router.get("/operation_log/all/list", response=List[SchemaOut])
+@read_replica
 def all_list_role(request):
     qs = retrieve(request, OperationLog)
     return qs
@@ -4,22 +4,27 @@
 # @FileName: login.py
 # @Software: PyCharm
 import json
+import uuid
 from datetime import datetime
 # from django.core.cache import cache
 
-from django.contrib import auth
+from asgiref.sync import sync_to_async
 from django.forms import model_to_dict
-from django.shortcuts import get_object_or_404
-from ninja import Router, ModelSchema, Query, Schema, Field
+from ninja import ModelSchema, Query, Schema, Field
 
 from fuadmin.settings import SECRET_KEY, TOKEN_LIFETIME
 from system.models import Users, Role, MenuButton, MenuColumnField
+from utils.fu_crud import aget_object_or_404
 from utils.fu_jwt import FuJwt
+from utils.fu_ninja import FuRouter
 from utils.fu_response import FuResponse
+from utils.password import averify_password
+from utils.permission_version import get_token_versions
 from utils.request_util import save_login_log
+from utils.token_revocation import token_revocation
 from utils.usual import get_user_info_from_token
 
-router = Router()
+router = FuRouter()
 
 
 class SchemaOut(ModelSchema):
@@ -43,8 +48,32 @@ class Out(Schema):
     token: str
 
 
+async def aauthenticate(user_obj, password):
+    """
+    在密码线程池中校验密码, 哈希参数变化时保存新的哈希; 停用的用户不能登录
+    用 update 保存新哈希, 不触发 post_save, 避免该用户已签发的 token 失效
+    """
+    valid, rehashed = await averify_password(password, user_obj.password if user_obj else None)
+    if not valid:
+        return None
+    if rehashed:
+        user_obj.password = rehashed
+        await sync_to_async(Users.objects.filter(pk=user_obj.pk).update)(password=rehashed)
+    return user_obj if user_obj.is_active else None
+
+
+def get_login_user_info(user_obj):
+    """
+    查询用户角色、岗位并组装用户信息, 返回 (用户信息, 角色, 岗位)
+    """
+    roles = list(user_obj.role.all().values('id', 'name')) # 同时获取name用于日志
+    posts = list(user_obj.post.all().values('id', 'name')) # 同时获取name用于日志
+    user_info_payload = model_to_dict(user_obj)
+    return user_info_payload, roles, posts
+
+
 @router.post("/login", response=Out, auth=None)
-def login(request, data: LoginSchema):
+async def login(request, data: LoginSchema):
     """用户登录接口
     验证用户凭据，成功则生成JWT Token并返回用户信息。
     允许匿名访问 (auth=None)。
@@ -53,21 +82,20 @@ def login(request, data: LoginSchema):
     logger = logging.getLogger(__name__)
     logger.info(f"用户尝试登录，用户名: {data.username}")
 
-    user_obj = auth.authenticate(request, **data.dict())
+    user_obj = await sync_to_async(Users.objects.filter(username=data.username).first)()
+    user_obj = await aauthenticate(user_obj, data.password)
     if user_obj:
         request.user = user_obj # Django 内置的 request.user 赋值
         logger.info(f"用户 {data.username} 认证成功")
 
         # 获取用户角色和岗位信息
-        roles = user_obj.role.all().values('id', 'name') # 同时获取name用于日志
-        posts = list(user_obj.post.all().values('id', 'name')) # 同时获取name用于日志
+        user_info_payload, roles, posts = await sync_to_async(get_login_user_info)(user_obj)
         role_ids = [item['id'] for item in roles]
         post_ids = [item['id'] for item in posts]
 
         logger.info(f"用户 {data.username} 角色ID: {role_ids}, 岗位ID: {post_ids}")
 
         # 准备JWT payload
-        user_info_payload = model_to_dict(user_obj)
         user_info_payload['role'] = role_ids
         user_info_payload['post'] = post_ids
         # 从payload中移除敏感信息和不需要的信息
@@ -82,8 +110,11 @@ def login(request, data: LoginSchema):
         # FuJwt 可能需要 id 字段，确保存在
         if 'id' not in jwt_payload:
             jwt_payload['id'] = user_obj.id
+        # 权限版本号, 认证时版本未变化则无需查询数据库
+        jwt_payload.update(get_token_versions(user_obj.id))
 
-        fu_jwt = FuJwt(SECRET_KEY, jwt_payload, valid_to=time_now + TOKEN_LIFETIME)
+        # jti 用于注销 token
+        fu_jwt = FuJwt(SECRET_KEY, jwt_payload, valid_to=time_now + TOKEN_LIFETIME, id=uuid.uuid4().hex)
         token = f"bearer {fu_jwt.encode()}"
         logger.info(f"为用户 {data.username} 生成的Token (前缀已添加)")
 
@@ -99,7 +130,8 @@ def login(request, data: LoginSchema):
 
         # 保存登录日志
         try:
-            save_login_log(request=request)
+            # 包含 IP 归属地查询(外部 HTTP 请求)与数据库写入, 在线程中执行
+            await sync_to_async(save_login_log)(request=request)
             logger.info(f"用户 {data.username} 登录日志已保存")
         except Exception as e:
             logger.error(f"保存用户 {data.username} 登录日志失败: {e}", exc_info=True)
@@ -111,7 +143,7 @@ def login(request, data: LoginSchema):
 
 
 @router.get("/logout", auth=None) # 函数名 get_post 可能有误，应为 logout
-def get_post(request):
+async def get_post(request):
     """用户注销接口
     允许匿名访问 (auth=None)，但通常注销需要验证Token。
     如果Token在客户端删除，此处主要用于服务端进行一些清理工作（如记录日志，清除特定缓存）。
@@ -127,10 +159,10 @@ def get_post(request):
         else:
             logger.info("匿名用户或无效Token尝试注销")
         
-        # 如果使用了服务端Token缓存 (如Redis)，则在此处删除
-        # if user_info and 'id' in user_info:
-        #     cache.delete(user_info['id'])
-        #     logger.info(f"用户 {user_info['username']} 的Token缓存已清除")
+        # 注销当前 token, 注销记录保留到 token 过期
+        token = FuJwt.decode(SECRET_KEY, request.META.get("HTTP_AUTHORIZATION").split(" ")[1])
+        await sync_to_async(token_revocation.revoke)(token.id, token.valid_to)
+        logger.info(f"token {token.id} 已注销")
 
         # Django的auth.logout()会清除session，如果使用了session认证
         # from django.contrib.auth import logout as django_logout
@@ -149,7 +181,7 @@ def get_post(request):
 
 
 @router.get("/userinfo", response=SchemaOut)
-def get_userinfo(request):
+async def get_userinfo(request):
     """获取当前登录用户信息
     通过请求中的Token获取用户ID，然后从数据库查询并返回用户信息。
     需要认证访问。
@@ -169,7 +201,7 @@ def get_userinfo(request):
 
         # 从数据库获取最新的用户信息
         # 使用 select_related 或 prefetch_related 优化关联查询（如果SchemaOut包含关联字段）
-        user = get_object_or_404(Users.objects.select_related(), id=user_id) 
+        user = await aget_object_or_404(Users.objects.select_related(), id=user_id)
         logger.info(f"成功获取用户 {user.username} (ID: {user.id}) 的信息")
         
         # SchemaOut 会自动处理模型到Schema的转换
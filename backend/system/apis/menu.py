@@ -12,11 +12,13 @@ from fuadmin.settings import SECRET_KEY
 from ninja import Field, ModelSchema, Query, Router, Schema
 from ninja.pagination import paginate
 from system.models import Menu, MenuButton, Users
-from utils.fu_crud import create, delete, retrieve, update
+from utils.db_router import read_replica
+from utils.fu_crud import add_batch_routes, create, delete, retrieve, update
 from utils.fu_jwt import FuJwt
 from utils.fu_ninja import FuFilters, MyPagination
 from utils.fu_response import FuResponse
 from utils.list_to_tree import list_to_route, list_to_tree
+from utils.response_cache import cache_response
 
 router = Router()
 
@@ -33,13 +35,13 @@ class SchemaIn(ModelSchema):
 
     class Config:
         model = Menu
-        model_exclude = ['id', 'parent', 'create_datetime', 'update_datetime']
+        model_exclude = ['id', 'parent', 'create_datetime', 'update_datetime', 'tree_path', 'tree_depth']
 
 
 class SchemaOut(ModelSchema):
     class Config:
         model = Menu
-        model_fields = "__all__"
+        model_exclude = ['tree_path', 'tree_depth']
     # model_fields = []
 
 
@@ -145,7 +147,29 @@ def update_menu(request, menu_id: int, data: SchemaIn):
         return FuResponse(code=500, msg=f"更新菜单失败: {str(e)}")
 
 
+def _check_batch_delete(request, ids):
+    # 选中的菜单存在未选中的子菜单时拒绝删除, 关联的按钮权限级联删除
+    if Menu.objects.filter(parent_id__in=ids).exclude(id__in=ids).exists():
+        raise TimeoutError(400, "存在子菜单，请先删除子菜单")
+
+
+def _check_batch_update(request, ids, data):
+    # 修改上级菜单时由 tree_parent_updated 重建树路径
+    parent_id = data.get('parent_id')
+    if parent_id is None:
+        return
+    if parent_id in ids:
+        raise TimeoutError(400, "父菜单不能是自身")
+    if not Menu.objects.filter(id=parent_id).exists():
+        raise TimeoutError(400, f"父菜单ID {parent_id} 不存在")
+
+
+add_batch_routes(router, "/menu", Menu, SchemaIn, check_delete=_check_batch_delete, check_update=_check_batch_update)
+
+
 @router.get("/menu", response=List[SchemaOut])
+@cache_response(Menu)
+@read_replica
 def list_menu_tree(request, filters: Filters = Query(...)):
     """获取菜单列表 (树形结构)
     根据提供的过滤条件查询菜单，并将结果转换为树形结构返回。
@@ -159,7 +183,7 @@ def list_menu_tree(request, filters: Filters = Query(...)):
         # 使用 retrieve 函数获取扁平化的菜单列表
         # 注意：retrieve 函数内部可能包含数据权限过滤逻辑，需确认是否符合预期
         # 在之前的修复中，此处的 retrieve 应该是不带数据权限的查询
-        qs = Menu.objects.filter(**filters.dict(exclude_none=True)).values()
+        qs = Menu.objects.filter(**filters.dict(exclude_none=True)).public_values()
         logger.info(f"从数据库查询到 {len(qs)} 条菜单数据")
 
         # 将查询集转换成树形结构
@@ -221,12 +245,12 @@ def route_menu_tree(request):
         # 获取菜单数据
         if token_user['is_superuser']:
             # 超级管理员获取所有启用的菜单
-            queryset = Menu.objects.filter(status=1).values()
+            queryset = Menu.objects.filter(status=1).public_values()
             logger.info(f"超级管理员 {user.username} 获取所有菜单")
         else:
             # 普通用户根据角色权限获取菜单
             menu_ids = user.role.values_list('menu__id', flat=True)
-            queryset = Menu.objects.filter(id__in=menu_ids, status=1).values()
+            queryset = Menu.objects.filter(id__in=menu_ids, status=1).public_values()
             logger.info(f"用户 {user.username} 根据角色权限获取菜单，可访问菜单ID: {list(menu_ids)}")
         
         # 构建菜单树
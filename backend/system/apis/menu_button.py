@@ -9,10 +9,9 @@ from typing import List
 
 from django.shortcuts import get_object_or_404
 from ninja import Field, ModelSchema, Query, Router, Schema
-from ninja.pagination import paginate
 from system.models import MenuButton
-from utils.fu_crud import create, delete, retrieve, update
-from utils.fu_ninja import FuFilters, MyPagination
+from utils.fu_crud import add_batch_routes, add_partial_update_route, create, delete, retrieve, update
+from utils.fu_ninja import FuFilters, paginate_values
 
 router = Router()
 
@@ -56,8 +55,14 @@ def update_menu_button(request, menu_button_id: int, data: SchemaIn):
     return menu_button
 
 
+add_batch_routes(router, "/menu_button", MenuButton, SchemaIn)
+
+
+add_partial_update_route(router, "/menu_button/{menu_button_id}", MenuButton, SchemaIn)
+
+
 @router.get("/menu_button", response=List[SchemaOut])
-@paginate(MyPagination)
+@paginate_values()
 def list_menu_button(request, filters: Filters = Query(...)):
     qs = retrieve(request, MenuButton, filters)
     return qs
@@ -9,10 +9,9 @@ from typing import List
 
 from django.shortcuts import get_object_or_404
 from ninja import Field, ModelSchema, Query, Router, Schema
-from ninja.pagination import paginate
 from system.models import MenuColumnField
-from utils.fu_crud import create, delete, retrieve, update, batch_create
-from utils.fu_ninja import FuFilters, MyPagination
+from utils.fu_crud import add_batch_routes, add_partial_update_route, batch_create, create, delete, retrieve, update
+from utils.fu_ninja import FuFilters, paginate_values
 from utils.fu_response import FuResponse
 
 router = Router()
@@ -67,8 +66,14 @@ def update_menu_column_field(request, menu_column_field_id: int, data: SchemaIn)
     return menu_column_field
 
 
+add_batch_routes(router, "/menu_column_field", MenuColumnField, SchemaIn)
+
+
+add_partial_update_route(router, "/menu_column_field/{menu_column_field_id}", MenuColumnField, SchemaIn)
+
+
 @router.get("/menu_column_field", response=List[SchemaOut])
-@paginate(MyPagination)
+@paginate_values()
 def list_menu_column_field(request, filters: Filters = Query(...)):
     qs = retrieve(request, MenuColumnField, filters)
     return qs
@@ -4,15 +4,20 @@
 # file: monitor.py
 # author: Wick
 # 
-from ninja import Router
+from asgiref.sync import sync_to_async
 
+from utils.db_connection import get_connection_stats
+from utils.fu_ninja import FuRouter
 from utils.fu_response import FuResponse
 from utils.system import system
 
-router = Router()
+router = FuRouter()
 
 
 @router.get("/monitor")
-def list_role(request):
-    qs = system().GetSystemAllInfo()
+async def list_role(request):
+    # 采集 CPU 使用率需要等待采样间隔, 且不访问数据库, 放到线程池中执行以免阻塞事件循环
+    qs = await sync_to_async(system().GetSystemAllInfo, thread_sensitive=False)()
+    # 数据库连接统计(新建连接次数、健康检查失败次数、连接池状态)
+    qs['database'] = get_connection_stats()
     return FuResponse(data=qs)
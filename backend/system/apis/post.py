@@ -12,6 +12,8 @@ from ninja.pagination import paginate
 from system.models import Post
 from utils.fu_crud import (
     ImportSchema,
+    add_batch_routes,
+    add_partial_update_route,
     create,
     delete,
     export_data,
@@ -19,7 +21,8 @@ from utils.fu_crud import (
     retrieve,
     update,
 )
-from utils.fu_ninja import FuFilters, MyPagination
+from utils.fu_ninja import FuFilters, paginate_values
+from utils.response_cache import cache_response
 
 router = Router()
 
@@ -128,8 +131,15 @@ def update_post(request, post_id: int, data: PostSchemaIn):
         return FuResponse(code=500, msg=f"更新岗位失败: {str(e)}")
 
 
+add_batch_routes(router, "/post", Post, PostSchemaIn)
+
+
+add_partial_update_route(router, "/post/{post_id}", Post, PostSchemaIn)
+
+
 @router.get("/post", response=List[PostSchemaOut])
-@paginate(MyPagination)
+@cache_response(Post)
+@paginate_values()
 def list_post(request, filters: Filters = Query(...)):
     """获取岗位列表 (分页)
     根据提供的过滤条件查询岗位信息，并进行分页处理。
@@ -140,9 +150,9 @@ def list_post(request, filters: Filters = Query(...)):
     logger.info(f"请求获取岗位列表，过滤条件: {filters.dict(exclude_none=True)}")
     try:
         # retrieve 函数通常包含了数据权限过滤和查询逻辑
-        qs = retrieve(request, Post, filters)
+        qs = retrieve(request, Post, filters, schema=PostSchemaOut)
         logger.info(f"查询到岗位数据，准备分页返回")
-        # 分页操作由 @paginate(MyPagination) 装饰器处理
+        # 分页操作由 @paginate_values() 装饰器处理
         return qs
     except Exception as e:
         logger.error(f"获取岗位列表过程中发生错误: {e}", exc_info=True)
@@ -187,7 +197,7 @@ def all_list_post(request):
     try:
         # retrieve 函数在不传递 filters 时，通常返回所有数据
         # 需确认 retrieve 是否有内置的数据权限处理
-        qs = retrieve(request, Post) 
+        qs = retrieve(request, Post, schema=PostSchemaOut)
         logger.info(f"查询到 {len(qs) if qs else 0} 条岗位数据")
         return qs
     except Exception as e:
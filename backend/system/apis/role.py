@@ -10,12 +10,12 @@ from typing import List
 
 from django.shortcuts import get_object_or_404
 from ninja import Field, ModelSchema, Query, Router, Schema
-from ninja.pagination import paginate
-from system.models import Menu, Role, MenuButton
-from utils.fu_crud import create, delete, retrieve
-from utils.fu_ninja import FuFilters, MyPagination
+from system.models import Menu, MenuButton, MenuColumnField, Role
+from utils.fu_crud import add_batch_routes, create, delete, retrieve, set_m2m
+from utils.fu_ninja import FuFilters, paginate_values
 from utils.fu_response import FuResponse
 from utils.list_to_tree import list_to_tree
+from utils.response_cache import get_model_version, require_tracked
 
 router = Router()
 
@@ -76,16 +76,16 @@ def create_role(request, data: SchemaIn):
         
         # 设置多对多关系
         if menu_ids:
-            role_instance.menu.set(menu_ids)
+            set_m2m(role_instance, 'menu', menu_ids)
             logger.info(f"角色ID {role_instance.id} 关联菜单权限: {menu_ids}")
         if permission_ids:
-            role_instance.permission.set(permission_ids)
+            set_m2m(role_instance, 'permission', permission_ids)
             logger.info(f"角色ID {role_instance.id} 关联按钮权限: {permission_ids}")
         if dept_ids:
-            role_instance.dept.set(dept_ids)
+            set_m2m(role_instance, 'dept', dept_ids)
             logger.info(f"角色ID {role_instance.id} 关联数据权限 (部门): {dept_ids}")
         if column_ids:
-            role_instance.column.set(column_ids)
+            set_m2m(role_instance, 'column', column_ids)
             logger.info(f"角色ID {role_instance.id} 关联列权限: {column_ids}")
             
         logger.info(f"角色 '{role_instance.name}' (ID: {role_instance.id}) 及权限关联创建完成")
@@ -168,19 +168,19 @@ def update_role(request, role_id: int, payload: SchemaIn):
 
         # 更新多对多关系
         if menu_ids is not None:
-            role_instance.menu.set(menu_ids)
+            set_m2m(role_instance, 'menu', menu_ids)
             logger.info(f"角色 {role_id} 的菜单权限已更新为: {menu_ids}")
         
         if permission_ids is not None:
-            role_instance.permission.set(permission_ids)
+            set_m2m(role_instance, 'permission', permission_ids)
             logger.info(f"角色 {role_id} 的按钮权限已更新为: {permission_ids}")
             
         if dept_ids is not None:
-            role_instance.dept.set(dept_ids)
+            set_m2m(role_instance, 'dept', dept_ids)
             logger.info(f"角色 {role_id} 的数据权限 (部门) 已更新为: {dept_ids}")
             
         if column_ids is not None:
-            role_instance.column.set(column_ids)
+            set_m2m(role_instance, 'column', column_ids)
             logger.info(f"角色 {role_id} 的列权限已更新为: {column_ids}")
 
         # Django的set方法会自动处理多对多关系的保存，无需再次调用role_instance.save()
@@ -195,8 +195,12 @@ def update_role(request, role_id: int, payload: SchemaIn):
         return FuResponse(code=500, msg=f"更新角色失败: {str(e)}")
 
 
+# 批量更新只修改角色基本字段(如状态、数据权限范围), 菜单/按钮/部门/列权限仍通过 PUT /role/{id} 设置
+add_batch_routes(router, "/role", Role, SchemaIn)
+
+
 @router.get("/role", response=List[SchemaOut])
-@paginate(MyPagination)
+@paginate_values()
 def list_role(request, filters: Filters = Query(...)):
     """
     获取角色列表，支持分页和过滤。
@@ -211,7 +215,7 @@ def list_role(request, filters: Filters = Query(...)):
         # retrieve 函数来自于 utils.fu_crud
         queryset = retrieve(request, Role, filters)
         logger.info(f"成功获取角色列表，共 {queryset.count()} 条记录 (分页前)")
-        # 分页操作由 @paginate(MyPagination) 装饰器处理
+        # 分页操作由 @paginate_values() 装饰器处理
         return queryset
     except Exception as e:
         logger.error(f"获取角色列表过程中发生错误: {e}", exc_info=True)
@@ -282,57 +286,10 @@ def list_menu_button_tree(request, filters: ButtonColumnFilters = Query(...)):
     logger.info(f"请求菜单按钮权限树，过滤条件: {filters.dict(exclude_none=True)}")
 
     try:
-        # 考虑根据 filters.menu_ids 过滤 Menu 查询集，如果提供了该参数
-        if filters.menu_ids:
-            logger.info(f"根据提供的菜单ID列表进行过滤: {filters.menu_ids}")
-            menu_queryset = Menu.objects.filter(id__in=filters.menu_ids).prefetch_related('menuPermission')
-        else:
-            menu_queryset = Menu.objects.all().prefetch_related('menuPermission')
-        
-        logger.debug(f"查询到的菜单数量: {menu_queryset.count()}")
-
-        processed_items = []
-        for menu_item in menu_queryset:
-            # 转换菜单项
-            menu_dict = {
-                'id': menu_item.id,
-                'parent_id': menu_item.parent_id,
-                'title': menu_item.name, # 或 title 字段，取决于模型定义
-                'path': menu_item.path, # 假设有 path 字段
-                'component': menu_item.component, # 假设有 component 字段
-                'icon': menu_item.icon, # 假设有 icon 字段
-                'type': menu_item.type, # 假设有 type 字段 (目录, 菜单, 按钮)
-                # ... 其他需要的菜单字段
-            }
-            processed_items.append(menu_dict)
-            logger.debug(f"处理菜单项: {menu_dict}")
-
-            # 转换关联的按钮权限
-            buttons = menu_item.menuPermission.all()
-            for button in buttons:
-                button_dict = {
-                    'id': f"b{button.id}", # 添加前缀 'b' 以区分按钮和菜单ID
-                    'parent_id': menu_item.id, # 按钮的父级是其所属的菜单
-                    'title': button.name, # 或 title 字段
-                    'code': button.code, # 假设有 code 字段 (权限标识)
-                    'type': 'button', # 自定义类型，用于前端区分
-                    # ... 其他需要的按钮字段
-                }
-                processed_items.append(button_dict)
-                logger.debug(f"处理按钮项: {button_dict}，关联到菜单ID: {menu_item.id}")
-        
-        # 使用 list_to_tree 构建完整的树，或直接返回扁平列表由前端处理
-        # 此处的 get_button_or_column_menu 可能是自定义的树构建函数
-        # 如果 get_button_or_column_menu 期望扁平列表并自行处理，则保持原样
-        # 否则，可能需要调整为： tree_data = list_to_tree(processed_items)
-        logger.info(f"准备将处理后的 {len(processed_items)} 个项目传递给 get_button_or_column_menu")
-        
-        # 假设 get_button_or_column_menu 是一个将扁平列表转换为特定树形结构的辅助函数
-        # 它接收扁平化的菜单和按钮列表，以及一个类型标识 ('b' for button)
-        # 这个函数需要确保能够正确处理 'id' 和 'parent_id' 来构建树
-        result_tree = get_button_or_column_menu(processed_items, 'b')
+        # 菜单、按钮数据按菜单结构版本预先计算, 各角色编辑界面共用
+        result_tree = get_menu_permission_tree(MENU_BUTTON_FLAG, filters.menu_ids)
         logger.info("菜单按钮权限树构建完成")
-        return FuResponse(data=result_tree) # 建议使用 FuResponse 包装
+        return FuResponse(data=result_tree)
 
     except Exception as e:
         logger.error(f"获取菜单按钮权限树过程中发生错误: {e}", exc_info=True)
@@ -345,50 +302,13 @@ def list_menu_column_tree(request, filters: ButtonColumnFilters = Query(...)):
     获取菜单及其关联的列权限字段，并构造成树形结构。
     用于角色权限配置界面，展示可选的菜单和列字段。
     需要认证访问。
-    注意：此函数名与获取按钮权限的函数名相同，但通过路由区分。
-    建议后续重命名以提高代码清晰度，例如 list_menu_column_permission_tree。
     """
     import logging
     logger = logging.getLogger(__name__)
     logger.info(f"请求菜单列权限树，过滤条件: {filters.dict(exclude_none=True)}")
 
     try:
-        if filters.menu_ids:
-            logger.info(f"根据提供的菜单ID列表进行过滤: {filters.menu_ids}")
-            menu_queryset = Menu.objects.filter(id__in=filters.menu_ids).prefetch_related('menuColumnField')
-        else:
-            menu_queryset = Menu.objects.all().prefetch_related('menuColumnField')
-        
-        logger.debug(f"查询到的菜单数量: {menu_queryset.count()}")
-
-        processed_items = []
-        for menu_item in menu_queryset:
-            menu_dict = {
-                'id': menu_item.id,
-                'parent_id': menu_item.parent_id,
-                'title': menu_item.name,
-                'path': menu_item.path,
-                'component': menu_item.component,
-                'icon': menu_item.icon,
-                'type': menu_item.type,
-            }
-            processed_items.append(menu_dict)
-            logger.debug(f"处理菜单项: {menu_dict}")
-
-            column_fields = menu_item.menuColumnField.all()
-            for column_field in column_fields:
-                column_dict = {
-                    'id': f"c{column_field.id}", # 添加前缀 'c' 以区分列字段和菜单ID
-                    'parent_id': menu_item.id, # 列字段的父级是其所属的菜单
-                    'title': column_field.name, # 或 title 字段
-                    'field_name': column_field.field_name, # 假设有 field_name 字段 (实际列名)
-                    'type': 'column', # 自定义类型，用于前端区分
-                }
-                processed_items.append(column_dict)
-                logger.debug(f"处理列字段项: {column_dict}，关联到菜单ID: {menu_item.id}")
-
-        logger.info(f"准备将处理后的 {len(processed_items)} 个项目传递给 get_button_or_column_menu")
-        result_tree = get_button_or_column_menu(processed_items, 'c')
+        result_tree = get_menu_permission_tree(MENU_COLUMN_FLAG, filters.menu_ids)
         logger.info("菜单列权限树构建完成")
         return FuResponse(data=result_tree)
 
@@ -400,7 +320,7 @@ def list_menu_column_tree(request, filters: ButtonColumnFilters = Query(...)):
 class SchemaMenuOut(ModelSchema):
     class Config:
         model = Menu
-        model_fields = "__all__"
+        model_exclude = ['tree_path', 'tree_depth']
 
 
 @router.get("/role/list/menu", response=List[SchemaMenuOut]) # response 应该是一个包含树形结构的 Schema，或者直接返回 FuResponse
@@ -454,20 +374,99 @@ def list_menu_tree(request, filters: Filters = Query(...)):
 #     return qs
 
 
-def get_button_or_column_menu(data, flag):
-    return_data = []
-    for i in data:
-        m_id = i['id']
-        if flag in str(m_id):
-            return_data.append(i)
-            get_menu_by_parent(i['parent_id'], data, return_data)
-    return return_data
+MENU_BUTTON_FLAG = 'b'
+MENU_COLUMN_FLAG = 'c'
 
+require_tracked(Menu, MenuButton, MenuColumnField, usage='菜单权限树缓存')
 
-def get_menu_by_parent(parent_id, data, return_data):
-    for i in data:
-        if parent_id == i['id'] and i not in return_data:
-            return_data.append(i)
-            get_menu_by_parent(i['parent_id'], data, return_data)
-    if parent_id is None:
-        return
+_menu_permission_items = {}
+
+
+def _build_menu_permission_items(flag):
+    """
+    菜单与按钮(flag='b')或列字段(flag='c')的扁平列表, 每个菜单后紧跟其按钮/列字段
+    按钮/列字段的 id 加前缀以区分菜单 id
+    """
+    children = {}
+    if flag == MENU_BUTTON_FLAG:
+        for button in MenuButton.objects.values('id', 'menu_id', 'name', 'code'):
+            children.setdefault(button['menu_id'], []).append({
+                'id': f"b{button['id']}",
+                'parent_id': button['menu_id'],
+                'title': button['name'],
+                'code': button['code'],
+                'type': 'button',
+            })
+    else:
+        for column in MenuColumnField.objects.values('id', 'menu_id', 'name', 'code'):
+            children.setdefault(column['menu_id'], []).append({
+                'id': f"c{column['id']}",
+                'parent_id': column['menu_id'],
+                'title': column['name'],
+                'field_name': column['code'],
+                'type': 'column',
+            })
+    items = []
+    for menu in Menu.objects.values('id', 'parent_id', 'name', 'path', 'component', 'icon', 'type'):
+        items.append({
+            'id': menu['id'],
+            'parent_id': menu['parent_id'],
+            'title': menu['name'],
+            'path': menu['path'],
+            'component': menu['component'],
+            'icon': menu['icon'],
+            'type': menu['type'],
+        })
+        items.extend(children.get(menu['id'], []))
+    return items
+
+
+def get_menu_permission_tree(flag, menu_ids=None):
+    """
+    按钮/列字段权限树, 完整结果按 (Menu, MenuButton/MenuColumnField) 模型版本缓存在进程内
+    传入 menu_ids 时只保留这些菜单及其按钮/列字段, 再补全上级菜单
+    """
+    related = MenuButton if flag == MENU_BUTTON_FLAG else MenuColumnField
+    version = (get_model_version(Menu), get_model_version(related))
+    cached = _menu_permission_items.get(flag)
+    if cached is None or cached[0] != version:
+        items = _build_menu_permission_items(flag)
+        index = _build_item_index(items)
+        cached = (version, items, index, get_button_or_column_menu(items, flag, index))
+        _menu_permission_items[flag] = cached
+    _, items, index, tree = cached
+    if not menu_ids:
+        return tree
+    menu_ids = {int(menu_id) for menu_id in menu_ids}
+    items = [item for item in items if flag in str(item['id']) and item['parent_id'] in menu_ids]
+    # 上级菜单在完整索引中查找, 不受 menu_ids 过滤影响
+    return get_button_or_column_menu(items, flag, index)
+
+
+def _build_item_index(data):
+    index = {}
+    for item in data:
+        index.setdefault(item['id'], item)
+    return index
+
+
+def get_button_or_column_menu(data, flag, index=None):
+    """
+    只保留按钮/列字段及其所有上级菜单
+    index: 按 id 查找上级菜单的索引, 默认由 data 建立
+    按 id 建立索引向上查找, 已输出的节点不再重复查找; 输出顺序为每个按钮/列字段后紧跟其尚未输出的上级菜单(由近及远)
+    """
+    index = _build_item_index(data) if index is None else index
+    return_data = []
+    visited = set()
+    for item in data:
+        if flag not in str(item['id']):
+            continue
+        return_data.append(item)
+        parent_id = item['parent_id']
+        while parent_id is not None and parent_id not in visited and parent_id in index:
+            visited.add(parent_id)
+            parent = index[parent_id]
+            return_data.append(parent)
+            parent_id = parent['parent_id']
+    return return_data
@@ -9,13 +9,16 @@
 from typing import List
 
 from django.contrib.auth.hashers import make_password
+from django.db import transaction
 from django.shortcuts import get_object_or_404
+from fuadmin import settings
 from ninja import Field, ModelSchema, Query, Router, Schema
-from ninja.pagination import paginate
-from system.models import Users
-from utils.fu_crud import create, delete, retrieve
-from utils.fu_ninja import FuFilters, MyPagination
+from system.models import Post, Role, Users
+from utils.fu_crud import ImportSchema, add_batch_routes, create, delete, load_import_rows, retrieve, set_m2m
+from utils.fu_ninja import FuFilters, paginate_values
 from utils.fu_response import FuResponse
+from utils.password import hash_passwords
+from utils.response_cache import bump_model_version
 from utils.usual import get_user_info_from_token
 
 router = Router()
@@ -61,7 +64,7 @@ def create_user(request, data: SchemaIn):
     
     try:
         # 设置默认密码，使用 Django 的 make_password 进行哈希处理
-        default_password = '123456'
+        default_password = settings.USER_DEFAULT_PASSWORD
         payload_dict['password'] = make_password(default_password)
         logger.info(f"用户 '{payload_dict.get('username')}' 将使用默认密码进行创建")
         
@@ -80,11 +83,11 @@ def create_user(request, data: SchemaIn):
         
         # 设置多对多关系：岗位 (post) 和角色 (role)
         if post_ids:
-            user_instance.post.set(post_ids)
+            set_m2m(user_instance, 'post', post_ids)
             logger.info(f"用户ID {user_instance.id} 关联岗位: {post_ids}")
         
         if role_ids:
-            user_instance.role.set(role_ids)
+            set_m2m(user_instance, 'role', role_ids)
             logger.info(f"用户ID {user_instance.id} 关联角色: {role_ids}")
             
         logger.info(f"用户 '{user_instance.username}' (ID: {user_instance.id}) 及关联信息创建完成")
@@ -163,11 +166,11 @@ def update_user(request, user_id: int, payload: SchemaIn):
 
         # 更新多对多关系：岗位 (post) 和角色 (role)
         if post_ids is not None:
-            user_instance.post.set(post_ids)
+            set_m2m(user_instance, 'post', post_ids)
             logger.info(f"用户 {user_id} 的岗位已更新为: {post_ids}")
         
         if role_ids is not None:
-            user_instance.role.set(role_ids)
+            set_m2m(user_instance, 'role', role_ids)
             logger.info(f"用户 {user_id} 的角色已更新为: {role_ids}")
 
         logger.info(f"用户 '{user_instance.username}' (ID: {user_id}) 信息及关联更新完成")
@@ -181,8 +184,114 @@ def update_user(request, user_id: int, payload: SchemaIn):
         return FuResponse(code=500, msg=f"更新用户失败: {str(e)}")
 
 
+def _check_batch_delete(request, ids):
+    if get_user_info_from_token(request)['id'] in ids:
+        raise TimeoutError(400, "不能删除当前登录用户")
+
+
+# 批量更新只修改用户基本字段(如状态、部门), 岗位/角色仍通过 PUT /user/{id} 设置
+add_batch_routes(router, "/user", Users, SchemaIn, check_delete=_check_batch_delete)
+
+
+class UserBulkIn(SchemaIn):
+    password: str = Field(None, alias="password")
+
+
+# 导入Excel的列(表头为字段的 help_text)
+USER_IMPORT_FIELDS = ['username', 'name', 'mobile', 'email', 'gender']
+
+
+def bulk_create_users(request, rows):
+    """
+    批量创建用户: 一次校验用户名与关联的岗位/角色, 密码哈希在线程池中计算(默认密码只计算一次),
+    用户与岗位、角色关联均使用 bulk_create 写入, 在同一事务内完成。
+
+    参数:
+    - request: 请求对象，用于获取创建人信息。
+    - rows: UserBulkIn 或字典列表, 未提供 password 时使用 USER_DEFAULT_PASSWORD。
+
+    返回值:
+    - (创建的用户数, 错误列表[{'index', 'username', 'msg'}]); 有错误时不创建任何用户
+    """
+    rows = [row if isinstance(row, dict) else row.dict() for row in rows]
+    errors = []
+    usernames = [row.get('username') for row in rows]
+    seen = set()
+    existing = set(Users.objects.filter(username__in=[name for name in usernames if name])
+                   .values_list('username', flat=True))
+    post_ids = set(Post.objects.filter(id__in={pk for row in rows for pk in row.get('post') or []})
+                   .values_list('id', flat=True))
+    role_ids = set(Role.objects.filter(id__in={pk for row in rows for pk in row.get('role') or []})
+                   .values_list('id', flat=True))
+    for index, row in enumerate(rows):
+        username = row.get('username')
+        if not username or not row.get('name'):
+            errors.append({'index': index, 'username': username, 'msg': '用户账号和姓名不能为空'})
+        elif username in existing or username in seen:
+            errors.append({'index': index, 'username': username, 'msg': '用户账号已存在'})
+        elif not set(row.get('post') or []) <= post_ids or not set(row.get('role') or []) <= role_ids:
+            errors.append({'index': index, 'username': username, 'msg': '岗位或角色不存在'})
+        seen.add(username)
+    if errors:
+        return 0, errors
+
+    user_info = get_user_info_from_token(request)
+    passwords = hash_passwords([row.pop('password', None) or settings.USER_DEFAULT_PASSWORD for row in rows])
+    users = []
+    relations = []
+    for row, password in zip(rows, passwords):
+        relations.append((row.pop('post', None) or [], row.pop('role', None) or []))
+        row.update(password=password, creator_id=user_info['id'], modifier=user_info['name'],
+                   belong_dept=user_info['dept'])
+        users.append(Users(**row))
+    with transaction.atomic():
+        Users.objects.bulk_create(users, batch_size=1000)
+        if any(user.pk is None for user in users):
+            # 不支持返回主键的数据库(如 MySQL)按用户名回查
+            ids = dict(Users.objects.filter(username__in=usernames).values_list('username', 'id'))
+            for user in users:
+                user.pk = ids[user.username]
+        post_through = Users.post.through
+        role_through = Users.role.through
+        post_through.objects.bulk_create(
+            [post_through(users_id=user.pk, post_id=pk) for user, (posts, _) in zip(users, relations) for pk in posts],
+            batch_size=1000, ignore_conflicts=True)
+        role_through.objects.bulk_create(
+            [role_through(users_id=user.pk, role_id=pk) for user, (_, roles) in zip(users, relations) for pk in roles],
+            batch_size=1000, ignore_conflicts=True)
+        # bulk_create 不发送 post_save
+        bump_model_version(Users)
+    return len(users), errors
+
+
+@router.post("/user/batch/create")
+def batch_create_user(request, data: List[UserBulkIn]):
+    """
+    批量创建用户，未提供密码的用户使用默认密码。
+    任一用户校验失败时整批不创建，返回每条错误。
+    需要认证访问。
+    """
+    count, errors = bulk_create_users(request, data)
+    if errors:
+        return FuResponse(code=400, msg='用户数据校验失败', data=errors)
+    return {"count": count}
+
+
+@router.post("/user/all/import")
+def import_user(request, data: ImportSchema):
+    """
+    从Excel文件批量导入用户，列为 USER_IMPORT_FIELDS 对应的中文表头，密码为默认密码。
+    需要认证访问。
+    """
+    rows = [UserBulkIn(**row) for row in load_import_rows(Users, data, USER_IMPORT_FIELDS)]
+    count, errors = bulk_create_users(request, rows)
+    if errors:
+        return FuResponse(code=400, msg='用户数据校验失败', data=errors)
+    return FuResponse(msg=f'导入成功, 共 {count} 个用户')
+
+
 @router.get("/user", response=List[SchemaOut]) # 修改路由以匹配 /api/system/user
-@paginate(MyPagination)
+@paginate_values()
 def list_user(request, filters: Filters = Query(...)):
     """
     获取用户列表，支持通过用户名、昵称、手机号、邮箱、状态和部门ID进行过滤。
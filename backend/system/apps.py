@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class SystemConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'system'
+
+    def ready(self):
+        from system import signals  # noqa: F401
+        from utils.db_connection import connect_signals
+        from utils.response_cache import track_settings_models
+        connect_signals()
+        track_settings_models()
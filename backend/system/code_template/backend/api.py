@@ -19,9 +19,10 @@ def generator_backend_api(api_info):
     api_txt = f'''from typing import List
 from .model import {RuleConvert.to_upper_camel_case(api_info.code)}
 from ninja import Field, ModelSchema, Query, Router
-from ninja.pagination import paginate
 from utils.fu_crud import (
     ImportSchema,
+    add_batch_routes,
+    add_partial_update_route,
     create,
     delete,
     export_data,
@@ -29,7 +30,7 @@ from utils.fu_crud import (
     retrieve,
     update,
 )
-from utils.fu_ninja import FuFilters, MyPagination
+from utils.fu_ninja import FuFilters, paginate_values
 
 router = Router()
 
@@ -76,9 +77,19 @@ def update_{api_info.code}(request, id: int, data: {RuleConvert.to_upper_camel_c
     return {api_info.code}
 
 
+# 批量删除、批量更新{RuleConvert.to_upper_camel_case(api_info.code)}
+add_batch_routes(router, '/{api_info.code}', {RuleConvert.to_upper_camel_case(api_info.code)},
+                 {RuleConvert.to_upper_camel_case(api_info.code)}SchemaIn)
+
+
+# 部分更新{RuleConvert.to_upper_camel_case(api_info.code)}, 传入 update_datetime 时做版本冲突检测
+add_partial_update_route(router, '/{api_info.code}/{{id}}', {RuleConvert.to_upper_camel_case(api_info.code)},
+                         {RuleConvert.to_upper_camel_case(api_info.code)}SchemaIn)
+
+
 # 获取{RuleConvert.to_upper_camel_case(api_info.code)}
 @router.get('/{api_info.code}', response=List[{RuleConvert.to_upper_camel_case(api_info.code)}SchemaOut])
-@paginate(MyPagination)
+@paginate_values()
 def list_{api_info.code}(request, filters: Filters = Query(...)):
     qs = retrieve(request, {RuleConvert.to_upper_camel_case(api_info.code)}, filters)
     return qs
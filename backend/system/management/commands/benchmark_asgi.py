@@ -0,0 +1,99 @@
+import asyncio
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from asgiref.sync import ThreadSensitiveContext
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client
+
+from fuadmin.settings import SECRET_KEY, TOKEN_LIFETIME
+from system.apis.login import get_login_user_info
+from system.models import Users
+from utils.fu_jwt import FuJwt
+from utils.permission_version import get_token_versions
+
+
+def make_token(username):
+    """
+    与登录接口相同的方式为指定用户签发 token
+    """
+    user = Users.objects.get(username=username)
+    payload, roles, posts = get_login_user_info(user)
+    for field in ['password', 'avatar']:
+        payload.pop(field, None)
+    payload['role'] = [item['id'] for item in roles]
+    payload['post'] = [item['id'] for item in posts]
+    payload.update(get_token_versions(user.id))
+    time_now = int(datetime.now().timestamp())
+    jwt = FuJwt(SECRET_KEY, payload, valid_to=time_now + TOKEN_LIFETIME, id=uuid.uuid4().hex)
+    return f"bearer {jwt.encode()}"
+
+
+def summary(name, started, latencies, statuses):
+    elapsed = time.perf_counter() - started
+    latencies = sorted(latencies)
+    p50 = latencies[len(latencies) // 2] * 1000
+    p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+    print(f"  {name:<6}{len(latencies) / elapsed:>10.1f} req/s  p50 {p50:>8.1f} ms  p95 {p95:>8.1f} ms  "
+          f"status {dict(statuses)}")
+
+
+class Command(BaseCommand):
+    """
+    ASGI / WSGI 并发吞吐对比: python manage.py benchmark_asgi --path /api/system/monitor
+    WSGI 模式模拟 --threads 个工作线程的同步服务器, ASGI 模式在单个事件循环中并发 --concurrency 个请求
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', action='append', help='可多次指定, 默认对比监控、用户信息接口')
+        parser.add_argument('--username', default='superadmin')
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--threads', type=int, default=8)
+
+    def handle(self, *args, **options):
+        token = make_token(options['username'])
+        user_agent = 'Mozilla/5.0 (benchmark_asgi)'
+        total = options['requests']
+        for path in options['path'] or ['/api/system/monitor', '/api/system/userinfo']:
+            print(f"[{path}] {total} requests")
+            self.run_wsgi(path, {'HTTP_AUTHORIZATION': token, 'HTTP_USER_AGENT': user_agent},
+                          total, options['threads'])
+            # Django 4.0 的 AsyncClient 额外参数直接作为请求头名称
+            asyncio.run(self.run_asgi(path, {'authorization': token, 'user-agent': user_agent},
+                                      total, options['concurrency']))
+
+    def run_wsgi(self, path, headers, total, threads):
+        latencies, statuses = [], {}
+
+        def request(_):
+            client = Client()
+            begin = time.perf_counter()
+            response = client.get(path, **headers)
+            latencies.append(time.perf_counter() - begin)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(request, range(total)))
+        summary('WSGI', started, latencies, statuses)
+
+    async def run_asgi(self, path, headers, total, concurrency):
+        latencies, statuses = [], {}
+        semaphore = asyncio.Semaphore(concurrency)
+        client = AsyncClient()
+
+        async def request():
+            async with semaphore:
+                # 与 ASGIHandler 一致, 每个请求使用独立的同步线程上下文
+                async with ThreadSensitiveContext():
+                    begin = time.perf_counter()
+                    response = await client.get(path, **headers)
+                    latencies.append(time.perf_counter() - begin)
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*[request() for _ in range(total)])
+        summary('ASGI', started, latencies, statuses)
@@ -0,0 +1,85 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from utils.db_pool import ConnectionPool
+
+
+def ping(raw):
+    cursor = raw.cursor()
+    cursor.execute('SELECT 1')
+    cursor.fetchone()
+    cursor.close()
+
+
+class Command(BaseCommand):
+    """
+    数据库连接方式对比: python manage.py benchmark_db_connections
+    - connect: 每个请求新建连接(CONN_MAX_AGE=0)
+    - persistent: 持久连接 + 健康检查(CONN_MAX_AGE/CONN_HEALTH_CHECKS)
+    - pool: --threads 个线程共享连接池(ASGI)
+    每次操作执行一条 SELECT 1, 差值即连接握手开销
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--number', type=int, default=200)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--pool-size', type=int, default=4)
+
+    def handle(self, *args, **options):
+        wrapper = connections[options['database']]
+        params = wrapper.get_connection_params()
+        number = options['number']
+
+        def connect():
+            return wrapper.Database.connect(**params)
+
+        def run_connect():
+            raw = connect()
+            ping(raw)
+            raw.close()
+
+        persistent = connect()
+
+        def run_persistent():
+            # 健康检查 + 查询
+            ping(persistent)
+            ping(persistent)
+
+        pool = ConnectionPool(connect, max_size=options['pool_size'])
+
+        def run_pool(_=None):
+            raw = pool.acquire()
+            try:
+                ping(raw)
+            finally:
+                pool.release(raw)
+
+        results = {
+            'connect': self.timeit(run_connect, number),
+            'persistent': self.timeit(run_persistent, number),
+        }
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as executor:
+            list(executor.map(run_pool, range(number)))
+        results['pool'] = (time.perf_counter() - started) / number
+        stats = pool.stats()
+        persistent.close()
+        pool.close_all()
+
+        print(f"database: {options['database']} ({wrapper.vendor}), {number} ops")
+        for name, value in results.items():
+            print(f"  {name:<12}{value * 1000:>10.3f} ms/op{results['connect'] / value:>8.1f}x")
+        print(f"  handshake saved per request: {(results['connect'] - results['persistent']) * 1000:.3f} ms")
+        print(f"  pool: open {stats['open']} created {stats['created']} acquired {stats['acquired']} "
+              f"wait avg {stats['wait_time_avg_ms']} ms max {stats['wait_time_max_ms']} ms")
+
+    @staticmethod
+    def timeit(func, number):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        return (time.perf_counter() - started) / number
@@ -0,0 +1,44 @@
+import os
+import time
+from concurrent.futures import wait
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+
+from fuadmin import settings
+from utils.password import _verify, get_executor
+
+
+class Command(BaseCommand):
+    """
+    登录密码校验吞吐量: python manage.py benchmark_password [--number 40]
+    对比单线程逐个校验与 PASSWORD_HASH_WORKERS 线程池并发校验, 用于确定 PASSWORD_HASH_ITERATIONS、PASSWORD_HASH_WORKERS
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--number', type=int, default=40)
+        parser.add_argument('--password', type=str, default='123456')
+
+    def handle(self, *args, **options):
+        number = options['number']
+        password = options['password']
+        encoded = make_password(password)
+        workers = getattr(settings, 'PASSWORD_HASH_WORKERS', 4)
+        cores = os.cpu_count() or 1
+        print(f"hasher: {encoded.split('$', 2)[0]}, iterations: {encoded.split('$', 2)[1]}, "
+              f"workers: {workers}, cpu: {cores}")
+
+        start = time.perf_counter()
+        for _ in range(number):
+            _verify(password, encoded)
+        serial = number / (time.perf_counter() - start)
+
+        executor = get_executor()
+        wait([executor.submit(_verify, password, encoded) for _ in range(workers)])
+        start = time.perf_counter()
+        wait([executor.submit(_verify, password, encoded) for _ in range(number)])
+        pooled = number / (time.perf_counter() - start)
+
+        print(f"  {'serial':<10}{serial:>10.1f} logins/s{1000 / serial:>10.1f} ms/op")
+        print(f"  {'pool':<10}{pooled:>10.1f} logins/s{pooled / min(workers, cores):>10.1f} logins/s/core"
+              f"{pooled / serial:>8.1f}x")
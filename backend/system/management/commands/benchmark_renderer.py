@@ -0,0 +1,74 @@
+import json
+import timeit
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+from ninja.responses import NinjaJSONEncoder
+
+from utils.fu_jwt import DateEncoder
+from utils.fu_renderer import json_dumps, orjson
+
+
+def menu_tree_payload(depth=4, width=6):
+    """
+    模拟菜单树: width^depth 个节点
+    """
+    def build(level, parent_id):
+        nodes = []
+        for index in range(width):
+            node_id = parent_id * 10 + index + 1
+            node = {
+                'id': node_id, 'parent_id': parent_id or None, 'title': f'菜单{node_id}', 'icon': 'ant-design:book',
+                'path': f'/menu/{node_id}', 'component': 'LAYOUT', 'type': 1, 'sort': index, 'status': True,
+                'create_datetime': datetime.now(), 'choice': 0,
+            }
+            if level < depth:
+                node['children'] = build(level + 1, node_id)
+            nodes.append(node)
+        return nodes
+
+    return build(1, 0)
+
+
+def list_payload(rows=10000):
+    """
+    模拟分页列表: rows 行
+    """
+    now = datetime.now()
+    return {
+        'items': [{
+            'id': i, 'name': f'名称{i}', 'code': f'code_{i}', 'status': i % 2, 'sort': i, 'remark': None,
+            'creator': 'superadmin', 'create_datetime': now, 'update_datetime': now,
+        } for i in range(rows)],
+        'total': rows,
+    }
+
+
+class Command(BaseCommand):
+    """
+    JSON 渲染性能对比: python manage.py benchmark_renderer
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--number', type=int, default=20)
+
+    def handle(self, *args, **options):
+        number = options['number']
+        payloads = {
+            'menu-tree': {'code': 2000, 'result': menu_tree_payload(), 'message': 'success', 'success': True},
+            f"list-{options['rows']}": {'code': 2000, 'result': list_payload(options['rows']),
+                                        'message': 'success', 'success': True},
+        }
+        print(f"renderer backend: {'orjson' if orjson else 'json'}")
+        for name, payload in payloads.items():
+            results = {
+                'DateEncoder': timeit.timeit(lambda: json.dumps(payload, cls=DateEncoder), number=number),
+                'NinjaJSONEncoder': timeit.timeit(lambda: json.dumps(payload, cls=NinjaJSONEncoder), number=number),
+                'fu_renderer': timeit.timeit(lambda: json_dumps(payload), number=number),
+            }
+            size = len(json_dumps(payload))
+            print(f"[{name}] {size} bytes")
+            for key, value in results.items():
+                print(f"  {key:<18}{value / number * 1000:>10.2f} ms/op"
+                      f"{results['DateEncoder'] / value:>8.1f}x")
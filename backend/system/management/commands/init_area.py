@@ -7,54 +7,96 @@
 """
 import json
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 
 import django
 import pypinyin
 from django.core.management import BaseCommand
-from django.db import connection
+from django.db import connection, transaction
 
 from fuadmin.settings import BASE_DIR
 from system.models import Area
+from utils.response_cache import bump_model_version
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'application.settings')
 django.setup()
 
-area_code_list = []
+AREA_FIELDS = ['name', 'level', 'pinyin', 'initials', 'pcode_id']
 
 
-def area_list(code_list, pcode=None, depth=1):
+@lru_cache(maxsize=None)
+def get_pinyin(name):
     """
-    递归获取所有列表
+    按整个名称缓存拼音: 多音字依赖词组判断(如 重庆), 不能按单字缓存; 同名地区(如 市辖区、城关镇)只计算一次
     """
-    for code_dict in code_list:
+    return ''.join([''.join(i) for i in pypinyin.pinyin(name, style=pypinyin.NORMAL)])
+
+
+def get_pinyin_map(names, workers=1):
+    """
+    计算所有不重复名称的拼音, workers > 1 时分配到多个进程(乡级等数据量大时使用)
+    """
+    names = sorted(set(names))
+    if workers > 1 and len(names) > workers:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pinyins = list(executor.map(get_pinyin, names, chunksize=max(1, len(names) // (workers * 4))))
+    else:
+        pinyins = [get_pinyin(name) for name in names]
+    return dict(zip(names, pinyins))
+
+
+def area_list(code_list, pcode=None, depth=1, result=None):
+    """
+    展开为列表, 返回 [{name, code, level, pcode_id}]
+    """
+    result = [] if result is None else result
+    stack = [(code_dict, pcode, depth) for code_dict in reversed(code_list)]
+    while stack:
+        code_dict, parent, level = stack.pop()
         code = code_dict.get('code', None)
-        name = code_dict.get('name', None)
-        children = code_dict.get('children', None)
-        pinyin = ''.join([''.join(i) for i in pypinyin.pinyin(name, style=pypinyin.NORMAL)])
-        area_code_list.append(
-            {
-                "name": name,
-                "code": code,
-                "level": depth,
-                "pinyin": pinyin,
-                "initials": pinyin[0].upper() if pinyin else "#",
-                "pcode_id": pcode,
-            }
-        )
-        if children:
-            area_list(code_list=children, pcode=code, depth=depth + 1)
-
-
-def main():
-    with open(os.path.join(BASE_DIR, 'utils', 'pca-code.json'), 'r',encoding="utf-8") as load_f:
+        result.append({
+            "name": code_dict.get('name', None),
+            "code": code,
+            "level": level,
+            "pcode_id": parent,
+        })
+        stack.extend((child, code, level + 1) for child in reversed(code_dict.get('children') or []))
+    return result
+
+
+def main(workers=1, batch_size=1000):
+    """
+    与已有数据比较, 新增的 bulk_create, 有变化的 bulk_update, 在同一事务中完成
+    :return: (新增数, 更新数, 未变化数)
+    """
+    with open(os.path.join(BASE_DIR, 'utils', 'pca-code.json'), 'r', encoding="utf-8") as load_f:
         code_list = json.load(load_f)
-    area_list(code_list)
-    if Area.objects.count() == 0:
-        Area.objects.bulk_create([Area(**ele) for ele in area_code_list])
-    else:
-        for ele in area_code_list:
-            code = ele.pop("code")
-            Area.objects.update_or_create(code=code, defaults=ele)
+    area_code_list = area_list(code_list)
+    pinyin_map = get_pinyin_map([ele['name'] for ele in area_code_list if ele['name']], workers)
+    for ele in area_code_list:
+        pinyin = pinyin_map.get(ele['name'], '')
+        ele['pinyin'] = pinyin
+        ele['initials'] = pinyin[0].upper() if pinyin else "#"
+
+    existing = {row['code']: row for row in Area.objects.values('id', 'code', *AREA_FIELDS)}
+    created = []
+    updated = []
+    for ele in area_code_list:
+        row = existing.get(ele['code'])
+        if row is None:
+            created.append(Area(**ele))
+        elif any(row[field] != ele[field] for field in AREA_FIELDS):
+            updated.append(Area(id=row['id'], **ele))
+    with transaction.atomic():
+        Area.objects.bulk_create(created, batch_size=batch_size)
+        Area.objects.bulk_update(updated, AREA_FIELDS, batch_size=batch_size)
+        # bulk_create/bulk_update 不经过 save, 统一计算树路径
+        Area.rebuild_tree(batch_size=batch_size)
+        if created or updated:
+            bump_model_version(Area)
+    return len(created), len(updated), len(area_code_list) - len(created) - len(updated)
 
 
 class Command(BaseCommand):
@@ -63,21 +105,27 @@ class Command(BaseCommand):
     """
 
     def add_arguments(self, parser):
-        pass
+        parser.add_argument('--workers', type=int, default=1, help='计算拼音的进程数')
+        parser.add_argument('--batch-size', type=int, default=1000)
 
     def handle(self, *args, **options):
 
         print(f"正在准备初始化省份数据...")
 
+        def run():
+            start = time.perf_counter()
+            created, updated, unchanged = main(options['workers'], options['batch_size'])
+            print(f"新增 {created}, 更新 {updated}, 未变化 {unchanged}, 耗时 {time.perf_counter() - start:.2f}s")
+
         if hasattr(connection, 'tenant') and connection.tenant.schema_name:
             from django_tenants.utils import get_tenant_model
             from django_tenants.utils import tenant_context,schema_context
             for tenant in get_tenant_model().objects.exclude(schema_name='public'):
                 with tenant_context(tenant):
                     print(f"租户[{connection.tenant.schema_name}]初始化数据开始...")
-                    main()
+                    run()
                     print(f"租户[{connection.tenant.schema_name}]初始化数据完成！")
         else:
-            main()
+            run()
         print("省份数据初始化数据完成！")
 
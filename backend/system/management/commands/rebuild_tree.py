@@ -0,0 +1,28 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from utils.models import TreeModel
+
+
+class Command(BaseCommand):
+    """
+    回填/重建树形模型的物化路径: python manage.py rebuild_tree [Menu Area ...]
+    migrate 后会自动回填 tree_path 为空的数据; bulk_create 等绕过 save 的导入后、或需要校正全部路径时手动执行
+    """
+    help = '按 parent 关系重建树形模型的 tree_path、tree_depth'
+
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*', type=str, help='模型名, 不传时重建所有树形模型')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        tree_models = {model.__name__: model for model in apps.get_models() if issubclass(model, TreeModel)}
+        names = options['models'] or list(tree_models)
+        unknown = [name for name in names if name not in tree_models]
+        if unknown:
+            raise CommandError(f"不是树形模型: {', '.join(unknown)}, 可选: {', '.join(tree_models)}")
+        for name in names:
+            with transaction.atomic():
+                count = tree_models[name].rebuild_tree(batch_size=options['batch_size'])
+            self.stdout.write(f"{name}: 更新 {count} 个节点")
@@ -3,7 +3,7 @@ import os
 
 from django.contrib.auth.models import AbstractUser
 from django.db import models
-from utils.models import CoreModel
+from utils.models import CoreModel, TreeModel
 
 STATUS_CHOICES = (
     (0, "禁用"),
@@ -123,7 +123,7 @@ class Button(CoreModel):
         ordering = ('sort',)
 
 
-class Menu(CoreModel):
+class Menu(TreeModel):
     parent = models.ForeignKey(to='Menu', on_delete=models.CASCADE, verbose_name="上级菜单", null=True, blank=True,
                                db_constraint=False, help_text="上级菜单")
     icon = models.CharField(max_length=64, default='ant-design:book-outlined', verbose_name="菜单图标",
@@ -223,7 +223,7 @@ class DictItem(CoreModel):
         ordering = ('sort',)
 
 
-class CategoryDict(CoreModel):
+class CategoryDict(TreeModel):
     label = models.CharField(max_length=100, blank=True, null=True, verbose_name="显示名称", help_text="显示名称")
     value = models.CharField(max_length=100, blank=True, null=True, verbose_name="实际值", help_text="实际值")
     code = models.CharField(max_length=100, unique=True, blank=True, null=True, verbose_name="编码", help_text="编码")
@@ -285,7 +285,9 @@ class File(CoreModel):
         ordering = ('-create_datetime',)
 
 
-class Area(CoreModel):
+class Area(TreeModel):
+    tree_parent_field = 'pcode'
+
     name = models.CharField(max_length=100, verbose_name="名称", help_text="名称")
     code = models.CharField(max_length=20, verbose_name="地区编码", help_text="地区编码", unique=True, db_index=True)
     level = models.BigIntegerField(verbose_name="地区层级(1省份 2城市 3区县 4乡级)",
@@ -326,7 +328,7 @@ class ApiWhiteList(CoreModel):
         ordering = ('-create_datetime',)
 
 
-class SystemConfig(CoreModel):
+class SystemConfig(TreeModel):
     parent = models.ForeignKey(to='self', verbose_name='父级', on_delete=models.CASCADE,
                                db_constraint=False, null=True, blank=True, help_text="父级")
     title = models.CharField(max_length=50, verbose_name="标题", help_text="标题")
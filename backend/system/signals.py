@@ -0,0 +1,122 @@
+"""
+权限相关模型变更时递增权限版本号, 使已签发 token 中的权限信息失效
+模型变更时递增模型版本号, 使响应缓存失效
+"""
+from django.apps import apps
+from django.db import connections, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from system.models import Menu, MenuButton, MenuColumnField, Role, Users
+from utils.fu_crud import batch_updated, m2m_assigned
+from utils.models import TreeModel
+from utils.permission_version import bump_global_version, bump_user_version
+from utils.response_cache import bump_model_version
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+@receiver(post_save, sender=Menu)
+@receiver(post_delete, sender=Menu)
+@receiver(post_save, sender=MenuButton)
+@receiver(post_delete, sender=MenuButton)
+@receiver(post_save, sender=MenuColumnField)
+@receiver(post_delete, sender=MenuColumnField)
+@receiver(batch_updated, sender=Role)
+@receiver(batch_updated, sender=Menu)
+@receiver(batch_updated, sender=MenuButton)
+@receiver(batch_updated, sender=MenuColumnField)
+def permission_changed(sender, **kwargs):
+    bump_global_version()
+
+
+@receiver(m2m_assigned, sender=Role.menu.through)
+@receiver(m2m_assigned, sender=Role.permission.through)
+@receiver(m2m_assigned, sender=Role.column.through)
+@receiver(m2m_assigned, sender=Role.dept.through)
+def role_permission_assigned(sender, **kwargs):
+    bump_global_version()
+
+
+@receiver(m2m_changed, sender=Role.menu.through)
+@receiver(m2m_changed, sender=Role.permission.through)
+@receiver(m2m_changed, sender=Role.column.through)
+@receiver(m2m_changed, sender=Role.dept.through)
+def role_permission_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_global_version()
+
+
+@receiver(post_save, sender=Users)
+@receiver(post_delete, sender=Users)
+def user_changed(sender, instance, **kwargs):
+    bump_user_version(instance.id)
+
+
+@receiver(batch_updated, sender=Users)
+def users_batch_updated(sender, ids, **kwargs):
+    bump_user_version(*ids)
+
+
+@receiver(m2m_assigned, sender=Users.role.through)
+def user_role_assigned(sender, instance, **kwargs):
+    bump_user_version(instance.id)
+
+
+@receiver(m2m_changed, sender=Users.role.through)
+def user_role_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        bump_user_version(instance.id)
+    elif action == 'pre_clear':
+        bump_user_version(*instance.users_set.values_list('id', flat=True))
+    else:
+        bump_user_version(*(pk_set or []))
+
+
+@receiver(batch_updated)
+def model_changed(sender, **kwargs):
+    # 递增模型版本号使响应缓存失效, 未在 RESPONSE_CACHE_MODELS 中登记的模型在 bump_model_version 中忽略
+    # post_save/post_delete 由 response_cache.track_models 按模型连接
+    bump_model_version(sender)
+
+
+@receiver(m2m_changed)
+def model_relation_changed(sender, instance, action, model, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_model_version(type(instance), model)
+
+
+@receiver(m2m_assigned)
+def model_relation_assigned(sender, instance, model, **kwargs):
+    bump_model_version(type(instance), model)
+
+
+@receiver(batch_updated)
+def tree_parent_updated(sender, ids, fields, **kwargs):
+    # queryset.update 修改了上级节点时, 逐个节点重新计算自身及子孙的树路径
+    if not issubclass(sender, TreeModel):
+        return
+    field = sender._meta.get_field(sender.tree_parent_field)
+    if not {field.name, field.attname} & set(fields):
+        return
+    for pk in ids:
+        # 逐个重新读取, 前一个节点的移动可能已改变后续节点的路径
+        node = sender.objects.filter(pk=pk).first()
+        if node is not None:
+            node.save(update_fields=[field.attname])
+
+
+@receiver(post_migrate)
+def backfill_tree_path(sender, using, **kwargs):
+    # migrate 后回填还没有物化路径的节点(新增 tree_path 字段前已存在的数据), 已回填时只有一条 exists 查询
+    if sender.name != 'system':
+        return
+    tables = set(connections[using].introspection.table_names())
+    for model in apps.get_models():
+        if not issubclass(model, TreeModel) or model._meta.db_table not in tables:
+            continue
+        if model.objects.using(using).filter(tree_path='').exists():
+            with transaction.atomic(using=using):
+                model.rebuild_tree(using=using)
@@ -1,14 +1,1136 @@
-from django.test import TestCase
+import decimal
+import json
+import uuid
+from datetime import date, datetime
+from unittest import mock, skipIf, skipUnless
 
-# Create your tests here.
-def debug(func):
-    def wrapper():
-        print("[DEBUG]: enter {}()".format(func.__name__))
-        return func()
-    return wrapper
+import django
+from asgiref.sync import async_to_sync
+from django.apps import apps
+from django.contrib.auth.hashers import check_password, identify_hasher, make_password
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.http import HttpResponse
+from django.test import AsyncClient, Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from ninja import ModelSchema
 
-@debug
-def hello():
-    print("hello")
+from fuadmin.api import api
+from fuadmin.settings import SECRET_KEY, TOKEN_LIFETIME
+from system.apis import role as role_api
+from system.management.commands import init_area
+from system.apis.login import get_login_user_info
+from system.models import (
+    Area, CategoryDict, Dept, Dict, DictItem, LoginLog, Menu, MenuButton, MenuColumnField, OperationLog, Post, Role, Users,
+)
+from system.signals import backfill_tree_path
+from utils.core_initialize import CoreInitialize
+from utils.db_connection import get_connection_stats, health_check_connections
+from utils.db_router import PRIMARY_DATABASE, ReplicaRouter, ReplicaRoutingMiddleware, use_replica
+from utils.fu_crud import m2m_assigned, set_m2m
+from utils.fu_jwt import FuJwt, TokenCache, token_cache
+from utils.fu_ninja import (
+    TRANSACTION_ATOMIC,
+    TRANSACTION_NONE,
+    TRANSACTION_READ_ONLY,
+    FuRouter,
+    apply_transaction_policy,
+    get_schema_columns,
+    get_transaction_policy,
+    schema_values,
+    transaction_policy,
+)
+from utils.fu_renderer import _StdlibEncoder, json_dumps
+from utils.fu_response import FuResponse
+from utils import permission_version, response_cache
+from utils.password import FuPBKDF2PasswordHasher, averify_password, hash_passwords, verify_password
+from utils.permission_version import get_auth_context, get_token_versions
+from utils.rate_limit import RATE_LIMIT_KEY, TOKEN_BUCKET_SCRIPT, TokenBucketLimiter
+from utils.response_cache import bump_model_version, get_model_version, require_tracked
+from utils.token_revocation import REVOKED_KEY_PREFIX, BloomFilter, TokenRevocation
 
-hello()
\ No newline at end of file
+try:
+    import lupa
+except ImportError:
+    lupa = None
+
+
+def make_token(user, lifetime=TOKEN_LIFETIME):
+    """
+    按登录接口的方式为用户签发 token
+    """
+    payload, roles, posts = get_login_user_info(user)
+    payload['role'] = [item['id'] for item in roles]
+    payload['post'] = [item['id'] for item in posts]
+    for field in ('password', 'avatar', 'groups', 'user_permissions'):
+        payload.pop(field, None)
+    payload.update(get_token_versions(user.id))
+    valid_to = int(datetime.now().timestamp()) + lifetime
+    return f"bearer {FuJwt(SECRET_KEY, payload, valid_to=valid_to, id=uuid.uuid4().hex).encode()}"
+
+
+def make_client(user):
+    return Client(HTTP_AUTHORIZATION=make_token(user), HTTP_USER_AGENT='Mozilla/5.0')
+
+
+def get_result(response):
+    content = json.loads(response.content)
+    return content['code'], content['result']
+
+
+def get_operation(router, path, method):
+    for operation in router.path_operations[path].operations:
+        if method in operation.methods:
+            apply_transaction_policy(operation, get_transaction_policy(operation, router))
+            return operation
+    raise AssertionError(f"{method} {path} 不存在")
+
+
+class TransactionPolicyTest(TestCase):
+    """
+    接口事务策略: 写接口失败回滚、只读接口拒绝写入、异步接口不包装
+    """
+
+    def setUp(self):
+        router = FuRouter()
+
+        @router.post("/write")
+        def write(request):
+            Dict.objects.create(name='tx_write', code='tx_write')
+            raise ValueError('写入后失败')
+
+        @router.get("/read")
+        def read(request):
+            return Dict.objects.filter(code='tx_read').count()
+
+        @router.get("/read/write")
+        def read_write(request):
+            Dict.objects.create(name='tx_read_write', code='tx_read_write')
+
+        @router.get("/read/only")
+        @transaction_policy(TRANSACTION_READ_ONLY)
+        def read_only(request):
+            Dict.objects.create(name='tx_read_only', code='tx_read_only')
+
+        @router.post("/async")
+        async def write_async(request):
+            return None
+
+        self.router = router
+
+    def test_write_endpoint_rolls_back(self):
+        operation = get_operation(self.router, "/write", "POST")
+        self.assertEqual(get_transaction_policy(operation, self.router), TRANSACTION_ATOMIC)
+        with self.assertRaises(ValueError):
+            operation.view_func(None)
+        self.assertFalse(Dict.objects.filter(code='tx_write').exists())
+
+    def test_read_endpoint_has_no_guard_by_default(self):
+        operation = get_operation(self.router, "/read/write", "GET")
+        self.assertEqual(get_transaction_policy(operation, self.router), TRANSACTION_NONE)
+        operation.view_func(None)
+        self.assertTrue(Dict.objects.filter(code='tx_read_write').exists())
+
+    def test_read_only_endpoint_rejects_writes(self):
+        self.assertEqual(get_operation(self.router, "/read", "GET").view_func(None), 0)
+        operation = get_operation(self.router, "/read/only", "GET")
+        with self.assertRaises(TimeoutError) as context, transaction.atomic():
+            operation.view_func(None)
+        self.assertEqual(context.exception.args[0], 500)
+        self.assertFalse(Dict.objects.filter(code='tx_read_only').exists())
+
+    def test_async_endpoint_is_not_wrapped(self):
+        operation = get_operation(self.router, "/async", "POST")
+        self.assertFalse(getattr(operation.view_func, '_transaction_applied', False))
+
+
+class PartialUpdatePermissionTest(TestCase):
+    """
+    非超级管理员的 PATCH 部分更新沿用 PUT 的接口权限
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.dict = Dict.objects.create(name='patch', code='patch')
+        menu = Menu.objects.create(title='字典管理', name='dict', type=1)
+        button = MenuButton.objects.create(menu=menu, name='编辑', code='dict:update',
+                                           api='/api/system/dict/{dict_id}', method=2)
+        role = Role.objects.create(name='字典编辑', code='dict_editor', data_range=4)
+        role.permission.add(button)
+        self.user = Users.objects.create(username='test', name='test')
+        self.user.role.add(role)
+
+    def patch(self, user, data):
+        return make_client(user).patch(f'/api/system/dict/{self.dict.id}', json.dumps({'data': data}),
+                                       content_type='application/json')
+
+    def test_patch_with_put_permission(self):
+        code, result = get_result(self.patch(self.user, {'name': 'patched'}))
+        self.assertEqual(code, 2000)
+        self.assertEqual(result['id'], self.dict.id)
+        self.dict.refresh_from_db()
+        self.assertEqual(self.dict.name, 'patched')
+
+    def test_patch_without_permission(self):
+        user = Users.objects.create(username='guest', name='guest')
+        code, _ = get_result(self.patch(user, {'name': 'patched'}))
+        self.assertEqual(code, 403)
+        self.dict.refresh_from_db()
+        self.assertEqual(self.dict.name, 'patch')
+
+
+class PartialUpdateTest(TestCase):
+    """
+    部分更新: update_datetime 版本冲突返回 409, 未声明的字段返回 400
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = make_client(Users.objects.create_superuser('admin', password='123456', name='admin'))
+        self.dict = Dict.objects.create(name='patch', code='patch')
+
+    def patch(self, data, version=None):
+        return get_result(self.client.patch(f'/api/system/dict/{self.dict.id}',
+                                            json.dumps({'data': data, 'update_datetime': version}),
+                                            content_type='application/json'))
+
+    def test_patch_with_current_version(self):
+        version = self.dict.update_datetime.isoformat(' ')
+        code, result = self.patch({'name': 'v1'}, version)
+        self.assertEqual(code, 2000)
+        self.dict.refresh_from_db()
+        self.assertEqual(self.dict.name, 'v1')
+        self.assertEqual(result['update_datetime'], self.dict.update_datetime.isoformat(' '))
+
+    def test_patch_with_stale_version(self):
+        version = self.dict.update_datetime.isoformat(' ')
+        self.assertEqual(self.patch({'name': 'v1'}, version)[0], 2000)
+        self.assertEqual(self.patch({'name': 'v2'}, version)[0], 409)
+        self.dict.refresh_from_db()
+        self.assertEqual(self.dict.name, 'v1')
+
+    def test_patch_with_invalid_field(self):
+        response = self.client.patch(f'/api/system/dict/{self.dict.id}', json.dumps({'data': {'unknown': 1}}),
+                                     content_type='application/json')
+        content = json.loads(response.content)
+        self.assertEqual(content['code'], 400)
+        self.assertIn('更新字段无效: unknown', content['message'])
+        self.assertNotIn('批量', content['message'])
+
+
+class BatchRoutesTest(TestCase):
+    """
+    批量删除/更新: 单条语句处理、返回统一响应结构、业务校验
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.admin = Users.objects.create_superuser('admin', password='123456', name='admin')
+        self.client = make_client(self.admin)
+
+    def post(self, path, data):
+        return get_result(self.client.post(path, json.dumps(data), content_type='application/json'))
+
+    def put(self, path, data):
+        return get_result(self.client.put(path, json.dumps(data), content_type='application/json'))
+
+    def test_batch_update_and_delete(self):
+        ids = [Dict.objects.create(name=f'batch{i}', code=f'batch{i}').id for i in range(3)]
+        self.assertEqual(self.put('/api/system/dict/batch/update', {'ids': ids, 'data': {'status': False}}),
+                         (2000, {'count': 3}))
+        self.assertEqual(Dict.objects.filter(id__in=ids, status=False).count(), 3)
+        self.assertEqual(self.post('/api/system/dict/batch/delete', {'ids': ids + [0]}), (2000, {'count': 3}))
+        self.assertFalse(Dict.objects.filter(id__in=ids).exists())
+
+    def test_batch_update_rejects_m2m_and_unique_fields(self):
+        ids = [Users.objects.create(username=f'batch{i}', name='batch').id for i in range(2)]
+        self.assertEqual(self.put('/api/system/user/batch/update', {'ids': ids, 'data': {'role': []}})[0], 400)
+        self.assertEqual(self.put('/api/system/user/batch/update', {'ids': ids, 'data': {'username': 'x'}})[0], 400)
+        self.assertEqual(Users.objects.filter(username='x').count(), 0)
+
+    def test_user_batch_delete_keeps_current_user(self):
+        user = Users.objects.create(username='batch', name='batch')
+        self.assertEqual(self.post('/api/system/user/batch/delete', {'ids': [user.id, self.admin.id]})[0], 400)
+        self.assertEqual(Users.objects.filter(id__in=[user.id, self.admin.id]).count(), 2)
+
+    def test_menu_batch_delete_requires_children(self):
+        root = Menu.objects.create(title='root', name='root', type=0)
+        child = Menu.objects.create(title='child', name='child', type=1, parent=root)
+        self.assertEqual(self.post('/api/system/menu/batch/delete', {'ids': [root.id]})[0], 400)
+        self.assertEqual(self.post('/api/system/menu/batch/delete', {'ids': [root.id, child.id]}),
+                         (2000, {'count': 2}))
+
+
+class TreePathTest(TestCase):
+    """
+    物化路径: 移动节点时更新子孙路径、接口不输出内部字段、migrate 后回填空路径
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.root = Menu.objects.create(title='root', name='root', type=0)
+        self.mid = Menu.objects.create(title='mid', name='mid', type=0, parent=self.root)
+        self.leaf = Menu.objects.create(title='leaf', name='leaf', type=1, parent=self.mid)
+
+    def test_move_subtree(self):
+        other = Menu.objects.create(title='other', name='other', type=0)
+        self.mid.parent = other
+        self.mid.save()
+        self.leaf.refresh_from_db()
+        self.assertEqual(self.leaf.tree_path, f'/{other.id}/{self.mid.id}/{self.leaf.id}/')
+        self.assertEqual(self.leaf.tree_depth, 2)
+        self.assertEqual(list(Menu.objects.ancestors(self.leaf).values_list('id', flat=True)), [other.id, self.mid.id])
+
+    def test_move_under_descendant_rejected(self):
+        self.root.parent = self.leaf
+        with self.assertRaises(TimeoutError), transaction.atomic():
+            self.root.save()
+
+    def test_api_hides_tree_fields(self):
+        client = make_client(Users.objects.create_superuser('admin', password='123456', name='admin'))
+        code, tree = get_result(client.get('/api/system/menu'))
+        self.assertEqual(code, 2000)
+        self.assertNotIn('tree_path', tree[0])
+        self.assertNotIn('tree_depth', tree[0]['children'][0])
+        detail = json.loads(client.get(f'/api/system/menu/{self.leaf.id}').content)['result']
+        self.assertEqual(detail['id'], self.leaf.id)
+        self.assertNotIn('tree_path', detail)
+
+    def test_backfill_after_migrate(self):
+        Menu.objects.update(tree_path='', tree_depth=0)
+        backfill_tree_path(sender=apps.get_app_config('system'), using='default')
+        self.leaf.refresh_from_db()
+        self.assertEqual(self.leaf.tree_path, f'/{self.root.id}/{self.mid.id}/{self.leaf.id}/')
+        self.assertEqual(self.leaf.tree_depth, 2)
+
+
+@override_settings(API_LOG_ENABLE=False)
+class PaginateValuesTest(TestCase):
+    """
+    列表接口 values 快速路径: 输出与常规 schema 校验路径一致, 支持稀疏字段
+    关闭操作日志, 避免前一次请求写入的日志改变 operation_log 列表
+    """
+
+    def setUp(self):
+        cache.clear()
+        dept = Dept.objects.create(name='dept')
+        Dept.objects.create(name='child', parent=dept)
+        post = Post.objects.create(name='post', code='post')
+        menu = Menu.objects.create(title='menu', name='menu', type=1)
+        button = MenuButton.objects.create(menu=menu, name='list', code='list', api='/api/system/dict', method=0)
+        column = MenuColumnField.objects.create(menu=menu, name='name', code='name')
+        role = Role.objects.create(name='role', code='role', data_range=4)
+        role.menu.add(menu)
+        role.permission.add(button)
+        role.column.add(column)
+        role.dept.add(dept)
+        self.user = Users.objects.create_superuser('admin', password='123456', name='admin', dept=dept)
+        self.user.post.add(post)
+        self.user.role.add(role)
+        self.dict = Dict.objects.create(name='dict', code='dict', remark='remark')
+        DictItem.objects.create(dict=self.dict, label='item', value='1', sort=1)
+        parent = CategoryDict.objects.create(label='parent', value='parent', code='parent')
+        CategoryDict.objects.create(label='child', value='child', code='child', parent=parent)
+        LoginLog.objects.create(username='admin', ip='127.0.0.1', browser='Chrome')
+        OperationLog.objects.create(request_username='admin', request_path='/api/system/dict', request_method='GET')
+        self.client = make_client(self.user)
+
+    def get_list_urls(self):
+        for prefix, router in api._routers:
+            for path, path_view in router.path_operations.items():
+                if '{' in path:
+                    continue
+                for operation in path_view.operations:
+                    if getattr(operation.view_func, '_paginate_values', None):
+                        yield f"/api/{prefix}{path}".replace('//', '/')
+
+    def test_values_path_matches_schema_output(self):
+        urls = list(self.get_list_urls())
+        self.assertIn('/api/system/dict', urls)
+        for url in urls:
+            with self.subTest(url=url):
+                cache.clear()
+                fast = json.loads(self.client.get(url).content)
+                cache.clear()
+                with mock.patch('utils.fu_ninja.get_schema_columns', return_value=None):
+                    normal = json.loads(self.client.get(url).content)
+                self.assertEqual(fast['code'], 2000)
+                self.assertEqual(fast, normal)
+
+    def test_sparse_fields(self):
+        code, result = get_result(self.client.get('/api/system/dict', {'fields': 'id,name'}))
+        self.assertEqual(code, 2000)
+        self.assertEqual(result['items'], [{'id': self.dict.id, 'name': 'dict'}])
+        code, result = get_result(self.client.get(f'/api/system/dict/{self.dict.id}', {'fields': 'id,code'}))
+        self.assertEqual(result, {'id': self.dict.id, 'code': 'dict'})
+
+    def test_invalid_sparse_field(self):
+        code, _ = get_result(self.client.get('/api/system/dict', {'fields': 'id,password'}))
+        self.assertEqual(code, 400)
+
+    def test_fields_declared_in_openapi(self):
+        schema = api.get_openapi_schema()
+        for url in self.get_list_urls():
+            parameters = schema['paths'][url]['get']['parameters']
+            self.assertIn('fields', [item['name'] for item in parameters], url)
+
+
+@skipIf(django.VERSION >= (4, 1), 'Django 4.1 起使用内置的 CONN_HEALTH_CHECKS')
+class ConnectionHealthCheckTest(TestCase):
+    """
+    连接健康检查: 请求开始只做标记, 首次使用连接时检查一次, 不可用则关闭重连
+    """
+
+    def setUp(self):
+        self.connection = connections.create_connection(DEFAULT_DB_ALIAS)
+        self.connection.settings_dict = dict(self.connection.settings_dict, CONN_HEALTH_CHECKS=True)
+        self.connection.ensure_connection()
+
+    def tearDown(self):
+        self.connection.close()
+
+    def get_failures(self):
+        return get_connection_stats()[DEFAULT_DB_ALIAS]['health_check_failures']
+
+    def test_request_started_does_not_ping(self):
+        with mock.patch.object(connections, 'all', return_value=[self.connection]), \
+                mock.patch.object(self.connection, 'is_usable') as is_usable:
+            health_check_connections()
+        self.assertFalse(is_usable.called)
+        self.assertFalse(self.connection.health_check_done)
+
+    def test_checked_once_per_request(self):
+        self.connection.health_check_done = False
+        with mock.patch.object(self.connection, 'is_usable', return_value=True) as is_usable:
+            self.connection.cursor().execute('SELECT 1')
+            self.connection.cursor().execute('SELECT 1')
+        self.assertEqual(is_usable.call_count, 1)
+        with mock.patch.object(self.connection, 'is_usable') as is_usable:
+            self.connection.cursor().execute('SELECT 1')
+        self.assertFalse(is_usable.called)
+
+    def test_unusable_connection_closed(self):
+        failures = self.get_failures()
+        self.connection.health_check_done = False
+        with mock.patch.object(self.connection, 'is_usable', return_value=False), \
+                mock.patch.object(self.connection, 'close') as close:
+            self.connection.ensure_connection()
+        close.assert_called_once_with()
+        self.assertEqual(self.get_failures(), failures + 1)
+
+
+class CoreInitializeTest(TestCase):
+    """
+    初始化数据: 无 id 的行也要写入多对多关联, 已存在的行合并关联
+    """
+
+    def setUp(self):
+        self.menus = [Menu.objects.create(title=f'menu{i}', name=f'menu{i}', type=1) for i in range(2)]
+        self.init = CoreInitialize()
+
+    def get_menus(self, code):
+        return set(Role.objects.get(code=code).menu.values_list('id', flat=True))
+
+    def test_rows_without_id(self):
+        self.init.save(Role, [
+            {'name': 'a', 'code': 'init_a', 'menu': [self.menus[0].id]},
+            {'name': 'b', 'code': 'init_b', 'menu': [item.id for item in self.menus]},
+            {'name': 'c', 'code': 'init_c', 'menu': []},
+        ])
+        self.assertEqual(self.get_menus('init_a'), {self.menus[0].id})
+        self.assertEqual(self.get_menus('init_b'), {item.id for item in self.menus})
+        self.assertEqual(self.get_menus('init_c'), set())
+
+    def test_rows_without_id_no_returning(self):
+        features = type(connections[DEFAULT_DB_ALIAS].features)
+        with mock.patch.object(features, 'can_return_rows_from_bulk_insert', False):
+            self.init.save(Role, [
+                {'name': 'a', 'code': 'init_a', 'menu': [self.menus[1].id]},
+                {'name': 'b', 'code': 'init_b'},
+            ])
+        self.assertEqual(self.get_menus('init_a'), {self.menus[1].id})
+        self.assertTrue(Role.objects.filter(code='init_b').exists())
+
+    def test_existing_row_merges_links(self):
+        role = Role.objects.create(name='a', code='init_a')
+        role.menu.add(self.menus[0])
+        self.init.save(Role, [{'id': role.id, 'name': 'a', 'code': 'init_a', 'menu': [self.menus[1].id]}])
+        self.assertEqual(self.get_menus('init_a'), {item.id for item in self.menus})
+
+
+class LuaRedis:
+    """
+    用 lupa 执行限流 Lua 脚本, redis.call 只实现脚本用到的 HMGET/HMSET/EXPIRE
+    """
+
+    def __init__(self):
+        self.lua = lupa.LuaRuntime()
+        self.hashes = {}
+
+    def call(self, command, key, *args):
+        bucket = self.hashes.setdefault(key, {})
+        if command == 'HMGET':
+            return self.lua.table(*[bucket.get(field) for field in args])
+        if command == 'HMSET':
+            bucket.update(zip(args[::2], args[1::2]))
+        return 1
+
+    def __call__(self, keys, args):
+        lua_globals = self.lua.globals()
+        lua_globals.redis = self.lua.table(call=self.call)
+        lua_globals.KEYS = self.lua.table(*keys)
+        lua_globals.ARGV = self.lua.table(*[str(arg) for arg in args])
+        return list(self.lua.execute(TOKEN_BUCKET_SCRIPT).values())
+
+    def tokens(self, key):
+        return float(self.hashes[RATE_LIMIT_KEY.format(key)]['tokens'])
+
+
+@mock.patch('utils.rate_limit.time.time', return_value=1000.0)
+class TokenBucketTest(TestCase):
+    """
+    令牌桶限流: 任一桶拒绝时整个请求被拒绝, 且不扣减任何桶
+    """
+
+    buckets = [('api:ip:127.0.0.1', 5, 0.1), ('api:user:1', 1, 0.1)]
+
+    def test_local_partial_denial(self, _):
+        limiter = TokenBucketLimiter()
+        self.assertEqual(limiter.consume(self.buckets), 0)
+        self.assertGreater(limiter.consume(self.buckets), 0)
+        self.assertEqual(limiter._buckets['api:ip:127.0.0.1'][0], 4)
+        self.assertEqual(limiter._buckets['api:user:1'][0], 0)
+
+    @skipUnless(lupa, '需要 lupa 执行 Lua 脚本')
+    def test_redis_partial_denial(self, _):
+        limiter = TokenBucketLimiter(redis_sync=True)
+        limiter._script = redis = LuaRedis()
+        self.assertEqual(limiter.consume(self.buckets), 0)
+        self.assertEqual(redis.tokens('api:ip:127.0.0.1'), 4)
+        self.assertEqual(limiter.consume(self.buckets), 10)
+        self.assertEqual(redis.tokens('api:ip:127.0.0.1'), 4)
+        self.assertEqual(redis.tokens('api:user:1'), 0)
+        self.assertFalse(limiter._buckets)
+
+    @skipUnless(lupa, '需要 lupa 执行 Lua 脚本')
+    def test_redis_refill(self, now):
+        limiter = TokenBucketLimiter(redis_sync=True)
+        limiter._script = redis = LuaRedis()
+        limiter.consume(self.buckets)
+        now.return_value = 1010.0
+        self.assertEqual(limiter.consume(self.buckets), 0)
+        self.assertEqual(redis.tokens('api:ip:127.0.0.1'), 4)
+
+
+class RendererTest(TestCase):
+    """
+    JSON 渲染: orjson 与标准库回退输出一致, 日期格式与原 DateEncoder 相同, 不支持的类型报错
+    """
+
+    data = {
+        'datetime': datetime(2022, 5, 14, 15, 27, 1, 123456),
+        'date': date(2022, 5, 14),
+        'decimal': decimal.Decimal('1.50'),
+        'uuid': uuid.UUID('12345678123456781234567812345678'),
+        'name': '中文',
+        1: 'int key',
+    }
+    expected = {
+        'datetime': '2022-05-14 15:27:01',
+        'date': '2022-05-14',
+        'decimal': '1.50',
+        'uuid': '12345678-1234-5678-1234-567812345678',
+        'name': '中文',
+        '1': 'int key',
+    }
+
+    def test_json_dumps(self):
+        self.assertEqual(json.loads(json_dumps(self.data)), self.expected)
+        self.assertEqual(json.loads(json.dumps(self.data, cls=_StdlibEncoder, ensure_ascii=False)), self.expected)
+
+    def test_unsupported_type(self):
+        with self.assertRaises(TypeError):
+            json_dumps({'value': object()})
+
+    def test_response_and_api_share_format(self):
+        response = FuResponse(data={'datetime': self.data['datetime']})
+        self.assertEqual(get_result(response), (2000, {'datetime': '2022-05-14 15:27:01'}))
+        item = LoginLog.objects.create(username='admin')
+        client = make_client(Users.objects.create_superuser('admin', password='123456', name='admin'))
+        code, result = get_result(client.get('/api/system/login_log'))
+        self.assertEqual(result['items'][0]['create_datetime'], item.create_datetime.strftime('%Y-%m-%d %H:%M:%S'))
+
+
+class UserValuesOut(ModelSchema):
+    class Config:
+        model = Users
+        model_fields = ['id', 'username', 'dept', 'post', 'role']
+
+
+class UserNameOut(ModelSchema):
+    class Config:
+        model = Users
+        model_fields = ['id', 'name']
+
+    @staticmethod
+    def resolve_name(obj):
+        return obj.name.upper()
+
+
+class UserRequestOut(ModelSchema):
+    display: str
+
+    class Config:
+        model = Users
+        model_fields = ['id']
+
+    def resolve_display(self, obj):
+        return str(obj.id)
+
+
+class SchemaValuesTest(TestCase):
+    """
+    values_list 快速序列化: 外键/多对多/静态 resolver 与 from_orm 输出一致, 查询次数不随行数增长
+    """
+
+    def setUp(self):
+        dept = Dept.objects.create(name='dept')
+        roles = [Role.objects.create(name=f'role{i}', code=f'role{i}') for i in range(2)]
+        post = Post.objects.create(name='post', code='post')
+        for i in range(3):
+            user = Users.objects.create(username=f'user{i}', name=f'user{i}', dept=dept if i else None)
+            user.role.set(roles[:i])
+            user.post.add(post)
+
+    def assert_same_as_schema(self, schema):
+        queryset = Users.objects.order_by('id')
+        columns = get_schema_columns(schema, Users)
+        self.assertIsNotNone(columns)
+        with self.assertNumQueries(1 + sum(1 for column in columns if column[2])):
+            data = schema_values(queryset, columns)
+        expected = [schema.from_orm(user).dict() for user in queryset]
+        self.assertEqual(self.sort_relations(data), self.sort_relations(expected))
+
+    @staticmethod
+    def sort_relations(data):
+        return [{key: sorted(value) if isinstance(value, list) else value for key, value in item.items()}
+                for item in data]
+
+    def test_relations(self):
+        self.assert_same_as_schema(UserValuesOut)
+
+    def test_static_resolver(self):
+        self.assert_same_as_schema(UserNameOut)
+
+    def test_sparse_columns(self):
+        columns = get_schema_columns(UserValuesOut, Users, ('id', 'role'))
+        self.assertEqual([column[0] for column in columns], ['id', 'role'])
+
+    def test_fallback(self):
+        self.assertIsNone(get_schema_columns(UserRequestOut, Users))
+
+
+class TokenCacheTest(TestCase):
+    """
+    已验签 token 缓存: 命中时返回独立副本, 验签失败不缓存, 过期与容量淘汰
+    """
+
+    def setUp(self):
+        token_cache.clear()
+        self.token = FuJwt(SECRET_KEY, {'id': 1}, valid_to=int(datetime.now().timestamp()) + 60).encode()
+
+    def test_hit_returns_copy(self):
+        FuJwt.decode(SECRET_KEY, self.token).payload['id'] = 2
+        self.assertEqual(FuJwt.decode(SECRET_KEY, self.token).payload['id'], 1)
+        self.assertEqual(token_cache.stats()['hits'], 1)
+
+    def test_invalid_signature_not_cached(self):
+        header, payload, _ = self.token.split('.')
+        forged = f'{header}.{payload}.{FuJwt("other", {"id": 1}).encode().split(".")[2]}'
+        for _ in range(2):
+            with self.assertRaises(Exception):
+                FuJwt.decode(SECRET_KEY, forged)
+        with self.assertRaises(Exception):
+            FuJwt.decode('other', self.token)
+        self.assertEqual(token_cache.stats()['size'], 0)
+
+    def test_expire_and_evict(self):
+        lru = TokenCache(maxsize=2)
+        lru.set('expired', 1, expire_at=datetime.now().timestamp() - 1)
+        self.assertIsNone(lru.get('expired'))
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual((lru.get('a'), lru.get('c')), (1, 3))
+
+
+class TokenRevocationTest(TestCase):
+    """
+    token 注销: 注销后的 token 返回 401, 其它 token 不受影响; 布隆过滤器未命中时不查询缓存
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = Users.objects.create_superuser('admin', password='123456', name='admin')
+
+    def test_logout_revokes_token(self):
+        client = make_client(self.user)
+        self.assertEqual(get_result(client.get('/api/system/dict'))[0], 2000)
+        self.assertEqual(get_result(client.get('/api/system/logout'))[0], 2000)
+        self.assertEqual(get_result(client.get('/api/system/dict'))[0], 401)
+        self.assertEqual(get_result(make_client(self.user).get('/api/system/dict'))[0], 2000)
+
+    def test_bloom_filter(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.001)
+        values = [uuid.uuid4().hex for _ in range(1000)]
+        for value in values:
+            bloom.add(value)
+        self.assertTrue(all(value in bloom for value in values))
+        false_positives = sum(uuid.uuid4().hex in bloom for _ in range(10000))
+        self.assertLess(false_positives, 50)
+
+    def test_filter_skips_cache_lookup(self):
+        revocation = TokenRevocation(capacity=1000)
+        revocation.revoke('revoked', None)
+        with mock.patch('utils.token_revocation.cache.get', wraps=cache.get) as cache_get:
+            self.assertFalse(revocation.is_revoked('active'))
+            self.assertFalse(cache_get.called)
+            self.assertTrue(revocation.is_revoked('revoked'))
+        # 未与其它节点同步时不能信任本地过滤器, 直接查询缓存
+        revocation.synced = False
+        cache.set(f'{REVOKED_KEY_PREFIX}other', 1)
+        self.assertTrue(revocation.is_revoked('other'))
+
+    def test_expired_token_not_recorded(self):
+        revocation = TokenRevocation(capacity=1000)
+        revocation.revoke('expired', datetime.now().timestamp() - 1)
+        self.assertIsNone(cache.get(f'{REVOKED_KEY_PREFIX}expired'))
+        self.assertFalse(revocation.is_revoked('expired'))
+
+
+class PermissionVersionTest(TestCase):
+    """
+    权限版本: 版本未变化时认证不查询数据库, 角色或权限变更后旧 token 按数据库重新鉴权
+    """
+
+    def setUp(self):
+        cache.clear()
+        # 测试间角色 id 与版本号都会重复, 清空进程内按 (角色, 版本) 缓存的结果
+        for store in (permission_version._versions, permission_version._contexts, permission_version._permissions):
+            store.clear()
+        menu = Menu.objects.create(title='dict', name='dict', type=1)
+        self.button = MenuButton.objects.create(menu=menu, name='list', code='list', api='/api/system/dict', method=0)
+        self.role = Role.objects.create(name='role', code='role', data_range=4)
+        self.role.permission.add(self.button)
+        self.user = Users.objects.create_user('test', password='123456', name='test')
+        self.user.role.add(self.role)
+        self.payload = {'id': self.user.id, 'is_superuser': False, 'role': [self.role.id],
+                        **get_token_versions(self.user.id)}
+
+    def test_unchanged_versions_skip_database(self):
+        with self.assertNumQueries(0):
+            context = get_auth_context(self.payload)
+        self.assertEqual(context['role'], [self.role.id])
+
+    def test_user_role_change_reloads(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.role.remove(self.role)
+        self.assertEqual(get_auth_context(self.payload)['role'], [])
+
+    def test_deleted_user(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        self.assertIsNone(get_auth_context(self.payload))
+
+    def test_permission_removed_from_role(self):
+        client = make_client(self.user)
+        self.assertEqual(get_result(client.get('/api/system/dict'))[0], 2000)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.role.permission.remove(self.button)
+        self.assertEqual(get_result(client.get('/api/system/dict'))[0], 403)
+
+
+class AsyncViewTest(TestCase):
+    """
+    异步接口: 登录、认证与序列化在 ASGI 下可用, 认证失败与密码错误正常返回
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = Users.objects.create_user('test', password='123456', name='test')
+        self.token = make_token(self.user)
+        self.expired_token = make_token(self.user, lifetime=-1)
+        self.client = AsyncClient()
+
+    def get(self, path, token):
+        # Django 4.0 的 AsyncClient 按原始名称传递请求头
+        return self.client.get(path, **{'user-agent': 'Mozilla/5.0', 'authorization': token})
+
+    def login(self, password):
+        return self.client.post('/api/system/login', {'username': 'test', 'password': password},
+                                content_type='application/json', **{'user-agent': 'Mozilla/5.0'})
+
+    async def test_login_and_userinfo(self):
+        response = await self.login('123456')
+        code, result = get_result(response)
+        self.assertEqual(code, 2000)
+        response = await self.get('/api/system/userinfo', result['token'])
+        code, result = get_result(response)
+        self.assertEqual((code, result['username']), (2000, 'test'))
+
+    async def test_wrong_password(self):
+        response = await self.login('wrong')
+        self.assertEqual(get_result(response)[0], 500)
+
+    async def test_expired_token(self):
+        response = await self.get('/api/system/userinfo', self.expired_token)
+        self.assertEqual(get_result(response)[0], 401)
+
+    async def test_auth_runs_acall(self):
+        with mock.patch('utils.fu_auth.GlobalAuth.acall', autospec=True, side_effect=TimeoutError(401, '认证失败')) \
+                as acall:
+            response = await self.get('/api/system/userinfo', self.token)
+        self.assertTrue(acall.called)
+        self.assertEqual(get_result(response)[0], 401)
+
+
+@mock.patch('utils.db_router.get_replicas', return_value=['replica_1'])
+class ReplicaRouterTest(TestCase):
+    """
+    读写分离: 标记只读后读副本, 写始终访问主库, 用户写请求后的窗口内读主库
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = Users.objects.create_user('test', password='123456', name='test')
+        self.factory = RequestFactory(HTTP_AUTHORIZATION=make_token(self.user))
+        self.router = ReplicaRouter()
+        self.middleware = ReplicaRoutingMiddleware(lambda request: HttpResponse())
+
+    def route(self, method, replica=True):
+        request = self.factory.generic(method, '/api/system/dict')
+        self.middleware.process_request(request)
+        try:
+            if replica:
+                use_replica()
+            return self.router.db_for_read(Dict), self.router.db_for_write(Dict)
+        finally:
+            self.middleware.process_response(request, HttpResponse())
+
+    def test_read_replica(self, _):
+        self.assertEqual(self.route('GET', replica=False), (PRIMARY_DATABASE, PRIMARY_DATABASE))
+        self.assertEqual(self.route('GET'), ('replica_1', PRIMARY_DATABASE))
+        # 请求结束后清除路由状态
+        self.assertEqual(self.router.db_for_read(Dict), PRIMARY_DATABASE)
+
+    def test_read_your_writes(self, _):
+        self.route('POST', replica=False)
+        self.assertEqual(self.route('GET'), (PRIMARY_DATABASE, PRIMARY_DATABASE))
+        cache.clear()
+        self.assertEqual(self.route('GET'), ('replica_1', PRIMARY_DATABASE))
+
+    def test_related_objects_follow_instance(self, _):
+        request = self.factory.get('/api/system/dict')
+        self.middleware.process_request(request)
+        use_replica()
+        self.assertEqual(self.router.db_for_read(Dict, instance=Dict(name='dict')), 'replica_1')
+        self.assertEqual(self.router.db_for_read(Dict, instance=self.user), PRIMARY_DATABASE)
+        self.middleware.process_response(request, HttpResponse())
+
+    def test_no_migrate_on_replica(self, _):
+        self.assertFalse(self.router.allow_migrate('replica_1', 'system'))
+        self.assertTrue(self.router.allow_migrate(PRIMARY_DATABASE, 'system'))
+
+
+@override_settings(API_LOG_ENABLE=False)
+class ResponseCacheTest(TransactionTestCase):
+    """
+    响应缓存: 命中时不执行接口, 写入提交后失效, 回滚与失败响应不影响缓存
+    版本号在事务提交后递增, 使用 TransactionTestCase 真实提交
+    """
+
+    def setUp(self):
+        cache.clear()
+        # 测试间版本号会从 0 重新开始, 清空进程内缓存避免命中其它测试的响应
+        for store in (response_cache._versions, response_cache._responses, response_cache._scopes):
+            store.clear()
+        Dict.objects.create(name='first', code='first')
+        self.client = make_client(Users.objects.create_superuser('admin', password='123456', name='admin'))
+
+    def list_names(self):
+        code, result = get_result(self.client.get('/api/system/dict', {'pageSize': 100}))
+        self.assertEqual(code, 2000)
+        return [item['name'] for item in result['items']]
+
+    def test_hit_skips_view(self):
+        self.assertEqual(self.list_names(), ['first'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.list_names(), ['first'])
+
+    def test_invalidated_after_api_write(self):
+        self.list_names()
+        response = self.client.post('/api/system/dict', {'name': 'second', 'code': 'second'},
+                                    content_type='application/json')
+        self.assertEqual(get_result(response)[0], 2000)
+        self.assertIn('second', self.list_names())
+
+    def test_invalidated_after_orm_write(self):
+        self.list_names()
+        Dict.objects.filter(name='first').delete()
+        self.assertEqual(self.list_names(), [])
+
+    def test_update_requires_manual_bump(self):
+        self.list_names()
+        Dict.objects.update(name='renamed')
+        self.assertEqual(self.list_names(), ['first'])
+        bump_model_version(Dict)
+        self.assertEqual(self.list_names(), ['renamed'])
+
+    def test_rollback_keeps_version(self):
+        version = get_model_version(Dict)
+        with self.assertRaises(ValueError), transaction.atomic():
+            Dict.objects.create(name='rollback', code='rollback')
+            raise ValueError
+        self.assertEqual(get_model_version(Dict), version)
+
+    def test_write_after_savepoint_rollback(self):
+        self.list_names()
+        with transaction.atomic():
+            with self.assertRaises(ValueError), transaction.atomic():
+                Dict.objects.create(name='rollback', code='rollback')
+                raise ValueError
+            Dict.objects.create(name='second', code='second')
+        self.assertEqual(self.list_names(), ['first', 'second'])
+
+    def test_error_response_not_cached(self):
+        code, _ = get_result(self.client.get('/api/system/dict', {'fields': 'password'}))
+        self.assertEqual(code, 400)
+        self.assertFalse(response_cache._responses)
+
+    def test_untracked_model_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            require_tracked(OperationLog, usage='测试')
+
+
+class MenuPermissionTreeTest(TransactionTestCase):
+    """
+    角色按钮/列字段权限树: 只保留有按钮的菜单及其全部上级, 按 menu_ids 过滤时上级仍然完整, 菜单变更后重建
+    """
+
+    def setUp(self):
+        cache.clear()
+        response_cache._versions.clear()
+        role_api._menu_permission_items.clear()
+        self.root = Menu.objects.create(title='root', name='root', type=0)
+        self.child = Menu.objects.create(title='child', name='child', type=0, parent=self.root)
+        self.leaf = Menu.objects.create(title='leaf', name='leaf', type=1, parent=self.child)
+        self.sibling = Menu.objects.create(title='sibling', name='sibling', type=1, parent=self.child)
+        Menu.objects.create(title='empty', name='empty', type=1)
+        self.buttons = [MenuButton.objects.create(menu=menu, name=menu.name, code=menu.name, api='/api', method=0)
+                        for menu in (self.leaf, self.sibling)]
+        MenuColumnField.objects.create(menu=self.leaf, name='name', code='name')
+
+    def get_ids(self, flag=role_api.MENU_BUTTON_FLAG, menu_ids=None):
+        return [item['id'] for item in role_api.get_menu_permission_tree(flag, menu_ids)]
+
+    def test_tree_keeps_ancestors_once(self):
+        ids = self.get_ids()
+        self.assertEqual(ids, [f'b{self.buttons[0].id}', self.leaf.id, self.child.id, self.root.id,
+                               f'b{self.buttons[1].id}', self.sibling.id])
+        column_ids = self.get_ids(role_api.MENU_COLUMN_FLAG)
+        self.assertEqual(column_ids[1:], [self.leaf.id, self.child.id, self.root.id])
+
+    def test_filter_by_menu_ids(self):
+        self.assertEqual(self.get_ids(menu_ids=[self.sibling.id]),
+                         [f'b{self.buttons[1].id}', self.sibling.id, self.child.id, self.root.id])
+        self.assertEqual(self.get_ids(menu_ids=[self.root.id]), [])
+
+    def test_rebuilt_after_menu_change(self):
+        self.get_ids()
+        button = MenuButton.objects.create(menu=self.root, name='root', code='root', api='/api', method=0)
+        self.assertIn(f'b{button.id}', self.get_ids())
+        with self.assertNumQueries(0):
+            self.get_ids()
+
+
+class SetM2MTest(TestCase):
+    """
+    按差异设置多对多: 只写入变化部分, 有变化时发送一次 m2m_assigned, 无变化时不写入
+    """
+
+    def setUp(self):
+        cache.clear()
+        for store in (permission_version._versions, permission_version._contexts, permission_version._permissions):
+            store.clear()
+        self.menus = [Menu.objects.create(title=f'menu{i}', name=f'menu{i}', type=1) for i in range(3)]
+        self.role = Role.objects.create(name='role', code='role')
+        self.role.menu.set(self.menus[:2])
+        self.signals = []
+        m2m_assigned.connect(self.receiver)
+        self.addCleanup(m2m_assigned.disconnect, self.receiver)
+
+    def receiver(self, sender, **kwargs):
+        self.signals.append((kwargs['added'], kwargs['removed']))
+
+    def get_menu_ids(self):
+        return set(self.role.menu.values_list('id', flat=True))
+
+    def test_diff(self):
+        ids = [str(self.menus[1].id), self.menus[2].id, '']
+        added, removed = set_m2m(self.role, 'menu', ids)
+        self.assertEqual((added, removed), ({self.menus[2].id}, {self.menus[0].id}))
+        self.assertEqual(self.get_menu_ids(), {self.menus[1].id, self.menus[2].id})
+        self.assertEqual(self.signals, [(added, removed)])
+
+    def test_unchanged(self):
+        # 只查询已有关联, 不写入也不发送信号
+        with self.assertNumQueries(3):
+            result = set_m2m(self.role, 'menu', [menu.id for menu in self.menus[:2]])
+        self.assertEqual(result, (set(), set()))
+        self.assertEqual(self.signals, [])
+
+    def test_clear(self):
+        set_m2m(self.role, 'menu', None)
+        self.assertEqual(self.get_menu_ids(), set())
+
+    def test_user_role_change_bumps_version(self):
+        user = Users.objects.create_user('test', password='123456', name='test')
+        user.role.add(self.role)
+        payload = {'id': user.id, 'is_superuser': False, 'role': [self.role.id], **get_token_versions(user.id)}
+        with self.captureOnCommitCallbacks(execute=True):
+            set_m2m(user, 'role', [])
+        self.assertEqual(get_auth_context(payload)['role'], [])
+
+
+class BulkCreateUserTest(TestCase):
+    """
+    批量创建用户: 整批写入用户及岗位/角色关联, 重复或无效数据整批拒绝并返回每条错误
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(name='post', code='post')
+        self.role = Role.objects.create(name='role', code='role')
+        self.client = make_client(Users.objects.create_superuser('admin', password='123456', name='admin'))
+
+    def create(self, rows):
+        return get_result(self.client.post('/api/system/user/batch/create', rows, content_type='application/json'))
+
+    def test_create(self):
+        code, result = self.create([
+            {'username': 'u1', 'name': 'u1', 'post': [self.post.id], 'role': [self.role.id]},
+            {'username': 'u2', 'name': 'u2', 'password': 'secret'},
+        ])
+        self.assertEqual((code, result), (2000, {'count': 2}))
+        user = Users.objects.get(username='u1')
+        self.assertEqual(list(user.post.values_list('id', flat=True)), [self.post.id])
+        self.assertEqual(list(user.role.values_list('id', flat=True)), [self.role.id])
+        self.assertTrue(user.check_password('123456'))
+        self.assertTrue(Users.objects.get(username='u2').check_password('secret'))
+
+    def test_duplicates_rejected(self):
+        code, errors = self.create([
+            {'username': 'u1', 'name': 'u1'},
+            {'username': 'u1', 'name': 'again'},
+            {'username': 'admin', 'name': 'admin'},
+        ])
+        self.assertEqual(code, 400)
+        self.assertEqual([(error['index'], error['msg']) for error in errors],
+                         [(1, '用户账号已存在'), (2, '用户账号已存在')])
+        self.assertFalse(Users.objects.filter(username='u1').exists())
+
+    def test_unknown_relation_rejected(self):
+        code, errors = self.create([{'username': 'u1', 'name': 'u1', 'role': [self.role.id + 100]}])
+        self.assertEqual((code, errors[0]['msg']), (400, '岗位或角色不存在'))
+        self.assertFalse(Users.objects.filter(username='u1').exists())
+
+
+class PasswordTest(TestCase):
+    """
+    密码哈希: 相同明文只计算一次, 线程池中校验, 迭代次数变化后登录时重新哈希且不使已签发的 token 失效
+    """
+
+    def setUp(self):
+        cache.clear()
+        permission_version._versions.clear()
+        self.hasher = FuPBKDF2PasswordHasher()
+
+    def test_hash_passwords(self):
+        with mock.patch('utils.password.make_password', wraps=make_password) as make:
+            hashes = hash_passwords(['a', 'b', 'a'])
+        self.assertEqual(make.call_count, 2)
+        self.assertEqual(hashes[0], hashes[2])
+        self.assertTrue(all(check_password(raw, encoded) for raw, encoded in zip('aba', hashes)))
+
+    def test_verify(self):
+        encoded = hash_passwords(['secret'])[0]
+        self.assertEqual(verify_password('secret', encoded), (True, None))
+        self.assertEqual(verify_password('wrong', encoded), (False, None))
+        self.assertEqual(async_to_sync(averify_password)('secret', encoded), (True, None))
+
+    def test_missing_user_still_hashes(self):
+        with mock.patch('utils.password.make_password') as make:
+            self.assertEqual(verify_password('secret', None), (False, None))
+        self.assertTrue(make.called)
+
+    def test_rehash_on_login(self):
+        old = self.hasher.encode('secret', self.hasher.salt(), iterations=1000)
+        valid, rehashed = verify_password('secret', old)
+        self.assertTrue(valid)
+        self.assertEqual(identify_hasher(rehashed).safe_summary(rehashed)['iterations'], self.hasher.iterations)
+        user = Users.objects.create_user('test', password='secret', name='test')
+        Users.objects.filter(pk=user.pk).update(password=old)
+        versions = get_token_versions(user.id)
+        response = Client(HTTP_USER_AGENT='Mozilla/5.0').post(
+            '/api/system/login', {'username': 'test', 'password': 'secret'}, content_type='application/json')
+        self.assertEqual(get_result(response)[0], 2000)
+        user.refresh_from_db()
+        self.assertNotEqual(user.password, old)
+        self.assertTrue(user.check_password('secret'))
+        self.assertEqual(get_token_versions(user.id), versions)
+
+
+class InitAreaTest(TestCase):
+    """
+    地区导入: 展开层级、按整个名称计算拼音, 重复导入只更新有变化的行
+    """
+
+    data = [{'code': '50', 'name': '重庆市', 'children': [
+        {'code': '5001', 'name': '市辖区', 'children': [{'code': '500101', 'name': '万州区'}]},
+        {'code': '5002', 'name': '县', 'children': [{'code': '500229', 'name': '城口县'}]},
+    ]}]
+
+    def import_areas(self):
+        with mock.patch.object(init_area.json, 'load', return_value=self.data):
+            return init_area.main()
+
+    def test_area_list(self):
+        rows = init_area.area_list(self.data)
+        self.assertEqual([(row['code'], row['level'], row['pcode_id']) for row in rows], [
+            ('50', 1, None), ('5001', 2, '50'), ('500101', 3, '5001'), ('5002', 2, '50'), ('500229', 3, '5002'),
+        ])
+
+    def test_pinyin(self):
+        self.assertEqual(init_area.get_pinyin('重庆市'), 'chongqingshi')
+        self.assertEqual(init_area.get_pinyin_map(['市辖区', '市辖区', '县']), {'市辖区': 'shixiaqu', '县': 'xian'})
+
+    def test_import_is_idempotent(self):
+        self.assertEqual(self.import_areas(), (5, 0, 0))
+        area = Area.objects.get(code='500101')
+        self.assertEqual((area.pinyin, area.initials, area.level), ('wanzhouqu', 'W', 3))
+        self.assertEqual(area.tree_depth, 2)
+        self.assertEqual(self.import_areas(), (0, 0, 5))
+
+    def test_changed_rows_updated(self):
+        self.import_areas()
+        Area.objects.filter(code='500229').update(name='旧名称', pinyin='jiumingcheng', initials='J')
+        self.assertEqual(self.import_areas(), (0, 1, 4))
+        area = Area.objects.get(code='500229')
+        self.assertEqual((area.name, area.pinyin, area.initials), ('城口县', 'chengkouxian', 'C'))
+
+    def test_failure_rolls_back(self):
+        with mock.patch.object(Area, 'rebuild_tree', side_effect=ValueError), self.assertRaises(ValueError):
+            self.import_areas()
+        self.assertFalse(Area.objects.exists())
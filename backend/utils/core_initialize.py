@@ -1,5 +1,12 @@
 # 初始化基类
+import time
+
+from django.db import connections, router, transaction
+
 from fuadmin import settings
+from utils.models import TreeModel
+from utils.permission_version import bump_global_version
+from utils.response_cache import bump_model_version
 
 
 class CoreInitialize:
@@ -17,35 +24,88 @@ class CoreInitialize:
         self.reset = reset or self.reset
         self.creator_id = creator_id or self.creator_id
 
-    def save(self, obj, data: list, name=None, no_reset=False):
+    def save(self, obj, data: list, name=None, no_reset=False, update=False, batch_size=1000):
+        """
+        批量写入初始化数据: 一次查询已存在的 id, 不存在的 bulk_create, 列表类型的值作为多对多关联批量写入关联表
+        无 id 的行按行顺序对应到新建对象, 同样写入多对多关联
+        update: 已存在的数据是否按初始化数据更新(bulk_update), 默认跳过已存在的数据
+        """
         name = name or obj._meta.verbose_name
         print(f"正在初始化[{obj._meta.label} => {name}]")
+        start = time.perf_counter()
         if not no_reset and self.reset and obj not in settings.INITIALIZE_RESET_LIST:
             try:
                 obj.objects.all().delete()
                 settings.INITIALIZE_RESET_LIST.append(obj)
             except Exception:
                 pass
+        rows = []
+        m2m_values = []
         for ele in data:
-            m2m_dict = {}
             new_data = {}
+            m2m = {}
             for key, value in ele.items():
-                # 判断传的 value 为 list 的多对多进行抽离，使用set 进行更新
+                # 值为 list 的多对多字段抽离, 与已有关联合并
                 if isinstance(value, list):
-                    m2m_dict[key] = value
+                    if value and value[0]:
+                        m2m[key] = set(value)
                 else:
                     new_data[key] = value
-            object, _ = obj.objects.get_or_create(id=ele.get("id"), defaults=new_data)
-            for key, m2m in m2m_dict.items():
-                m2m = list(set(m2m))
-                if m2m and len(m2m) > 0 and m2m[0]:
-                    exec(f"""
-if object.{key}:
-    values_list = object.{key}.all().values_list('id', flat=True)
-    values_list = list(set(list(values_list) + {m2m}))
-    object.{key}.set(values_list)
-""")
-        print(f"初始化完成[{obj._meta.label} => {name}]")
+            rows.append(new_data)
+            m2m_values.append(m2m)
+        with transaction.atomic():
+            ids = [row['id'] for row in rows if row.get('id') is not None]
+            existing = set(obj.objects.filter(id__in=ids).values_list('id', flat=True))
+            instances = [obj(**row) if row.get('id') not in existing else None for row in rows]
+            created = [instance for instance in instances if instance is not None]
+            if not connections[router.db_for_write(obj)].features.can_return_rows_from_bulk_insert:
+                # 数据库不支持 bulk_create 回填主键时, 无 id 且有多对多关联的行逐条创建以拿到主键
+                for instance, m2m in zip(instances, m2m_values):
+                    if instance is not None and instance.pk is None and m2m:
+                        instance.save(force_insert=True)
+            obj.objects.bulk_create([instance for instance in created if instance._state.adding],
+                                    batch_size=batch_size)
+            # 按行顺序把多对多关联对应到已存在或新建的对象主键
+            m2m_rows = {}
+            for row, instance, m2m in zip(rows, instances, m2m_values):
+                pk = row['id'] if instance is None else instance.pk
+                for key, value in m2m.items():
+                    m2m_rows.setdefault(key, {}).setdefault(pk, set()).update(value)
+            updated = 0
+            if update:
+                groups = {}
+                for row in rows:
+                    if row.get('id') in existing:
+                        groups.setdefault(tuple(sorted(key for key in row if key != 'id')), []).append(obj(**row))
+                for fields, objects in groups.items():
+                    if fields:
+                        updated += obj.objects.bulk_update(objects, fields, batch_size=batch_size)
+            linked = sum(self._save_m2m(obj, key, values, batch_size) for key, values in m2m_rows.items())
+            if issubclass(obj, TreeModel):
+                # 初始化数据中子节点可能先于父节点创建, 统一重建树路径
+                obj.rebuild_tree(batch_size=batch_size)
+            if created or updated or linked:
+                # bulk_create/bulk_update 不发送信号, 手动使权限与响应缓存失效
+                bump_model_version(obj)
+                bump_global_version()
+        print(f"初始化完成[{obj._meta.label} => {name}] 新增 {len(created)}, 更新 {updated}, 关联 {linked}, "
+              f"耗时 {time.perf_counter() - start:.2f}s")
+
+    @staticmethod
+    def _save_m2m(obj, key, values, batch_size):
+        """
+        values: {对象 id: 关联 id 集合}, 只补充缺少的关联, 返回新增的关联数
+        """
+        field = obj._meta.get_field(key)
+        through = field.remote_field.through
+        source = through._meta.get_field(field.m2m_field_name()).attname
+        target = through._meta.get_field(field.m2m_reverse_field_name()).attname
+        existing = set(through.objects.filter(**{f'{source}__in': list(values)}).values_list(source, target))
+        links = [through(**{source: pk, target: related_id})
+                 for pk, related_ids in values.items() for related_id in related_ids
+                 if (pk, related_id) not in existing]
+        through.objects.bulk_create(links, batch_size=batch_size, ignore_conflicts=True)
+        return len(links)
 
     def run(self):
         raise NotImplementedError('.run() must be overridden')
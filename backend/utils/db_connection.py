@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+# @FileName: db_connection.py
+# @Software: PyCharm
+"""
+数据库连接管理
+
+- CONN_MAX_AGE 持久连接: 连接在请求间复用, 省去每个请求的连接握手
+- CONN_HEALTH_CHECKS: 复用持久连接前检查是否可用(如数据库重启、被防火墙断开), 不可用则关闭后重连.
+  Django 4.1 起内置该配置, 当前版本(4.0)按 4.1 的方式实现: request_started 只做标记,
+  每个请求首次使用该连接时(ensure_connection)才检查一次, 未访问数据库的请求和未打开的连接不做检查
+- 连接统计: 各数据库实际新建连接次数、从连接池复用次数、健康检查失败次数及连接池状态, 在系统监控接口中输出
+"""
+import threading
+
+import django
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.db.backends.signals import connection_created
+from django.utils.asyncio import async_unsafe
+
+from .db_pool import get_pool_stats
+
+_lock = threading.Lock()
+_stats = {}
+_EMPTY_STATS = {'connections_created': 0, 'pool_reuses': 0, 'health_check_failures': 0}
+
+
+def _incr(alias, key):
+    with _lock:
+        stats = _stats.setdefault(alias, dict(_EMPTY_STATS))
+        stats[key] += 1
+
+
+def count_connection_created(sender, connection, **kwargs):
+    # 连接池引擎每次取出连接都会发送 connection_created, 复用的连接单独计数
+    _incr(connection.alias, 'pool_reuses' if getattr(connection, 'pool_reused', False) else 'connections_created')
+
+
+def health_check_connections(**kwargs):
+    # 请求开始时只标记, 不访问数据库
+    for connection in connections.all():
+        connection.health_check_done = False
+
+
+def check_connection_health(connection):
+    """
+    复用持久连接前检查一次是否可用, 不可用则关闭, 由 ensure_connection 重新连接
+    """
+    if getattr(connection, 'health_check_done', True):
+        return
+    connection.health_check_done = True
+    if connection.connection is None or not connection.settings_dict.get('CONN_HEALTH_CHECKS'):
+        return
+    if connection.in_atomic_block or connection.is_usable():
+        return
+    _incr(connection.alias, 'health_check_failures')
+    connection.close()
+
+
+_ensure_connection = BaseDatabaseWrapper.ensure_connection
+
+
+@async_unsafe
+def ensure_connection(self):
+    check_connection_health(self)
+    _ensure_connection(self)
+
+
+def connect_signals():
+    connection_created.connect(count_connection_created, dispatch_uid='fu_count_connection_created')
+    if django.VERSION < (4, 1):
+        BaseDatabaseWrapper.ensure_connection = ensure_connection
+        request_started.connect(health_check_connections, dispatch_uid='fu_health_check_connections')
+
+
+def get_connection_stats():
+    """
+    各数据库连接配置与统计, 使用连接池的数据库附带 pool 状态(open/idle/in_use/waiting/等待时间)
+    """
+    pools = get_pool_stats()
+    result = {}
+    for alias, settings_dict in connections.settings.items():
+        with _lock:
+            stats = dict(_stats.get(alias) or _EMPTY_STATS)
+        stats['conn_max_age'] = settings_dict.get('CONN_MAX_AGE')
+        stats['health_checks'] = bool(settings_dict.get('CONN_HEALTH_CHECKS'))
+        if alias in pools:
+            stats['pool'] = pools[alias]
+        result[alias] = stats
+    return result
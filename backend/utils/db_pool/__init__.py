@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+# @FileName: __init__.py
+# @Software: PyCharm
+"""
+进程内数据库连接池
+
+请求结束时 Django 关闭连接, 使用连接池的数据库引擎(utils.db_pool)把连接归还到池中而不是断开,
+下个请求(任意线程)直接复用, 适用于 ASGI 部署: 每个请求在不同线程中执行, CONN_MAX_AGE 持久连接无法复用
+"""
+import threading
+import time
+from collections import deque
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+
+    def __init__(self, connect, min_size=0, max_size=10, timeout=10, max_idle=300):
+        """
+        :param connect: 创建新连接的函数, 可为 None(由 acquire 传入)
+        :param min_size: 空闲回收时至少保留的连接数
+        :param max_size: 最大连接数, 达到后等待其它请求归还
+        :param timeout: 等待可用连接的最长秒数
+        :param max_idle: 空闲超过该秒数的连接被关闭
+        """
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._idle = deque()
+        self._open = 0
+        self._waiting = 0
+        self._cond = threading.Condition()
+        self.acquired = 0
+        self.created = 0
+        self.timeouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def _checkout(self, conn, begin):
+        wait_time = time.monotonic() - begin
+        self.acquired += 1
+        self.wait_time_total += wait_time
+        self.wait_time_max = max(self.wait_time_max, wait_time)
+        return conn
+
+    def acquire(self, connect=None):
+        """
+        :param connect: 需要新建连接时使用的函数, 默认为创建连接池时传入的 connect
+        """
+        begin = time.monotonic()
+        with self._cond:
+            while True:
+                while self._idle:
+                    # 后进先出, 优先使用最近归还的连接
+                    conn, _ = self._idle.pop()
+                    if getattr(conn, 'closed', False):
+                        self._open -= 1
+                        continue
+                    return self._checkout(conn, begin)
+                if self._open < self.max_size:
+                    self._open += 1
+                    break
+                remaining = begin + self.timeout - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise TimeoutError(500, f'数据库连接池已满({self.max_size}), 等待 {self.timeout} 秒超时')
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+        # 建立连接较慢, 不占用锁
+        try:
+            conn = (connect or self._connect)()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self.created += 1
+            return self._checkout(conn, begin)
+
+    def release(self, conn):
+        now = time.monotonic()
+        expired = []
+        with self._cond:
+            if getattr(conn, 'closed', False):
+                self._open -= 1
+            else:
+                self._idle.append((conn, now))
+            # 回收空闲过久的连接
+            while len(self._idle) > self.min_size and self._idle[0][1] < now - self.max_idle:
+                expired.append(self._idle.popleft()[0])
+                self._open -= 1
+            self._cond.notify()
+        for item in expired:
+            self._close(item)
+
+    def discard(self, conn):
+        """
+        丢弃不可用的连接
+        """
+        self._close(conn)
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+
+    def close_all(self):
+        with self._cond:
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._open -= len(idle)
+        for conn in idle:
+            self._close(conn)
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def stats(self):
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                'open': self._open,
+                'idle': idle,
+                'in_use': self._open - idle,
+                'waiting': self._waiting,
+                'max_size': self.max_size,
+                'created': self.created,
+                'acquired': self.acquired,
+                'timeouts': self.timeouts,
+                'wait_time_avg_ms': round(self.wait_time_total / self.acquired * 1000, 3) if self.acquired else 0,
+                'wait_time_max_ms': round(self.wait_time_max * 1000, 3),
+            }
+
+
+def get_pool(alias, options, connect=None):
+    """
+    获取(首次调用时创建)数据库别名对应的连接池, options 为 DATABASES 中的 POOL 配置
+    """
+    pool = _pools.get(alias)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(alias)
+            if pool is None:
+                pool = ConnectionPool(
+                    connect,
+                    min_size=options.get('MIN_SIZE', 0),
+                    max_size=options.get('MAX_SIZE', 10),
+                    timeout=options.get('TIMEOUT', 10),
+                    max_idle=options.get('MAX_IDLE', 300),
+                )
+                _pools[alias] = pool
+    return pool
+
+
+def get_pool_stats():
+    return {alias: pool.stats() for alias, pool in _pools.items()}
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+# @FileName: base.py
+# @Software: PyCharm
+"""
+带连接池的 PostgreSQL 数据库引擎: ENGINE = 'utils.db_pool', 连接池参数写在 DATABASES 的 POOL 中
+
+psycopg_pool 只支持 psycopg 3, Django 4.2 起才支持 psycopg 3 驱动; 当前 Django 4.0 的 PostgreSQL 后端基于 psycopg2,
+psycopg2 自带的 ThreadedConnectionPool 满时直接报错且不检查连接状态, 因此在 Django 连接层实现连接池
+"""
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+from . import get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict.get('POOL') or {})
+
+    # 本次 connect 是否复用了池中的连接, connection_created 统计据此区分实际新建的连接
+    pool_reused = False
+
+    def get_new_connection(self, conn_params):
+        created = []
+
+        def connect():
+            created.append(True)
+            return super(DatabaseWrapper, self).get_new_connection(conn_params)
+
+        connection = self.pool.acquire(connect)
+        self.pool_reused = not created
+        # 复用的连接不会经过 get_new_connection, 按连接实际的隔离级别设置
+        self.isolation_level = self.settings_dict['OPTIONS'].get('isolation_level', connection.isolation_level)
+        return connection
+
+    def _close(self):
+        connection = self.connection
+        if connection is None:
+            return
+        if connection.closed or (self.errors_occurred and not self.is_usable()):
+            self.pool.discard(connection)
+            return
+        try:
+            # 归还前结束未完成的事务, 避免下一个使用者继承
+            if connection.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+        except Exception:
+            self.pool.discard(connection)
+            return
+        self.pool.release(connection)
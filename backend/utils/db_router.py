@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+# @FileName: db_router.py
+# @Software: PyCharm
+"""
+读写分离
+
+- 只读副本在 conf/env.py 的 DATABASE_REPLICAS 中配置, 未配置时所有读写都访问主库(default)
+- 写操作始终访问主库; 读操作默认访问主库, 请求中调用 use_replica() 或接口使用 @read_replica 后,
+  该请求余下的读操作访问随机一个副本. 分页列表、导出已自动调用
+- 读自己的写: 用户的写请求(POST/PUT/PATCH/DELETE)结束后 DATABASE_REPLICA_STICKY_SECONDS 秒内,
+  该用户的请求仍然读主库, 避免副本同步延迟导致刚保存的数据查不到
+"""
+import asyncio
+import random
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.deprecation import MiddlewareMixin
+
+from .usual import get_user_info_from_token
+
+PRIMARY_DATABASE = 'default'
+REPLICA_PREFIX = 'replica_'
+STICKY_KEY = 'db_sticky:{}'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_state = ContextVar('db_routing_state', default=None)
+
+
+def get_replicas():
+    return [alias for alias in settings.DATABASES if alias.startswith(REPLICA_PREFIX)]
+
+
+class RoutingState:
+    """
+    单个请求的路由状态, 由 ReplicaRoutingMiddleware 创建
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.alias = None
+        self._user_id = False
+
+    @property
+    def user_id(self):
+        if self._user_id is False:
+            try:
+                self._user_id = get_user_info_from_token(self.request).get('id')
+            except Exception:
+                self._user_id = None
+        return self._user_id
+
+    def is_sticky(self):
+        return self.user_id is not None and cache.get(STICKY_KEY.format(self.user_id)) is not None
+
+
+def use_replica():
+    """
+    当前请求余下的读操作访问只读副本, 用户处于读自己的写窗口内时不生效
+    """
+    state = _state.get()
+    if state is None or state.alias is not None:
+        return
+    replicas = get_replicas()
+    if replicas and not state.is_sticky():
+        state.alias = random.choice(replicas)
+
+
+def read_replica(func):
+    """
+    接口装饰器: 标记为只读接口, 读操作访问只读副本, 需放在 @router.get 之下、@paginate 之上
+    """
+    if asyncio.iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            use_replica()
+            return await func(*args, **kwargs)
+
+        return async_wrapper
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        use_replica()
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
+class ReplicaRouter:
+    """
+    DATABASE_ROUTERS 使用的路由
+    """
+
+    def db_for_read(self, model, **hints):
+        # 关联对象跟随实例所在的库读取
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        state = _state.get()
+        if state is not None and state.alias is not None:
+            return state.alias
+        return PRIMARY_DATABASE
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY_DATABASE
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # 副本的表结构由主库同步
+        return not db.startswith(REPLICA_PREFIX)
+
+
+class ReplicaRoutingMiddleware(MiddlewareMixin):
+    """
+    为每个请求创建路由状态, 并在写请求后记录读自己的写窗口
+    """
+
+    def process_request(self, request):
+        _state.set(RoutingState(request) if get_replicas() else None)
+
+    def process_response(self, request, response):
+        state = _state.get()
+        if state is not None and request.method not in SAFE_METHODS and state.user_id is not None:
+            timeout = getattr(settings, 'DATABASE_REPLICA_STICKY_SECONDS', 10)
+            cache.set(STICKY_KEY.format(state.user_id), 1, timeout=timeout)
+        _state.set(None)
+        return response
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+# @FileName: dict_map.py
+# @Software: PyCharm
+"""
+数据字典内存映射
+
+- 启用的字典及其启用的字典项预先组装为 {code: [item, ...]}, 每个进程一份
+- Dict/DictItem 的模型版本号(见 response_cache)变化后重新加载
+- ETag 为映射内容的摘要, 客户端携带 If-None-Match 重新验证, 未变化时返回 304
+"""
+import hashlib
+import threading
+
+from system.models import Dict, DictItem
+
+from .fu_renderer import json_dumps
+from .response_cache import get_model_version, require_tracked
+
+ITEM_FIELDS = ('id', 'label', 'value', 'sort', 'icon', 'status')
+
+require_tracked(Dict, DictItem, usage='字典缓存')
+
+_lock = threading.Lock()
+_state = (None, {}, None)
+
+
+def _load():
+    items = {code: [] for code in Dict.objects.filter(status=True).values_list('code', flat=True) if code}
+    for item in (DictItem.objects.filter(status=True, dict__status=True)
+                 .order_by('sort', 'id').values('dict__code', *ITEM_FIELDS)):
+        code = item.pop('dict__code')
+        if code in items:
+            items[code].append(item)
+    etag = '"{}"'.format(hashlib.sha1(json_dumps(items)).hexdigest())
+    return items, etag
+
+
+def get_dict_map():
+    """
+    :return: ({code: [item, ...]}, etag)
+    """
+    global _state
+    version = (get_model_version(Dict), get_model_version(DictItem))
+    if _state[0] != version:
+        with _lock:
+            if _state[0] != version:
+                _state = (version, *_load())
+    return _state[1], _state[2]
@@ -8,13 +8,16 @@
 import re
 from datetime import datetime
 
+from asgiref.sync import sync_to_async
 # from django.core.cache import cache
 from fuadmin.settings import DEMO, SECRET_KEY, WHITE_LIST
 from ninja.security import HttpBearer
-from system.models import MenuButton, Users
+from system.models import Users
 
 from .fu_jwt import FuJwt
 from .fu_ninja import FuFilters
+from .permission_version import get_auth_context, has_api_permission
+from .token_revocation import token_revocation
 from .usual import get_dept, get_user_info_from_token
 
 METHOD = {
@@ -22,19 +25,32 @@ METHOD = {
     'POST': 1,
     'PUT': 2,
     'DELETE': 3,
+    # 部分更新沿用 PUT 的接口权限
+    'PATCH': 2,
 }
 
 
 class GlobalAuth(HttpBearer):
+    async def acall(self, request):
+        """
+        异步接口的认证入口(FuAsyncOperation 调用)
+        认证会读取缓存(Redis)中的权限版本、注销记录, 版本变化时还会查询数据库, 统一在线程中执行, 不阻塞事件循环
+        """
+        return await sync_to_async(self)(request)
+
     def authenticate(self, request, token):
         jwt = FuJwt(SECRET_KEY)
         value = jwt.decode(SECRET_KEY, token)
         time_now = int(datetime.now().timestamp())
         # 判断token是否过期
         if value.valid_to >= time_now:
-            token_user = value.payload
-            token_user_id = token_user['id']
-            user = Users.objects.get(id=token_user_id)
+            # 判断token是否已注销
+            if token_revocation.is_revoked(value.id):
+                raise TimeoutError(401, 'token已注销')
+            # 权限版本未变化时直接使用token中的用户信息, 否则重新加载
+            token_user = get_auth_context(value.payload)
+            if token_user is None:
+                raise TimeoutError(401, '用户不存在')
             request_path = request.path
             request_method = request.method
             if DEMO:
@@ -58,10 +74,7 @@ class GlobalAuth(HttpBearer):
                     if request_path in WHITE_LIST:
                         return token
                     else:
-                        menuIds = user.role.values_list('permission__id', flat=True)
-                        queryset = MenuButton.objects.filter(id__in=menuIds, api__regex=request_path,
-                                                             method=METHOD[request_method])
-                        if queryset.exists():
+                        if has_api_permission(token_user['role'], request_path, METHOD[request_method]):
                             return token
                         else:
                             raise TimeoutError(403, '没有权限')
@@ -4,27 +4,64 @@
 # @FileName: usual.py
 # @Software: PyCharm
 # -*- coding: utf-8 -*-
+import inspect
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import List
 from urllib.parse import unquote
 
 import openpyxl
-from django.http import FileResponse
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.dispatch import Signal
+from django.http import FileResponse, Http404
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from fuadmin.settings import BASE_DIR, STATIC_URL
 from ninja import Schema
+from ninja.signature.utils import get_path_param_names
 from openpyxl import load_workbook
 
+from .db_router import use_replica
 from .fu_auth import data_permission
-from .fu_ninja import FuFilters
+from .fu_ninja import (
+    FuFilters,
+    get_schema_columns,
+    optimize_queryset,
+    parse_fields,
+    schema_dump,
+    schema_values,
+)
 from .fu_response import FuResponse
 from .usual import get_user_info_from_token
 
 
+# batch_update/partial_update 完成后发送, 参数 sender=模型, ids=更新的ID列表, fields=更新的字段
+batch_updated = Signal()
+# set_m2m 有变更时发送一次, 参数 sender=中间表模型, instance, field=字段名, model=关联模型, added, removed
+m2m_assigned = Signal()
+
+
 class ImportSchema(Schema):
     path: str
 
 
+class BatchDeleteSchema(Schema):
+    ids: List[int]
+
+
+class BatchUpdateSchema(Schema):
+    ids: List[int]
+    data: dict
+
+
+class PartialUpdateSchema(Schema):
+    data: dict
+    update_datetime: str = None
+
+
 def create(request, data, model):
     """
     创建新记录的函数。
@@ -95,9 +132,26 @@ def delete(id, model):
     pass
 
 
+def batch_delete(request, ids, model):
+    """
+    按ID批量删除, 只删除当前用户数据权限范围内的记录。
+
+    参数:
+    - request: HttpRequest对象，用于数据权限过滤。
+    - ids: 要删除的ID列表。
+    - model: 对象所属的模型类。
+
+    返回值:
+    - 实际删除的记录数(不在权限范围内或不存在的ID被忽略)。
+    """
+    # 以 id__in 一次性查询并删除, 级联与删除信号由 QuerySet.delete 处理
+    deleted, rows = retrieve(request, model).filter(id__in=ids).delete()
+    return rows.get(model._meta.label, 0)
+
+
 def update(request, id, data, model):
     """
-    更新给定模型实例的数据。
+    更新给定模型实例的数据, 只写入发生变化的字段。
 
     参数:
     - request: HTTP请求对象，用于获取用户信息。
@@ -110,17 +164,248 @@ def update(request, id, data, model):
     """
     dict_data = data.dict()  # 将data转换为字典格式
     user_info = get_user_info_from_token(request)  # 从请求中获取用户信息
-    # 为更新的数据添加修改者信息
-    dict_data['modifier'] = user_info['name']
     instance = get_object_or_404(model, id=id)  # 获取指定ID的模型实例
-    # 遍历字典，将更新的数据设置到模型实例上
+    field_names = _get_update_field_names(model)
+    changed = []
+    # 遍历字典，将更新的数据设置到模型实例上, 记录值有变化的字段
     for attr, value in dict_data.items():
+        if attr in field_names and getattr(instance, attr) != value:
+            changed.append(attr)
         setattr(instance, attr, value)
-    instance.save()  # 保存更新
+    if changed:
+        # 为更新的数据添加修改者信息, auto_now 字段需显式写入 update_fields
+        instance.modifier = user_info['name']
+        changed.append('modifier')
+        changed.extend(field.name for field in model._meta.concrete_fields if getattr(field, 'auto_now', False))
+        instance.save(update_fields=[name for name in set(changed) if name in field_names])
     return instance  # 返回更新后的实例
 
 
-def retrieve(request, model, filters: FuFilters = FuFilters()):
+def partial_update(request, id, data, model, schema=None, version=None):
+    """
+    部分更新: 只写入 data 中的字段, 以 update_datetime 作为版本号做乐观并发控制。
+
+    参数:
+    - request: HTTP请求对象，用于获取用户信息和数据权限过滤。
+    - id: 要更新的记录ID。
+    - data: 要写入的字段与值(dict), 只包含变化的字段。
+    - model: 要更新的模型类(需有 update_datetime 字段)。
+    - schema: 入参schema, 传入时只允许更新其中的字段, 并按字段类型校验值。
+    - version: 客户端读取到的 update_datetime. 传入时直接执行
+      UPDATE ... WHERE id = ? AND update_datetime = ?, 不预先查询; 不传时退化为最后写入生效。
+
+    返回值:
+    - {'id': id, 'update_datetime': 新版本号}, 记录已被他人修改时抛出 409, 不存在或无权限时抛出 404。
+    """
+    if not isinstance(data, dict):
+        data = data.dict(exclude_unset=True)
+    if schema is not None:
+        data = _validate_partial(schema, data, "更新字段无效")
+    field_names = _get_update_field_names(model)
+    invalid = [name for name in data if name not in field_names or name == 'update_datetime']
+    if not data or invalid:
+        raise TimeoutError(400, f"更新字段无效: {','.join(invalid)}")
+    user_info = get_user_info_from_token(request)
+    now = timezone.now()
+    data['modifier'] = user_info['name']
+    data['update_datetime'] = now
+    query_set = retrieve(request, model).filter(id=id)
+    if version is not None:
+        query_set = query_set.filter(**_version_lookup(version))
+    if not query_set.update(**data):
+        # 仅在失败时查询, 区分版本冲突与记录不存在
+        if version is not None and retrieve(request, model).filter(id=id).exists():
+            raise TimeoutError(409, "数据已被其他用户修改, 请刷新后重试")
+        raise TimeoutError(404, f"No {model._meta.object_name} matches the given query.")
+    batch_updated.send(sender=model, ids=[id], fields=list(data))
+    return {'id': id, 'update_datetime': now.isoformat(' ')}
+
+
+def add_partial_update_route(router, path, model, schema=None):
+    """
+    注册部分更新接口 PATCH path, 请求体为 PartialUpdateSchema, 传入 update_datetime 时做版本冲突检测:
+
+    add_partial_update_route(router, "/dept/{dept_id}", Dept, SchemaIn)
+
+    path 需与该资源 PUT/DELETE 接口的路径一致, 否则会注册为另一个 URL, PATCH 请求返回 405
+    """
+    (id_name,) = get_path_param_names(path)
+
+    def view(request, data: PartialUpdateSchema, **kwargs):
+        return partial_update(request, kwargs[id_name], data.data, model, schema, data.update_datetime)
+
+    # 路径参数名随路由而定, 通过 __signature__ 声明给 ninja
+    view.__signature__ = inspect.Signature([
+        inspect.Parameter('request', inspect.Parameter.POSITIONAL_OR_KEYWORD),
+        inspect.Parameter(id_name, inspect.Parameter.KEYWORD_ONLY, annotation=int),
+        inspect.Parameter('data', inspect.Parameter.KEYWORD_ONLY, annotation=PartialUpdateSchema),
+    ])
+    view.__name__ = view.__qualname__ = f"partial_update_{path.strip('/').split('/')[0]}"
+    router.patch(path)(view)
+    return view
+
+
+def _version_lookup(version):
+    """
+    版本号条件: 列表接口输出的 update_datetime 精确到秒, 此时按该秒内匹配; 带微秒时精确匹配
+    """
+    if isinstance(version, str):
+        version = parse_datetime(version)
+        if version is None:
+            raise TimeoutError(400, "update_datetime 格式无效")
+    if version.microsecond:
+        return {'update_datetime': version}
+    return {'update_datetime__gte': version, 'update_datetime__lt': version + timedelta(seconds=1)}
+
+
+def batch_update(request, ids, data, model, schema=None):
+    """
+    按ID批量更新为相同的值, 单条 UPDATE 语句完成, 只更新当前用户数据权限范围内的记录。
+
+    参数:
+    - request: HTTP请求对象，用于获取用户信息和数据权限过滤。
+    - ids: 要更新的ID列表。
+    - data: 要写入的字段与值(dict)。
+    - model: 要更新的模型类。
+    - schema: 入参schema, 传入时只允许更新其中的字段, 并按字段类型校验值。
+
+    返回值:
+    - 实际更新的记录数。
+    """
+    if not isinstance(data, dict):
+        data = data.dict(exclude_unset=True)
+    if schema is not None:
+        data = _validate_partial(schema, data, "批量更新字段无效")
+    field_names = _get_update_field_names(model)
+    invalid = [name for name in data if name not in field_names]
+    if not data or invalid:
+        raise TimeoutError(400, f"批量更新字段无效: {','.join(invalid)}")
+    # 多条记录写入同一个值会违反唯一约束
+    unique = [name for name in data if name in _get_unique_field_names(model)]
+    if unique and len(set(ids)) > 1:
+        raise TimeoutError(400, f"唯一字段不能批量更新: {','.join(unique)}")
+    user_info = get_user_info_from_token(request)
+    data['modifier'] = user_info['name']
+    for field in model._meta.concrete_fields:
+        if getattr(field, 'auto_now', False):
+            data[field.name] = timezone.now()
+    rows = retrieve(request, model).filter(id__in=ids).update(**data)
+    if rows:
+        # QuerySet.update 不发送 post_save, 通知依赖该模型的缓存、权限版本号
+        batch_updated.send(sender=model, ids=ids, fields=list(data))
+    return rows
+
+
+def add_batch_routes(router, path, model, schema=None, update=True, check_delete=None, check_update=None):
+    """
+    注册批量删除 POST {path}/batch/delete 与批量更新 PUT {path}/batch/update, 返回 {"count": 实际处理的记录数}:
+
+    add_batch_routes(router, "/dept", Dept, SchemaIn)
+
+    - schema: 批量更新允许的字段, 见 batch_update
+    - update: 为 False 时只注册批量删除
+    - check_delete(request, ids) / check_update(request, ids, data): 执行前的业务校验, 不通过时抛出 TimeoutError
+    """
+    resource = path.strip('/').split('/')[-1]
+
+    def delete_view(request, data: BatchDeleteSchema):
+        if check_delete is not None:
+            check_delete(request, data.ids)
+        return FuResponse(data={"count": batch_delete(request, data.ids, model)})
+
+    delete_view.__name__ = delete_view.__qualname__ = f"batch_delete_{resource}"
+    router.post(f"{path}/batch/delete")(delete_view)
+    if not update:
+        return
+
+    def update_view(request, data: BatchUpdateSchema):
+        if check_update is not None:
+            check_update(request, data.ids, data.data)
+        return FuResponse(data={"count": batch_update(request, data.ids, data.data, model, schema)})
+
+    update_view.__name__ = update_view.__qualname__ = f"batch_update_{resource}"
+    router.put(f"{path}/batch/update")(update_view)
+
+
+@lru_cache(maxsize=None)
+def _get_update_field_names(model):
+    # 可直接写入的字段名(含外键的 _id 名), 主键除外
+    names = set()
+    for field in model._meta.concrete_fields:
+        if not field.primary_key:
+            names.update((field.name, field.attname))
+    return frozenset(names)
+
+
+@lru_cache(maxsize=None)
+def _get_unique_field_names(model):
+    names = set()
+    for field in model._meta.concrete_fields:
+        if field.unique and not field.primary_key:
+            names.update((field.name, field.attname))
+    return frozenset(names)
+
+
+def _validate_partial(schema, data, message):
+    """
+    按 schema 字段类型逐个校验部分字段, 未在 schema 中声明的字段视为无效, 以 message 开头抛出 400
+    """
+    values = {}
+    errors = []
+    fields = {field.alias: field for field in schema.__fields__.values()}
+    fields.update(schema.__fields__)
+    for key, value in data.items():
+        field = fields.get(key)
+        if field is None:
+            errors.append(key)
+            continue
+        value, error = field.validate(value, values, loc=key, cls=schema)
+        if error:
+            errors.append(key)
+        values[field.name] = value
+    if errors:
+        raise TimeoutError(400, f"{message}: {','.join(errors)}")
+    return values
+
+
+def set_m2m(instance, field_name, ids):
+    """
+    按差异设置多对多关联, 代替 instance.<field>.set(ids)。
+
+    一次查询已有关联, 新增部分 bulk_create(ignore_conflicts=True), 移除部分一条 DELETE 删除,
+    在同一事务内完成; 不逐条发送 m2m_changed, 有变更时发送一次 m2m_assigned 供缓存、权限版本号失效。
+
+    参数:
+    - instance: 模型实例(正向多对多字段所在的一端)。
+    - field_name: 多对多字段名, 如 'menu'。
+    - ids: 关联对象的ID列表, 为空时清空关联。
+
+    返回值:
+    - (新增的ID集合, 移除的ID集合)
+    """
+    field = instance._meta.get_field(field_name)
+    through = field.remote_field.through
+    source = through._meta.get_field(field.m2m_field_name()).attname
+    target = through._meta.get_field(field.m2m_reverse_field_name()).attname
+    to_python = field.related_model._meta.pk.to_python
+    ids = {to_python(pk) for pk in ids or [] if pk not in (None, '')}
+    with transaction.atomic():
+        existing = set(through.objects.filter(**{source: instance.pk}).values_list(target, flat=True))
+        added = ids - existing
+        removed = existing - ids
+        if removed:
+            # 中间表没有级联和删除信号接收者, QuerySet.delete 直接执行单条 DELETE
+            through.objects.filter(**{source: instance.pk, f'{target}__in': removed}).delete()
+        if added:
+            through.objects.bulk_create([through(**{source: instance.pk, target: pk}) for pk in added],
+                                        batch_size=1000, ignore_conflicts=True)
+        if added or removed:
+            m2m_assigned.send(sender=through, instance=instance, field=field_name, model=field.related_model,
+                              added=added, removed=removed)
+    return added, removed
+
+
+def retrieve(request, model, filters: FuFilters = FuFilters(), schema=None):
     """
     根据提供的过滤条件从数据库中检索模型实例。
 
@@ -128,6 +413,7 @@ def retrieve(request, model, filters: FuFilters = FuFilters()):
     - request: HttpRequest对象，用于获取请求信息。
     - model: Django模型类，指定要检索的数据模型。
     - filters: FuFilters类的实例，包含过滤条件。默认为FuFilters()，即无条件过滤。
+    - schema: 响应schema，传入时按其字段自动应用select_related/prefetch_related/only。
 
     返回值:
     - query_set: 一个Django QuerySet对象，包含根据过滤条件检索到的模型实例。
@@ -144,9 +430,68 @@ def retrieve(request, model, filters: FuFilters = FuFilters()):
     else:
         # 如果没有有效的过滤条件，则返回所有模型实例
         query_set = model.objects.all()
+    if schema is not None:
+        query_set = optimize_queryset(query_set, schema)
     return query_set
 
 
+def retrieve_one(request, model, id, schema, fields=None):
+    """
+    根据ID获取单条记录, 支持稀疏字段。
+
+    参数:
+    - request: HttpRequest对象。
+    - model: Django模型类。
+    - id: 记录ID。
+    - schema: 响应schema，用于校验 fields 并推导查询列。
+    - fields: 稀疏字段参数(如 "id,name"), 由接口声明为查询参数后传入。
+
+    返回值:
+    - 未传 fields 时返回模型实例(由响应schema序列化); 传入时返回只含指定字段的 FuResponse。
+    """
+    query_set = model.objects.filter(id=id)
+    fields = parse_fields(fields, schema)
+    if not fields:
+        return get_object_or_404(optimize_queryset(query_set, schema))
+    columns = get_schema_columns(schema, model, fields)
+    if columns is not None:
+        data = schema_values(query_set, columns)
+    else:
+        data = schema_dump(schema, query_set[:1], fields)
+    if not data:
+        raise Http404(f"No {model._meta.object_name} matches the given query.")
+    return FuResponse(data=data[0], content_type="application/json; charset=utf-8")
+
+
+
+# 异步版本, 供 async def 接口使用(FuRouter)
+# Django 4.0 尚无原生异步 ORM 方法(aget/acreate 等 4.1 才提供), 这里与 4.1 的实现方式一致,
+# 通过 sync_to_async 在请求专属的线程中执行, 避免在事件循环中阻塞或触发 SynchronousOnlyOperation
+acreate = sync_to_async(create)
+abatch_create = sync_to_async(batch_create)
+adelete = sync_to_async(delete)
+abatch_delete = sync_to_async(batch_delete)
+aupdate = sync_to_async(update)
+apartial_update = sync_to_async(partial_update)
+abatch_update = sync_to_async(batch_update)
+aretrieve_one = sync_to_async(retrieve_one)
+
+
+@sync_to_async
+def aretrieve(request, model, filters: FuFilters = FuFilters(), schema=None):
+    """
+    retrieve 的异步版本, 查询集在线程中求值后以列表返回
+    """
+    return list(retrieve(request, model, filters, schema))
+
+
+@sync_to_async
+def aget_object_or_404(model, **kwargs):
+    """
+    get_object_or_404 的异步版本
+    """
+    return get_object_or_404(model, **kwargs)
+
 def export_data(request, model, scheme, export_fields):
     """
     导出数据为Excel文件。
@@ -161,6 +506,8 @@ def export_data(request, model, scheme, export_fields):
     - FileResponse对象，提供下载Excel文件。
     """
 
+    # 导出为只读查询, 访问只读副本
+    use_replica()
     title_dict = {}
     # 根据export_fields列表获取字段的显示名称
     for field in export_fields:
@@ -202,19 +549,17 @@ def export_data(request, model, scheme, export_fields):
     return FileResponse(open(file_url, "rb"), as_attachment=True)
 
 
-def import_data(request, model, scheme, data, import_fields):
+def load_import_rows(model, data, import_fields):
     """
-    导入数据到指定模型
+    读取导入的Excel文件, 按表头(字段的 help_text)转换为字段字典列表
 
     参数:
-    - request: HttpRequest对象，表示客户端请求
-    - model: Django模型类，数据将被导入到这个模型
-    - scheme: 一个函数，用于根据给定的数据字典创建模型实例
+    - model: Django模型类
     - data: 包含要导入文件信息的对象，比如上传的Excel文件
     - import_fields: 一个列表，指定模型中需要导入的字段名
 
     返回值:
-    - FuResponse对象，包含导入结果的消息
+    - [{字段列名: 单元格值}, ...]
     """
     title_dict = {}  # 字段名与Excel列对应的字典
     for field in import_fields:
@@ -223,8 +568,9 @@ def import_data(request, model, scheme, data, import_fields):
     # 文件路径处理
     file_path = str(BASE_DIR) + unquote(data.path)
     # 加载Excel工作簿
-    wb = load_workbook(file_path)
+    wb = load_workbook(file_path, read_only=True)
     ws = wb.active  # 获取活动工作表
+    rows = []
     title_value = []
     for index_row, row in enumerate(ws.values):
         if index_row == 0:
@@ -236,7 +582,26 @@ def import_data(request, model, scheme, data, import_fields):
                 value = title_dict.get(title_cell)  # 根据表头查找对应字段
                 if value is not None:
                     dict_data[value] = cell
-            print(dict_data)  # 打印处理后的数据，用于调试
-            data = scheme(**dict_data)  # 根据处理后的字典创建模型实例
-            create(request, data, model)  # 在数据库中创建模型实例
+            rows.append(dict_data)
+    wb.close()
+    return rows
+
+
+def import_data(request, model, scheme, data, import_fields):
+    """
+    导入数据到指定模型
+
+    参数:
+    - request: HttpRequest对象，表示客户端请求
+    - model: Django模型类，数据将被导入到这个模型
+    - scheme: 一个函数，用于根据给定的数据字典创建模型实例
+    - data: 包含要导入文件信息的对象，比如上传的Excel文件
+    - import_fields: 一个列表，指定模型中需要导入的字段名
+
+    返回值:
+    - FuResponse对象，包含导入结果的消息
+    """
+    for dict_data in load_import_rows(model, data, import_fields):
+        data = scheme(**dict_data)  # 根据处理后的字典创建模型实例
+        create(request, data, model)  # 在数据库中创建模型实例
     return FuResponse(msg='导入成功')  # 返回成功消息
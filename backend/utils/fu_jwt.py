@@ -3,11 +3,17 @@
 # @Author  : Wick
 # @FileName: fu_jwt.py
 # @Software: PyCharm
+from collections import OrderedDict
 from typing import Union
 from simplejwt import util
-from simplejwt.jwt import default_alg, _hash, Jwt
+from simplejwt.jwt import default_alg, _hash, decode, Jwt
 import datetime
+import hashlib
 import json
+import threading
+import time
+
+from fuadmin import settings
 
 
 class DateEncoder(json.JSONEncoder):
@@ -18,6 +24,53 @@ class DateEncoder(json.JSONEncoder):
 			return json.JSONEncoder.default(self, obj)
 
 
+class TokenCache:
+	"""
+	已验签 token 的进程内 LRU 缓存, 线程安全
+	以 token 摘要为键, 缓存到 token 的过期时间(exp), 命中时跳过 base64/json 解析与 HMAC 校验
+	"""
+
+	def __init__(self, maxsize=10000, ttl=12 * 60 * 60):
+		self.maxsize = maxsize
+		self.ttl = ttl
+		self.hits = 0
+		self.misses = 0
+		self._data = OrderedDict()
+		self._lock = threading.Lock()
+
+	def get(self, key):
+		with self._lock:
+			entry = self._data.get(key)
+			if entry is not None:
+				if entry[0] > time.time():
+					self._data.move_to_end(key)
+					self.hits += 1
+					return entry[1]
+				del self._data[key]
+			self.misses += 1
+		return None
+
+	def set(self, key, value, expire_at=None):
+		expire_at = min(expire_at or float('inf'), time.time() + self.ttl)
+		with self._lock:
+			self._data[key] = (expire_at, value)
+			self._data.move_to_end(key)
+			while len(self._data) > self.maxsize:
+				self._data.popitem(last=False)
+
+	def clear(self):
+		with self._lock:
+			self._data.clear()
+			self.hits = self.misses = 0
+
+	def stats(self):
+		with self._lock:
+			return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+token_cache = TokenCache(getattr(settings, 'TOKEN_CACHE_SIZE', 10000), settings.TOKEN_LIFETIME)
+
+
 class FuJwt(Jwt):
 
 	def encode(self) -> str:
@@ -26,6 +79,20 @@ class FuJwt(Jwt):
 		payload.update(self.payload)
 		return encode(self.secret, payload, self.alg, self.header)
 
+	@staticmethod
+	def decode(secret: Union[str, bytes], token: Union[str, bytes], alg: str = default_alg) -> 'FuJwt':
+		"""
+		解码并验签, 结果缓存在 token_cache 中, 每次返回新的 FuJwt 实例, 调用方修改 payload 不影响缓存
+		"""
+		key = (util.to_bytes(secret), alg, hashlib.sha256(util.to_bytes(token)).digest())
+		cached = token_cache.get(key)
+		if cached is None:
+			cached = decode(secret, token, alg)
+			exp = cached[1].get('exp')
+			token_cache.set(key, cached, exp if isinstance(exp, (int, float)) else None)
+		header, payload = cached
+		return FuJwt(secret, dict(payload), alg, dict(header))
+
 
 def encode(secret: Union[str, bytes], payload: dict = None, alg: str = default_alg, header: dict = None) -> str:
 	"""
@@ -3,20 +3,113 @@
 # @Author  : Wick
 # @FileName: fu_ninja.py
 # @Software: PyCharm
-from typing import Any, List
+from functools import lru_cache, wraps
+from typing import Any, Callable, List
 
-from django.db.models import QuerySet
+from asgiref.sync import sync_to_async
+from django.core.exceptions import FieldDoesNotExist, SynchronousOnlyOperation
+from django.db import connections, transaction
+from django.db.models import FileField, QuerySet
 from django.http import HttpRequest, HttpResponse
+from django.http.response import HttpResponseBase
 from ninja import Field, ModelSchema, NinjaAPI, Query, Router, Schema
+from ninja.errors import AuthenticationError
+from ninja.operation import AsyncOperation, PathView
 from ninja.orm.metaclass import ModelSchemaMetaclass
-from ninja.pagination import PaginationBase
+from ninja.pagination import PaginationBase, _find_collection_response, make_response_paginated
+from ninja.signature import is_async
 from ninja.types import DictStrAny
+from ninja.utils import check_csrf
+from pydantic import BaseModel
 
-from .fu_response import FuResponse
+from fuadmin import settings
+
+from .db_router import PRIMARY_DATABASE, use_replica
+from .fu_renderer import FuJSONRenderer
+from .fu_response import FuResponse, set_response_meta
+from .response_cache import apply_response_cache
 from .usual import get_user_info_from_token
 
 
+TRANSACTION_NONE = 'none'
+TRANSACTION_READ_ONLY = 'read_only'
+TRANSACTION_ATOMIC = 'atomic'
+TRANSACTION_POLICIES = (TRANSACTION_NONE, TRANSACTION_READ_ONLY, TRANSACTION_ATOMIC)
+_WRITE_STATEMENTS = {'INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'MERGE', 'TRUNCATE'}
+
+
+def transaction_policy(policy):
+    """
+    接口装饰器: 声明接口的事务策略, 优先级高于路由和 TRANSACTION_POLICY 默认值
+
+    @router.get("/dept/export")
+    @transaction_policy(TRANSACTION_NONE)
+    def export_dept(request):
+        ...
+
+    - none: 不开启事务, 每条语句自动提交
+    - read_only: 不开启事务, 并拒绝写操作
+    - atomic: 整个接口函数在一个事务中执行, 抛出异常时回滚
+    """
+    assert policy in TRANSACTION_POLICIES, f"未知的事务策略: {policy}"
+
+    def decorator(func):
+        func._transaction_policy = policy
+        return func
+
+    return decorator
+
+
+def _read_only_guard(execute, sql, params, many, context):
+    statement = sql.lstrip().split(None, 1)[0].upper() if sql else ''
+    if statement in _WRITE_STATEMENTS:
+        raise TimeoutError(500, "只读接口不能写入数据库, 请通过 transaction_policy 声明事务策略")
+    return execute(sql, params, many, context)
+
+
+def get_transaction_policy(operation, router=None):
+    """
+    接口声明 > 路由 transaction_policy 属性 > TRANSACTION_POLICY 按请求方法的默认值(未配置的方法为 atomic)
+    """
+    policy = getattr(operation.view_func, '_transaction_policy', None) or getattr(router, 'transaction_policy', None)
+    if policy:
+        return policy
+    defaults = getattr(settings, 'TRANSACTION_POLICY', {})
+    policies = [defaults.get(method, TRANSACTION_ATOMIC) for method in operation.methods]
+    # 同一个接口对应多个请求方法时取最严格的策略
+    return max(policies, key=TRANSACTION_POLICIES.index)
+
+
+def apply_transaction_policy(operation, policy):
+    view_func = operation.view_func
+    if getattr(view_func, '_transaction_applied', False) or is_async(view_func) or policy == TRANSACTION_NONE:
+        # 异步接口无法包裹在同步事务中, 由接口自行控制
+        return
+    if policy == TRANSACTION_ATOMIC:
+        wrapper = transaction.atomic(using=PRIMARY_DATABASE)(view_func)
+    else:
+        @wraps(view_func)
+        def wrapper(*args, **kwargs):
+            with connections[PRIMARY_DATABASE].execute_wrapper(_read_only_guard):
+                return view_func(*args, **kwargs)
+    wrapper._transaction_applied = True
+    operation.view_func = wrapper
+
+
 class FuNinjaAPI(NinjaAPI):
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('renderer', FuJSONRenderer())
+        super().__init__(*args, **kwargs)
+
+    def _get_urls(self):
+        # 所有路由注册完成后按事务策略包装接口函数, 代替 ATOMIC_REQUESTS; 再按 @cache_response 启用响应缓存
+        for _, router in self._routers:
+            for path_view in router.path_operations.values():
+                for operation in path_view.operations:
+                    apply_transaction_policy(operation, get_transaction_policy(operation, router))
+                    apply_response_cache(operation)
+        return super()._get_urls()
+
     def create_response(
             self, request: HttpRequest, data: Any, *, status: int = 200, code: int = 2000, msg: str = "success",
             temporal_response: HttpResponse = None,
@@ -32,13 +125,106 @@ class FuNinjaAPI(NinjaAPI):
             self.renderer.media_type, self.renderer.charset
         )
 
-        return HttpResponse(content, status=status, content_type=content_type)
+        if temporal_response:
+            # 保留接口通过 response 参数设置的状态码、响应头、cookie
+            response = temporal_response
+            response.content = content
+            response['Content-Type'] = content_type
+        else:
+            response = HttpResponse(content, status=status, content_type=content_type)
+        return set_response_meta(response, code, msg)
+
+
+
+class FuAsyncOperation(AsyncOperation):
+    """
+    异步接口: ninja 默认在事件循环中同步调用认证回调, 这里改为等待认证回调的异步版本(acall),
+    没有异步版本的回调放到线程中执行, 避免在事件循环中访问数据库
+    """
+
+    async def _run_authentication_async(self, request: HttpRequest):
+        for callback in self.auth_callbacks:
+            try:
+                acall = getattr(callback, 'acall', None)
+                if acall is not None:
+                    result = await acall(request)
+                else:
+                    result = await sync_to_async(callback)(request)
+            except Exception as exc:
+                return self.api.on_exception(request, exc)
+            if result:
+                request.auth = result
+                return None
+        return self.api.on_exception(request, AuthenticationError())
+
+    async def run(self, request: HttpRequest, **kw: Any) -> HttpResponseBase:
+        if self.auth_callbacks:
+            error = await self._run_authentication_async(request)
+            if error:
+                return error
+        if self.api.csrf:
+            error = check_csrf(request, self.view_func)
+            if error:
+                return error
+        try:
+            temporal_response = self.api.create_temporal_response(request)
+            values = self._get_values(request, kw, temporal_response)
+            result = await self.view_func(request, **values)
+            try:
+                return self._result_to_response(request, result, temporal_response)
+            except SynchronousOnlyOperation:
+                # 返回模型实例时序列化可能触发关联字段查询, 转到线程中重新序列化
+                return await sync_to_async(self._result_to_response)(request, result, temporal_response)
+        except Exception as e:
+            return self.api.on_exception(request, e)
+
+
+class FuPathView(PathView):
+    def add_operation(self, path: str, methods: List[str], view_func: Callable, *, url_name=None, **kwargs):
+        if not is_async(view_func):
+            return super().add_operation(path, methods, view_func, url_name=url_name, **kwargs)
+        if url_name:
+            self.url_name = url_name
+        self.is_async = True
+        operation = FuAsyncOperation(path, methods, view_func, **kwargs)
+        self.operations.append(operation)
+        return operation
+
+    async def _async_view(self, request: HttpRequest, *a: Any, **kw: Any) -> HttpResponseBase:
+        return await super()._async_view(request, *a, **kw)
+
+    # 异步视图不能包裹在 ATOMIC_REQUESTS 事务中, 写操作由视图自行控制事务
+    _async_view._non_atomic_requests = set(settings.DATABASES)
+
+
+class FuRouter(Router):
+    """
+    支持 async def 接口的路由, 用法与 ninja.Router 相同:
+
+    router = FuRouter()
 
+    @router.get("/monitor")
+    async def get_monitor(request):
+        ...
+
+    transaction_policy: 路由下所有接口的事务策略, 见 transaction_policy 装饰器
+    """
+
+    def __init__(self, *args: Any, transaction_policy: str = None, **kwargs: Any) -> None:
+        assert transaction_policy is None or transaction_policy in TRANSACTION_POLICIES
+        super().__init__(*args, **kwargs)
+        self.transaction_policy = transaction_policy
+
+    def add_api_operation(self, path: str, *args: Any, **kwargs: Any) -> None:
+        if path not in self.path_operations:
+            self.path_operations[path] = FuPathView()
+        return super().add_api_operation(path, *args, **kwargs)
 
 class MyPagination(PaginationBase):
     class Input(Schema):
         pageSize: int = Field(10, gt=0)
         page: int = Field(1, gt=-1)
+        fields: str = Field(None, description="稀疏字段, 只返回这些字段, 逗号分隔, 如 id,name")
 
     class Output(Schema):
         items: List[Any]
@@ -50,6 +236,8 @@ class MyPagination(PaginationBase):
             pagination: Input,
             **params: DictStrAny,
     ) -> Any:
+        # 分页列表为只读查询, 访问只读副本
+        use_replica()
         offset = pagination.pageSize * (pagination.page - 1)
         limit: int = pagination.pageSize
         return {
@@ -63,4 +251,230 @@ class MyPagination(PaginationBase):
 class FuFilters(Schema):
     creator_id: int = Field(None, alias="creator_id")
     belong_dept: int = Field(None, alias="belong_dept")
-    belong_dept__in: List[int] = Field(None, alias="belong_dept__in")
\ No newline at end of file
+    belong_dept__in: List[int] = Field(None, alias="belong_dept__in")
+
+
+_SCHEMA_COLUMNS = {}
+
+
+def parse_fields(value, schema):
+    """
+    解析稀疏字段参数 fields=id,name, 并校验是否为 schema 字段
+    :return: tuple 或 None(未传入)
+    """
+    if not value:
+        return None
+    fields = tuple(dict.fromkeys(item.strip() for item in value.split(',') if item.strip()))
+    invalid = [item for item in fields if item not in schema.__fields__]
+    if invalid:
+        raise TimeoutError(400, f"fields 参数无效: {','.join(invalid)}")
+    return fields or None
+
+
+def get_schema_columns(schema, model, fields=None):
+    """
+    根据响应 schema 推导 values_list 需要的列
+    :param fields: 稀疏字段, 只返回这些列
+    :return: [(输出字段名, orm 查询路径, 是否多对多, resolver)], 无法用 values_list 输出时返回 None
+    resolver 仅支持与模型字段同名的静态 resolver, 入参为当前行对象
+    """
+    columns = _SCHEMA_COLUMNS.get((schema, model, fields))
+    if columns is not None:
+        return columns or None
+    columns = []
+    resolvers = getattr(schema, '_ninja_resolvers', {})
+    for name, field in schema.__fields__.items():
+        if fields and name not in fields:
+            continue
+        resolver = resolvers.get(name)
+        if (resolver and not resolver._static) or \
+                (isinstance(field.type_, type) and issubclass(field.type_, BaseModel)):
+            columns = []
+            break
+        lookup = name if resolver else (field.alias or name).replace('.', '__')
+        try:
+            model_field = model._meta.get_field(lookup.split('__')[0])
+        except Exception:
+            columns = []
+            break
+        if model_field.one_to_many or (model_field.many_to_many and not model_field.concrete) \
+                or isinstance(model_field, FileField):
+            # 文件字段常规序列化输出的是 url, values_list 只能取到存储路径
+            columns = []
+            break
+        columns.append((name, lookup, bool(model_field.many_to_many), resolver and resolver._func))
+    _SCHEMA_COLUMNS[(schema, model, fields)] = columns
+    return columns or None
+
+
+class _Row:
+    def __init__(self, data):
+        self.__dict__.update(data)
+
+
+def schema_values(queryset, columns):
+    """
+    使用 values_list 按 schema 列直接生成输出 dict, 不实例化 model 和 schema
+    多对多字段通过中间表一次查询补齐
+    """
+    fields = [(name, lookup) for name, lookup, m2m, resolver in columns if not m2m]
+    m2m_fields = [(name, lookup) for name, lookup, m2m, resolver in columns if m2m]
+    resolvers = [(name, resolver) for name, lookup, m2m, resolver in columns if resolver]
+    lookups = [lookup for name, lookup in fields]
+    names = [name for name, lookup in fields]
+    pk_name = queryset.model._meta.pk.attname
+    if m2m_fields and pk_name not in lookups:
+        lookups.append(pk_name)
+    rows = queryset.values_list(*lookups)
+    data = [dict(zip(names, row)) for row in rows]
+    if m2m_fields and data:
+        pk_index = lookups.index(pk_name)
+        pks = [row[pk_index] for row in rows]
+        for name, lookup in m2m_fields:
+            model_field = queryset.model._meta.get_field(lookup)
+            through = model_field.remote_field.through
+            src = f'{model_field.m2m_field_name()}_id'
+            dst = f'{model_field.m2m_reverse_field_name()}_id'
+            related = {pk: [] for pk in pks}
+            for src_id, dst_id in through.objects.filter(**{f'{src}__in': pks}).values_list(src, dst):
+                related[src_id].append(dst_id)
+            for pk, item in zip(pks, data):
+                item[name] = related[pk]
+    if resolvers:
+        for item in data:
+            row = _Row(item)
+            for name, resolver in resolvers:
+                item[name] = resolver(row)
+    return data
+
+
+def schema_dump(schema, objs, fields):
+    """
+    常规序列化并按稀疏字段裁剪输出
+    """
+    return [schema.from_orm(obj).dict(include=set(fields)) for obj in objs]
+
+
+@lru_cache(maxsize=None)
+def get_schema_relations(schema, model, prefix=''):
+    """
+    根据响应 schema 推导 select_related / prefetch_related / only
+    :return: (select_related, prefetch_related, only), schema 中存在无法映射到模型字段的属性或 resolver 时 only 为 None
+    """
+    select_related, prefetch_related, only = [], [], []
+    resolvers = getattr(schema, '_ninja_resolvers', {})
+    exact = not resolvers
+    for name, field in schema.__fields__.items():
+        if name in resolvers:
+            continue
+        nested = field.type_ if isinstance(field.type_, type) and issubclass(field.type_, BaseModel) else None
+        parts = (field.alias or name).split('.')
+        current, lookups, prefetch = model, [], False
+        for index, part in enumerate(parts):
+            try:
+                model_field = current._meta.get_field(part)
+            except FieldDoesNotExist:
+                exact = False
+                break
+            lookups.append(model_field.name)
+            last = index == len(parts) - 1
+            if model_field.many_to_many or model_field.one_to_many:
+                # 多对多/反向外键只能预取, 其下的字段无法再用 only 约束
+                prefetch_related.append(prefix + '__'.join(lookups))
+                prefetch = True
+                break
+            if model_field.is_relation and (not last or nested):
+                select_related.append(prefix + '__'.join(lookups))
+                current = model_field.related_model
+        else:
+            if nested is not None and issubclass(nested, ModelSchema):
+                related = get_schema_relations(nested, current, prefix + '__'.join(lookups) + '__')
+                select_related.extend(related[0])
+                prefetch_related.extend(related[1])
+                if related[2] is None:
+                    exact = False
+                else:
+                    only.extend(related[2])
+            elif nested is not None:
+                exact = False
+            else:
+                only.append(prefix + '__'.join(lookups))
+        if prefetch and len(lookups) > 1:
+            exact = False
+    return tuple(select_related), tuple(prefetch_related), tuple(only) if exact else None
+
+
+def optimize_queryset(queryset, schema):
+    """
+    按响应 schema 自动应用 select_related / prefetch_related / only, 避免序列化时逐行查询关联对象
+    """
+    select_related, prefetch_related, only = get_schema_relations(schema, queryset.model)
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetch_related:
+        queryset = queryset.prefetch_related(*prefetch_related)
+    if only:
+        queryset = queryset.only(*only)
+    return queryset
+
+
+def paginate_values(schema=None, pagination_class=MyPagination, **paginator_params) -> Callable:
+    """
+    列表接口统一使用的分页装饰器, 代替 ninja 的 paginate(MyPagination), 输出结构与其一致:
+
+    @router.get("/dict", response=List[SchemaOut])
+    @paginate_values()
+    def list_dict(request, filters: Filters = Query(...)):
+        return retrieve(request, Dict, filters)
+
+    - schema: 列表项 schema, 默认取接口 response=List[...] 的元素类型
+    - 分页参数 fields(?fields=id,name) 为稀疏字段, 只查询并返回指定列
+    - schema 的字段都能直接映射到模型列时, 用 values_list 生成输出, 不实例化 model 和 schema;
+      此时直接返回 FuResponse, 不再经过 ninja 的响应校验, 输出与常规序列化一致由
+      system.tests.PaginateValuesTest 对所有列表接口逐一对比保证
+    - schema 含计算型 resolver、嵌套 schema、文件字段时回退到常规序列化, 仍由 response 校验
+    """
+    paginator: PaginationBase = pagination_class(**paginator_params)
+
+    def wrapper(func: Callable) -> Callable:
+        state = {'schema': schema}
+
+        @wraps(func)
+        def view_with_pagination(*args: Any, **kwargs: Any) -> Any:
+            pagination_params = kwargs.pop("ninja_pagination")
+            queryset = func(*args, **kwargs)
+            if isinstance(queryset, HttpResponseBase):
+                return queryset
+            item_schema = state['schema']
+            fields = parse_fields(getattr(pagination_params, 'fields', None), item_schema)
+            result = paginator.paginate_queryset(queryset, pagination=pagination_params, **kwargs)
+            # 已求值的 QuerySet 切片后是 list, 无法再走 values_list
+            columns = get_schema_columns(item_schema, queryset.model, fields) \
+                if isinstance(result["items"], QuerySet) else None
+            if columns is not None:
+                items = schema_values(result["items"], columns)
+            elif fields:
+                items = schema_dump(item_schema, result["items"], fields)
+            else:
+                result[paginator.items_attribute] = list(result[paginator.items_attribute])
+                return result
+            data = {
+                "items": items,
+                "total": result["total"],
+            }
+            return FuResponse(data=data, content_type="application/json; charset=utf-8")
+
+        def contribute_to_operation(op) -> None:
+            if state['schema'] is None:
+                state['schema'] = _find_collection_response(op)[1]
+            make_response_paginated(paginator, op)
+
+        view_with_pagination._ninja_contribute_args = [  # type: ignore
+            ("ninja_pagination", paginator.Input, paginator.InputSource),
+        ]
+        view_with_pagination._ninja_contribute_to_operation = contribute_to_operation  # type: ignore
+        # 供测试找到所有列表接口及其列表项 schema
+        view_with_pagination._paginate_values = state  # type: ignore
+        return view_with_pagination
+
+    return wrapper
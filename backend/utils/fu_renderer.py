@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+# @FileName: fu_renderer.py
+# @Software: PyCharm
+"""
+统一 JSON 序列化: 优先使用 orjson, 未安装时回退到标准库 json
+FuNinjaAPI.create_response 与 FuResponse 共用, 保证两种响应的日期等格式一致
+"""
+import datetime
+import decimal
+import json
+import uuid
+from typing import Any
+
+from django.http import HttpRequest
+from django.utils.functional import Promise
+from ninja.renderers import BaseRenderer
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def json_default(obj):
+    """
+    orjson / json 均无法直接处理的类型
+    """
+    if isinstance(obj, datetime.datetime):
+        if obj.tzinfo is None:
+            # 与 DATETIME_FORMAT 输出一致, 比 strftime 快数倍
+            return obj.isoformat(' ', 'seconds')
+        return obj.strftime(DATETIME_FORMAT)
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, BaseModel):
+        return obj.dict()
+    if isinstance(obj, Promise):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class _StdlibEncoder(json.JSONEncoder):
+    def default(self, obj):
+        return json_default(obj)
+
+
+if orjson is not None:
+    _ORJSON_OPTION = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def json_dumps(data: Any) -> bytes:
+        return orjson.dumps(data, default=json_default, option=_ORJSON_OPTION)
+else:
+    def json_dumps(data: Any) -> bytes:
+        return json.dumps(data, cls=_StdlibEncoder, ensure_ascii=False).encode('utf-8')
+
+
+class FuJSONRenderer(BaseRenderer):
+    """
+    FuNinjaAPI 默认渲染器, 可通过 FuNinjaAPI(renderer=...) 替换
+    """
+    media_type = "application/json"
+
+    def render(self, request: HttpRequest, data: Any, *, response_status: int) -> Any:
+        return json_dumps(data)
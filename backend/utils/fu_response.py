@@ -5,11 +5,9 @@
 # @Software: PyCharm
 # -*- coding: utf-8 -*-
 
-import json
-
 from django.http import HttpResponse
 
-from .fu_jwt import DateEncoder
+from .fu_renderer import json_dumps
 
 # class JsonResponse(HttpResponse):
 #
@@ -29,6 +27,18 @@ from .fu_jwt import DateEncoder
 # 		super().__init__(content=data, **kwargs)
 
 
+def set_response_meta(response, code, msg, success=True):
+	"""
+	响应对象上挂载业务元数据(code, message, success), 供中间件直接读取, 无需反序列化响应体
+	"""
+	response.meta = {
+		"code": code,
+		"message": msg,
+		"success": success
+	}
+	return response
+
+
 class FuResponse(HttpResponse):
 
 	def __init__(self, data=None, msg='success', code=2000, *args, **kwargs):
@@ -38,5 +48,6 @@ class FuResponse(HttpResponse):
 			"message": msg,
 			"success": True
 		}
-		data = json.dumps(std_data, cls=DateEncoder)
+		data = json_dumps(std_data)
 		super().__init__(data, *args, **kwargs)
+		set_response_meta(self, code, msg)
@@ -9,6 +9,7 @@ from django.utils.deprecation import MiddlewareMixin
 from system.models import OperationLog, Users
 
 from .request_util import (
+    encode_log_payload,
     get_browser,
     get_os,
     get_request_data,
@@ -16,6 +17,7 @@ from .request_util import (
     get_request_path,
     get_request_user,
     get_verbose_name,
+    redact_data,
 )
 
 
@@ -39,17 +41,27 @@ class ApiLoggingMiddleware(MiddlewareMixin):
     def __handle_response(self, request, response):
         # request_data,request_ip由PermissionInterfaceMiddleware中间件中添加的属性
         body = getattr(request, 'request_data', {})
-        # 请求含有password则用*替换掉(暂时先用于所有接口的password请求参数)
-        if isinstance(body, dict) and body.get('password', ''):
-            body['password'] = '*' * len(body['password'])
-        if not hasattr(response, 'data') or not isinstance(response.data, dict):
-            response.data = {}
-        try:
-            if not response.data and response.content:
-                content = json.loads(response.content.decode())
-                response.data = content if isinstance(content, dict) else {}
-        except Exception:
-            return
+        # 按 API_LOG_REDACT_FIELDS 脱敏(password 等)
+        body = redact_data(body)
+        meta = getattr(response, 'meta', None)
+        content = None
+        max_size = getattr(settings, 'API_LOG_MAX_BODY_SIZE', None) or 0
+        is_json = meta is not None or response.get('Content-Type', '').startswith('application/json')
+        if is_json and not getattr(response, 'streaming', False):
+            # 只解析小体积响应体; 超过 API_LOG_MAX_BODY_SIZE 的直接截取原文记录, 入库时同样会被截断
+            if len(response.content) <= max_size:
+                try:
+                    content = json.loads(response.content.decode())
+                    content = content if isinstance(content, dict) else {'result': content}
+                except Exception:
+                    content = None
+            else:
+                content = {'result': response.content[:max_size].decode('utf-8', 'ignore')}
+        if meta is None:
+            # 非 FuResponse/FuNinjaAPI 构建的响应(如 ninja 参数校验错误)从响应体中读取 code
+            if content is None:
+                return
+            meta = content
         user = get_request_user(request)
         if isinstance(user, AnonymousUser):
             return
@@ -60,13 +72,14 @@ class ApiLoggingMiddleware(MiddlewareMixin):
             'belong_dept': user.dept_id if isinstance(user, Users) else user['dept'],
             'request_method': request.method,
             'request_path': request.request_path,
-            'request_body': body,
-            'response_code': response.data.get('code'),
+            'request_body': encode_log_payload(body),
+            'response_code': meta.get('code'),
             'request_os': get_os(request),
             'request_browser': get_browser(request),
             'request_msg': request.session.get('request_msg'),
-            'status': True if response.data.get('code') in [2000, ] else False,
-            'json_result': {"code": response.data.get('code'), "msg": response.data.get('result')},
+            'status': True if meta.get('code') in [2000, ] else False,
+            'json_result': encode_log_payload({"code": meta.get('code'),
+                                               "msg": content.get('result') if content else meta.get('message')}),
         }
         operation_log, creat = OperationLog.objects.update_or_create(defaults=info, id=self.operation_log_id)
         if not operation_log.request_modular and settings.API_MODEL_MAP.get(request.request_path, None):
@@ -8,6 +8,8 @@ import uuid
 
 from django.apps import apps
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
 
 from fuadmin import settings
 
@@ -34,6 +36,164 @@ class CoreModel(models.Model):
         verbose_name_plural = verbose_name
 
 
+TREE_PATH_SEPARATOR = '/'
+# 内部维护的物化路径字段, 不对外输出
+TREE_FIELDS = ('tree_path', 'tree_depth')
+
+
+class TreeQuerySet(models.QuerySet):
+    """
+    物化路径树查询: 子孙、祖先、整棵子树均为一条走索引的查询
+    """
+
+    def descendants(self, node, include_self=False):
+        query_set = self.filter(tree_path__startswith=node.tree_path)
+        return query_set if include_self else query_set.exclude(pk=node.pk)
+
+    def ancestors(self, node, include_self=False):
+        ids = node.get_ancestor_ids(include_self)
+        return self.filter(pk__in=ids).order_by('tree_depth')
+
+    def subtree(self, *nodes):
+        """
+        多个节点(含自身)的整棵子树
+        """
+        condition = models.Q()
+        for node in nodes:
+            condition |= models.Q(tree_path__startswith=node.tree_path)
+        return self.filter(condition) if nodes else self.none()
+
+    def public_values(self):
+        """
+        不含 tree_path、tree_depth 的 values(), 用于直接返回给前端的列表
+        """
+        return self.values(*[field.attname for field in self.model._meta.concrete_fields
+                             if field.name not in TREE_FIELDS])
+
+    def ancestors_of(self, nodes, include_self=False):
+        """
+        多个节点的祖先并集
+        """
+        ids = set()
+        for node in nodes:
+            ids.update(node.get_ancestor_ids(include_self))
+        return self.filter(pk__in=ids).order_by('tree_depth')
+
+
+class TreeModel(CoreModel):
+    """
+    树形抽象模型: 在 parent 外键之外维护物化路径 tree_path(如 /1/5/12/) 和深度 tree_depth
+    保存、移动节点时自动更新自身及子孙节点的路径; bulk_create、queryset.update 等不经过 save 的写入后
+    需调用 rebuild_tree; migrate 后自动回填 tree_path 为空的数据(见 system.signals.backfill_tree_path),
+    也可手动执行 python manage.py rebuild_tree
+    """
+    tree_parent_field = 'parent'
+
+    tree_path = models.CharField(max_length=255, default='', blank=True, db_index=True, verbose_name="树路径",
+                                 help_text="树路径")
+    tree_depth = models.IntegerField(default=0, blank=True, verbose_name="树深度", help_text="树深度")
+
+    objects = TreeQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def _tree_parent(cls):
+        # (外键字段, 外键值对应的父节点字段名), 如 Area.pcode 指向父节点 code
+        field = cls._meta.get_field(cls.tree_parent_field)
+        return field, field.target_field.attname
+
+    def get_ancestor_ids(self, include_self=False):
+        ids = [int(pk) for pk in self.tree_path.strip(TREE_PATH_SEPARATOR).split(TREE_PATH_SEPARATOR) if pk]
+        return ids if include_self else ids[:-1]
+
+    def get_descendants(self, include_self=False):
+        return type(self).objects.descendants(self, include_self)
+
+    def get_ancestors(self, include_self=False):
+        return type(self).objects.ancestors(self, include_self)
+
+    def _build_tree_path(self):
+        field, target = self._tree_parent()
+        parent_value = getattr(self, field.attname)
+        parent = None
+        if parent_value is not None:
+            parent = type(self).objects.filter(**{target: parent_value}).values('pk', 'tree_path').first()
+        if parent is None or not parent['tree_path']:
+            return f'{TREE_PATH_SEPARATOR}{self.pk}{TREE_PATH_SEPARATOR}'
+        return f"{parent['tree_path']}{self.pk}{TREE_PATH_SEPARATOR}"
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        field, _ = self._tree_parent()
+        if update_fields is not None and not {field.name, field.attname} & set(update_fields):
+            return super().save(*args, **kwargs)
+        old_path = self.tree_path if self.pk is not None else ''
+        if self.pk is None or not old_path:
+            # 新节点需先取得主键
+            super().save(*args, **kwargs)
+            kwargs = {key: value for key, value in kwargs.items() if key == 'using'}
+            kwargs['update_fields'] = ['tree_path', 'tree_depth']
+        else:
+            if update_fields is not None:
+                kwargs['update_fields'] = list(update_fields) + ['tree_path', 'tree_depth']
+        new_path = self._build_tree_path()
+        if old_path and new_path.startswith(old_path) and new_path != old_path:
+            raise TimeoutError(400, '不能将节点移动到自身或其子节点下')
+        self.tree_path = new_path
+        self.tree_depth = new_path.count(TREE_PATH_SEPARATOR) - 2
+        super().save(*args, **kwargs)
+        if old_path and old_path != new_path:
+            self._move_descendants(old_path, new_path)
+
+    def _move_descendants(self, old_path, new_path):
+        # 一条 UPDATE 替换所有子孙节点的路径前缀
+        type(self).objects.filter(tree_path__startswith=old_path).exclude(pk=self.pk).update(
+            tree_path=Concat(Value(new_path), Substr('tree_path', len(old_path) + 1),
+                             output_field=models.CharField()),
+            tree_depth=F('tree_depth') + (new_path.count(TREE_PATH_SEPARATOR) - old_path.count(TREE_PATH_SEPARATOR)),
+        )
+
+    @classmethod
+    def rebuild_tree(cls, batch_size=1000, using=None):
+        """
+        按 parent 关系重新计算所有节点的路径和深度, 只写入有变化的节点
+        :return: 更新的节点数
+        """
+        field, target = cls._tree_parent()
+        manager = cls.objects.db_manager(using)
+        rows = list(manager.values('pk', target, field.attname, 'tree_path', 'tree_depth'))
+        by_key = {row[target]: row for row in rows}
+        paths = {}
+
+        def resolve(row):
+            # 迭代向上查找, 避免深树递归过深; 父节点缺失或成环时作为根节点
+            chain = []
+            seen = set()
+            current = row
+            while current is not None and current['pk'] not in paths and current['pk'] not in seen:
+                seen.add(current['pk'])
+                chain.append(current)
+                parent_value = current[field.attname]
+                current = by_key.get(parent_value) if parent_value is not None else None
+            prefix = paths.get(current['pk'], TREE_PATH_SEPARATOR) if current is not None else TREE_PATH_SEPARATOR
+            for node in reversed(chain):
+                prefix = f"{prefix}{node['pk']}{TREE_PATH_SEPARATOR}"
+                paths[node['pk']] = prefix
+
+        changed = []
+        for row in rows:
+            if row['pk'] not in paths:
+                resolve(row)
+            path = paths[row['pk']]
+            depth = path.count(TREE_PATH_SEPARATOR) - 2
+            if row['tree_path'] != path or row['tree_depth'] != depth:
+                changed.append(cls(pk=row['pk'], tree_path=path, tree_depth=depth))
+        manager.bulk_update(changed, ['tree_path', 'tree_depth'], batch_size=batch_size)
+        return len(changed)
+
+
 def get_all_models_objects(model_name=None):
     """
     获取所有 models 对象
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+# @FileName: password.py
+# @Software: PyCharm
+"""
+密码哈希
+
+- PBKDF2 等算法在 hashlib 中计算时释放 GIL, 使用线程池即可多核并行, 线程数由 PASSWORD_HASH_WORKERS 配置
+- 批量哈希时相同明文只计算一次(如批量创建用户的默认密码)
+- 登录校验同样提交到该线程池, 同时运行的哈希计算不超过线程数, 不阻塞事件循环与同步 worker 的其它请求
+- 迭代次数由 PASSWORD_HASH_ITERATIONS 配置, 修改后旧哈希在用户下次登录时重新计算
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, check_password, make_password
+
+from fuadmin import settings
+
+_lock = threading.Lock()
+_executor = None
+
+
+class FuPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    迭代次数可配置的 PBKDF2 算法, 需放在 PASSWORD_HASHERS 首位
+    """
+    iterations = getattr(settings, 'PASSWORD_HASH_ITERATIONS', PBKDF2PasswordHasher.iterations)
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=getattr(settings, 'PASSWORD_HASH_WORKERS', 4),
+                                               thread_name_prefix='password-hash')
+    return _executor
+
+
+def hash_passwords(passwords):
+    """
+    批量计算密码哈希, 返回与 passwords 顺序一致的哈希列表
+    """
+    unique = list(dict.fromkeys(passwords))
+    if len(unique) <= 1:
+        hashes = [make_password(password) for password in unique]
+    else:
+        hashes = list(get_executor().map(make_password, unique))
+    mapping = dict(zip(unique, hashes))
+    return [mapping[password] for password in passwords]
+
+
+def _verify(password, encoded):
+    if not encoded:
+        # 用户不存在时同样计算一次哈希, 避免通过响应时间判断账号是否存在
+        make_password(password)
+        return False, None
+    rehashed = []
+    valid = check_password(password, encoded, setter=lambda raw: rehashed.append(make_password(raw)))
+    return valid, rehashed[0] if rehashed else None
+
+
+def verify_password(password, encoded):
+    """
+    在线程池中校验密码
+    :return: (是否通过, 哈希参数变化时的新哈希或 None)
+    """
+    return get_executor().submit(_verify, password, encoded).result()
+
+
+async def averify_password(password, encoded):
+    return await asyncio.wrap_future(get_executor().submit(_verify, password, encoded))
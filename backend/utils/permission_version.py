@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+# @FileName: permission_version.py
+# @Software: PyCharm
+"""
+权限版本号
+
+- 全局版本: 角色、菜单、按钮、列权限变更时递增, 影响所有用户
+- 用户版本: 用户信息或用户角色变更时递增, 只影响该用户
+登录时两个版本号写入 token, 认证时版本未变化则直接信任 token 中的用户信息, 无需查询数据库
+版本号保存在缓存(Redis)中, 进程内再缓存 PERMISSION_VERSION_LOCAL_TTL 秒
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.db import transaction
+
+from fuadmin import settings
+from system.models import Role, Users
+
+GLOBAL_VERSION_KEY = 'perm_version:global'
+USER_VERSION_KEY = 'perm_version:user:{}'
+
+_lock = threading.Lock()
+_versions = {}
+_contexts = OrderedDict()
+_permissions = OrderedDict()
+_LOCAL_SIZE = 10000
+
+
+def _local_ttl():
+    return getattr(settings, 'PERMISSION_VERSION_LOCAL_TTL', 5)
+
+
+def _get_version(key):
+    now = time.time()
+    entry = _versions.get(key)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+    version = cache.get(key) or 0
+    _versions[key] = (now + _local_ttl(), version)
+    return version
+
+
+def _bump_version(key):
+    cache.add(key, 0, timeout=None)
+    try:
+        version = cache.incr(key)
+    except ValueError:
+        version = int(time.time() * 1000)
+        cache.set(key, version, timeout=None)
+    _versions.pop(key, None)
+    return version
+
+
+def get_global_version():
+    return _get_version(GLOBAL_VERSION_KEY)
+
+
+def get_user_version(user_id):
+    return _get_version(USER_VERSION_KEY.format(user_id))
+
+
+def bump_global_version():
+    # 事务提交后再递增, 避免并发请求按新版本缓存到未提交前的数据
+    transaction.on_commit(lambda: _bump_version(GLOBAL_VERSION_KEY))
+
+
+def bump_user_version(*user_ids):
+    for user_id in user_ids:
+        transaction.on_commit(lambda key=USER_VERSION_KEY.format(user_id): _bump_version(key))
+
+
+def _lru_get(store, key):
+    with _lock:
+        value = store.get(key)
+        if value is not None:
+            store.move_to_end(key)
+        return value
+
+
+def _lru_set(store, key, value):
+    with _lock:
+        store[key] = value
+        while len(store) > _LOCAL_SIZE:
+            store.popitem(last=False)
+
+
+def get_token_versions(user_id):
+    """
+    登录时写入 token 的版本号
+    """
+    return {'perm_version': get_global_version(), 'user_version': get_user_version(user_id)}
+
+
+def get_auth_context(payload):
+    """
+    获取认证所需的用户信息 {'id', 'is_superuser', 'role'}
+    token 中的版本号与当前一致时直接使用 token 内容, 否则从数据库重新加载(按版本缓存在进程内)
+    :return: 用户不存在时返回 None
+    """
+    user_id = payload['id']
+    global_version = get_global_version()
+    user_version = get_user_version(user_id)
+    if payload.get('perm_version') == global_version and payload.get('user_version') == user_version:
+        return {'id': user_id, 'is_superuser': payload['is_superuser'], 'role': payload.get('role') or []}
+    key = (user_id, global_version, user_version)
+    context = _lru_get(_contexts, key)
+    if context is None:
+        user = Users.objects.filter(id=user_id).only('id', 'is_superuser').first()
+        if user is None:
+            return None
+        context = {'id': user_id, 'is_superuser': user.is_superuser,
+                   'role': list(user.role.values_list('id', flat=True))}
+        _lru_set(_contexts, key, context)
+    return context
+
+
+def has_api_permission(role_ids, request_path, method):
+    """
+    判断角色是否拥有接口权限, 角色接口列表按全局版本缓存在进程内
+    """
+    key = (tuple(sorted(role_ids)), get_global_version())
+    apis = _lru_get(_permissions, key)
+    if apis is None:
+        apis = list(Role.objects.filter(id__in=role_ids, permission__isnull=False)
+                    .values_list('permission__api', 'permission__method').distinct())
+        _lru_set(_permissions, key, apis)
+    try:
+        pattern = re.compile(request_path)
+    except re.error:
+        return False
+    return any(api_method == method and pattern.search(api or '') for api, api_method in apis)
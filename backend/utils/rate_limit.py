@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+# @FileName: rate_limit.py
+# @Software: PyCharm
+"""
+接口限流(令牌桶)
+
+- 规则在 settings.RATE_LIMIT_RULES 中按路由声明, 写法同 WHITE_LIST, * 匹配路径中的任意一段;
+  每条规则可分别限制每个 IP(ip)和每个登录用户(user): (桶容量, 每秒补充的令牌数)
+- 令牌桶默认保存在进程内存中, 每个进程独立计数; RATE_LIMIT_REDIS_SYNC 开启且缓存为 Redis 时,
+  以 Lua 脚本在 Redis 中原子扣减, 多个节点共享同一个桶, Redis 不可用时回退到进程内计数
+- 超出限制返回 429, Retry-After 为下一个令牌到达的秒数
+"""
+import logging
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.utils.deprecation import MiddlewareMixin
+
+from fuadmin import settings
+
+from .fu_response import FuResponse
+from .request_util import get_request_ip
+from .usual import get_user_info_from_token
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_KEY = 'rate_limit:{}'
+
+# KEYS: 本次请求涉及的所有桶; ARGV: 当前时间, 之后每个桶依次为 容量, 每秒补充令牌数
+# 所有桶都有令牌时才同时扣减, 返回 {是否通过, 需要等待的秒数}
+TOKEN_BUCKET_SCRIPT = """
+local now = tonumber(ARGV[1])
+local buckets = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2])
+    local rate = tonumber(ARGV[i * 2 + 1])
+    local bucket = redis.call('HMGET', key, 'tokens', 'updated')
+    local tokens = tonumber(bucket[1]) or capacity
+    local updated = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+    if tokens < 1 then
+        wait = math.max(wait, (1 - tokens) / rate)
+    end
+    buckets[i] = {tokens, capacity, rate}
+end
+for i, key in ipairs(KEYS) do
+    local tokens = buckets[i][1]
+    if wait == 0 then
+        tokens = tokens - 1
+    end
+    redis.call('HMSET', key, 'tokens', tostring(tokens), 'updated', tostring(now))
+    redis.call('EXPIRE', key, math.ceil(buckets[i][2] / buckets[i][3]) + 1)
+end
+return {wait == 0 and 1 or 0, tostring(wait)}
+"""
+
+
+def compile_rules(rules):
+    """
+    {路由模式: 限制} -> [(正则, 路由模式, 限制)], 按声明顺序匹配第一条
+    """
+    compiled = []
+    for pattern, limits in (rules or {}).items():
+        regex = '/'.join('[^/]+' if part == '*' else re.escape(part) for part in pattern.split('/'))
+        compiled.append((re.compile(f'^{regex}/?$'), pattern, limits))
+    return compiled
+
+
+class TokenBucketLimiter:
+
+    def __init__(self, local_size=100000, redis_sync=False):
+        self.local_size = local_size
+        self.redis_sync = redis_sync
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self._script = None
+
+    def _redis_script(self):
+        if self._script is None:
+            try:
+                from django_redis import get_redis_connection
+                self._script = get_redis_connection('default').register_script(TOKEN_BUCKET_SCRIPT)
+            except Exception:
+                self._script = False
+        return self._script
+
+    def _consume_local(self, buckets, now):
+        with self._lock:
+            states = []
+            wait = 0
+            for key, capacity, rate in buckets:
+                tokens, updated = self._buckets.pop(key, (capacity, now))
+                tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+                if tokens < 1:
+                    wait = max(wait, (1 - tokens) / rate)
+                states.append((key, tokens))
+            for key, tokens in states:
+                self._buckets[key] = (tokens - 1 if not wait else tokens, now)
+            while len(self._buckets) > self.local_size:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def _consume_redis(self, buckets, now):
+        script = self._redis_script()
+        if not script:
+            return None
+        args = [now]
+        for _, capacity, rate in buckets:
+            args.extend([capacity, rate])
+        try:
+            _, wait = script(keys=[RATE_LIMIT_KEY.format(key) for key, _, _ in buckets], args=args)
+        except Exception as e:
+            logger.warning(f"Redis 限流不可用, 使用进程内令牌桶: {e}")
+            return None
+        return float(wait)
+
+    def consume(self, buckets):
+        """
+        buckets: [(桶, 容量, 每秒补充令牌数)], 先检查所有桶, 都有令牌时才同时各取一个, 被拒绝的请求不消耗任何桶
+        :return: 0 表示通过, 否则为需要等待的秒数
+        """
+        if not buckets:
+            return 0
+        now = time.time()
+        wait = self._consume_redis(buckets, now) if self.redis_sync else None
+        if wait is None:
+            wait = self._consume_local(buckets, now)
+        return wait
+
+
+def get_request_user_id(request):
+    if not request.META.get('HTTP_AUTHORIZATION'):
+        return None
+    try:
+        return get_user_info_from_token(request).get('id')
+    except Exception:
+        return None
+
+
+class RateLimitMiddleware(MiddlewareMixin):
+    """
+    按 RATE_LIMIT_RULES 对接口限流, 需放在 MIDDLEWARE 靠前位置, 被拒绝的请求不再经过会话、日志等中间件
+    """
+
+    def __init__(self, get_response=None):
+        super().__init__(get_response)
+        self.enable = getattr(settings, 'RATE_LIMIT_ENABLE', False)
+        self.rules = compile_rules(getattr(settings, 'RATE_LIMIT_RULES', None))
+        self.limiter = TokenBucketLimiter(getattr(settings, 'RATE_LIMIT_LOCAL_SIZE', 100000),
+                                          getattr(settings, 'RATE_LIMIT_REDIS_SYNC', False))
+
+    def process_request(self, request):
+        if not self.enable or request.method == 'OPTIONS':
+            return None
+        path = request.path
+        for regex, pattern, limits in self.rules:
+            if regex.match(path):
+                break
+        else:
+            return None
+        identities = {'ip': get_request_ip(request)}
+        if limits.get('user'):
+            identities['user'] = get_request_user_id(request)
+        buckets = [(f'{pattern}:{scope}:{identity}', *limits[scope]) for scope, identity in identities.items()
+                   if limits.get(scope) and identity is not None]
+        retry_after = self.limiter.consume(buckets)
+        if retry_after:
+            response = FuResponse(code=429, msg='请求过于频繁, 请稍后再试', status=429)
+            response['Retry-After'] = str(max(1, math.ceil(retry_after)))
+            return response
+        return None
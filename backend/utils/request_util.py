@@ -1,7 +1,10 @@
 """
 Request工具类
 """
+import base64
 import json
+import logging
+import zlib
 
 import requests
 from django.conf import settings
@@ -12,6 +15,8 @@ from user_agents import parse
 
 from .usual import get_user_info_from_token
 
+logger = logging.getLogger(__name__)
+
 
 def get_request_user(request):
     """
@@ -44,15 +49,32 @@ def get_request_ip(request):
     return ip or 'unknown'
 
 
+def is_capture_skipped(request):
+    """
+    判断请求体是否跳过日志采集(文件上传、二进制等大体积内容类型)
+    :param request:
+    :return:
+    """
+    content_type = request.META.get('CONTENT_TYPE', '') or ''
+    skip_types = getattr(settings, 'API_LOG_SKIP_CONTENT_TYPES', None) or []
+    return any(content_type.startswith(item) for item in skip_types)
+
+
 def get_request_data(request):
     """
     获取请求参数
+    multipart 等跳过采集的请求只记录 query 参数, 不读取 request.body/request.POST, 避免日志缓冲上传文件
     :param request:
     :return:
     """
     request_data = getattr(request, 'request_data', None)
     if request_data:
         return request_data
+    if is_capture_skipped(request):
+        data: dict = request.GET.dict()
+        data['_body'] = '<skipped: {}, {} bytes>'.format(
+            request.META.get('CONTENT_TYPE', '').split(';')[0], request.META.get('CONTENT_LENGTH') or 0)
+        return data
     data: dict = {**request.GET.dict(), **request.POST.dict()}
     if not data:
         try:
@@ -66,6 +88,59 @@ def get_request_data(request):
     return data
 
 
+def redact_data(data, fields=None):
+    """
+    脱敏请求参数, 返回副本, 不修改原数据
+    :param data: dict/list
+    :param fields: 需要脱敏的字段, 默认读取 API_LOG_REDACT_FIELDS
+    :return:
+    """
+    if fields is None:
+        fields = set(getattr(settings, 'API_LOG_REDACT_FIELDS', None) or [])
+    if isinstance(data, dict):
+        return {key: '******' if key in fields and value else redact_data(value, fields)
+                for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [redact_data(item, fields) for item in data]
+    return data
+
+
+LOG_PAYLOAD_COMPRESS_PREFIX = 'zlib:'
+
+
+def encode_log_payload(data):
+    """
+    日志内容入库编码: 序列化 -> 按 API_LOG_MAX_BODY_SIZE 截断 -> 超过 API_LOG_COMPRESS_THRESHOLD 压缩
+    :param data:
+    :return: str
+    """
+    if data is None:
+        return None
+    text = data if isinstance(data, str) else json.dumps(data, ensure_ascii=False, default=str)
+    raw = text.encode('utf-8')
+    max_size = getattr(settings, 'API_LOG_MAX_BODY_SIZE', None)
+    if max_size and len(raw) > max_size:
+        raw = raw[:max_size].decode('utf-8', 'ignore').encode('utf-8') + b'...(truncated)'
+    threshold = getattr(settings, 'API_LOG_COMPRESS_THRESHOLD', None)
+    if threshold and len(raw) > threshold:
+        return LOG_PAYLOAD_COMPRESS_PREFIX + base64.b64encode(zlib.compress(raw)).decode('ascii')
+    return raw.decode('utf-8')
+
+
+def decode_log_payload(value):
+    """
+    日志内容解码, 兼容未压缩的历史数据; 无法解压的内容记录警告并原样返回(带 zlib: 前缀)
+    :param value:
+    :return: str
+    """
+    if value and value.startswith(LOG_PAYLOAD_COMPRESS_PREFIX):
+        try:
+            return zlib.decompress(base64.b64decode(value[len(LOG_PAYLOAD_COMPRESS_PREFIX):])).decode('utf-8')
+        except Exception:
+            logger.warning("日志内容解压失败, 返回原始内容", exc_info=True)
+    return value
+
+
 def get_request_path(request, *args, **kwargs):
     """
     获取请求路径
@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+# @FileName: response_cache.py
+# @Software: PyCharm
+"""
+GET 列表接口响应缓存
+
+@router.get("/dict", response=List[SchemaOut])
+@cache_response(Dict)
+@paginate_values()
+def list_dict(request, filters: Filters = Query(...)):
+    ...
+
+- 缓存键: 路由 + 排序后的查询参数 + 调用者的数据权限范围 + 相关模型的版本号
+- 模型版本号保存在缓存(Redis)中, 由 post_save/post_delete/m2m_changed/set_m2m 等信号在事务提交后递增,
+  版本变化后旧缓存不再命中, 自然过期; update()/bulk_create 等不触发信号的写入需调用 bump_model_version
+- 依赖的模型 = 声明的模型 + 响应 schema 中的模型及其关联模型(如 creator.username 对应 Users) + Dept(数据权限)
+- 维护版本号的模型在 settings.RESPONSE_CACHE_MODELS 中登记, 启动时(SystemConfig.ready)连接信号,
+  celery、管理命令等进程中的写入同样递增版本号; 接口依赖未登记的模型时生成路由报错
+- 两级缓存: 进程内 LRU 在前, CACHES(Redis) 在后
+- 只缓存认证通过且 code 为 2000 的响应
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.http import HttpResponse
+from ninja import ModelSchema
+from ninja.signature import is_async
+from pydantic import BaseModel
+
+from fuadmin import settings
+
+from .fu_response import set_response_meta
+from .permission_version import get_global_version, get_user_version
+from .usual import get_user_info_from_token
+
+MODEL_VERSION_KEY = 'model_version:{}'
+RESPONSE_KEY = 'response_cache:{}'
+
+_lock = threading.Lock()
+_tracked = set()
+_versions = {}
+_responses = OrderedDict()
+_scopes = OrderedDict()
+
+
+def _label(model):
+    return model._meta.label_lower
+
+
+def _local_set(store, key, value, size):
+    with _lock:
+        store[key] = value
+        store.move_to_end(key)
+        while len(store) > size:
+            store.popitem(last=False)
+
+
+def _local_get(store, key):
+    with _lock:
+        value = store.get(key)
+        if value is not None:
+            store.move_to_end(key)
+        return value
+
+
+def get_model_version(model):
+    label = _label(model)
+    now = time.time()
+    entry = _versions.get(label)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+    version = cache.get(MODEL_VERSION_KEY.format(label)) or 0
+    _versions[label] = (now + getattr(settings, 'RESPONSE_CACHE_VERSION_LOCAL_TTL', 1), version)
+    return version
+
+
+def _bump(label):
+    key = MODEL_VERSION_KEY.format(label)
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), timeout=None)
+    _versions.pop(label, None)
+
+
+def _model_changed(sender, **kwargs):
+    bump_model_version(sender)
+
+
+def track_models(*models):
+    """
+    登记需要维护版本号的模型, 并为其连接 post_save/post_delete
+    只连接到具体模型而不是全局接收, 避免其它模型的 QuerySet.delete 因存在删除信号接收者而无法快速删除
+    """
+    for model in models:
+        label = _label(model)
+        if label in _tracked:
+            continue
+        _tracked.add(label)
+        post_save.connect(_model_changed, sender=model, dispatch_uid=f'response_cache:{label}')
+        post_delete.connect(_model_changed, sender=model, dispatch_uid=f'response_cache:{label}')
+
+
+def track_settings_models():
+    """
+    登记 settings.RESPONSE_CACHE_MODELS 中的模型, 在 SystemConfig.ready 中调用
+    """
+    track_models(*(apps.get_model(label) for label in getattr(settings, 'RESPONSE_CACHE_MODELS', [])))
+
+
+def require_tracked(*models, usage=''):
+    """
+    使用模型版本号前检查模型已登记, 未登记的模型在其它进程中的变更不会递增版本号
+    """
+    missing = sorted({model._meta.label for model in models if _label(model) not in _tracked})
+    if missing:
+        raise ImproperlyConfigured(f"{usage}依赖的模型未登记版本号, 请加入 RESPONSE_CACHE_MODELS: {', '.join(missing)}")
+
+
+def bump_model_version(*models):
+    """
+    递增模型版本号(事务提交后), 使相关接口的响应缓存失效; 未登记的模型直接忽略
+    """
+    connection = transaction.get_connection()
+    for model in models:
+        label = _label(model)
+        if label not in _tracked:
+            continue
+        if connection.in_atomic_block:
+            # 同一事务内的多次变更(如批量删除逐行发送的信号)只递增一次;
+            # 以当前 run_on_commit 列表对象区分事务, 提交或回滚后 Django 会替换该列表
+            pending = getattr(connection, '_model_version_pending', None)
+            if pending is None or pending[0] is not connection.run_on_commit:
+                pending = (connection.run_on_commit, set())
+                connection._model_version_pending = pending
+            if label in pending[1]:
+                continue
+            pending[1].add(label)
+        transaction.on_commit(lambda label=label: _bump(label))
+
+
+def get_data_scope(request):
+    """
+    调用者的数据权限范围(data_permission 生成的过滤条件), 数据权限相同的用户共享缓存
+    按 (用户, 权限版本, 部门版本) 缓存在进程内, 避免每次请求查询角色
+    """
+    from system.models import Dept
+
+    from .fu_auth import data_permission
+    from .fu_ninja import FuFilters
+
+    user_info = get_user_info_from_token(request)
+    if user_info['is_superuser']:
+        return 'all'
+    user_id = user_info['id']
+    key = (user_id, user_info.get('dept'), get_global_version(), get_user_version(user_id), get_model_version(Dept))
+    scope = _local_get(_scopes, key)
+    if scope is None:
+        filters = data_permission(request, FuFilters()).dict(exclude_none=True)
+        scope = repr(sorted((name, sorted(value) if isinstance(value, list) else value)
+                            for name, value in filters.items()))
+        _local_set(_scopes, key, scope, getattr(settings, 'RESPONSE_CACHE_LOCAL_SIZE', 1000))
+    return scope
+
+
+def get_cache_key(request, models):
+    query = sorted((name, tuple(values)) for name, values in request.GET.lists())
+    versions = [get_model_version(model) for model in models]
+    raw = repr((request.path, query, get_data_scope(request), versions))
+    return RESPONSE_KEY.format(hashlib.sha256(raw.encode('utf-8')).hexdigest())
+
+
+def get_schema_models(schema, seen=None):
+    """
+    响应 schema(含分页等外层 schema)中的 ModelSchema 对应的模型, 及其 select_related/prefetch_related 关联的模型
+    """
+    from .fu_ninja import get_schema_relations
+
+    seen = set() if seen is None else seen
+    models = set()
+    if not isinstance(schema, type) or not issubclass(schema, BaseModel) or schema in seen:
+        return models
+    seen.add(schema)
+    model = getattr(getattr(schema, 'Config', None), 'model', None)
+    if issubclass(schema, ModelSchema) and model is not None:
+        models.add(model)
+        select_related, prefetch_related, _ = get_schema_relations(schema, model)
+        for lookup in select_related + prefetch_related:
+            current = model
+            for part in lookup.split('__'):
+                current = current._meta.get_field(part).related_model
+                models.add(current)
+    for field in schema.__fields__.values():
+        models |= get_schema_models(field.type_, seen)
+    return models
+
+
+def get_operation_models(operation, models):
+    """
+    接口依赖的模型: 声明的模型 + 响应 schema 推导的模型 + Dept(数据权限范围)
+    """
+    from system.models import Dept
+
+    result = {*models, Dept}
+    for response_model in (operation.response_models or {}).values():
+        field = getattr(response_model, '__fields__', {}).get('response')
+        if field is not None:
+            result |= get_schema_models(field.type_)
+    return sorted(result, key=_label)
+
+
+def cache_response(*models, timeout=None):
+    """
+    接口装饰器: 缓存 GET 接口的响应, models 为响应数据依赖的模型(响应 schema 中的关联模型自动加入), 任一模型变更后缓存失效
+    需放在 @router.get 之下; 缓存在 FuNinjaAPI 生成路由时应用到接口上(认证之后、参数解析之前)
+    """
+    assert models, "cache_response 需要指定依赖的模型"
+
+    def decorator(func):
+        func._response_cache = {'models': models, 'timeout': timeout}
+        return func
+
+    return decorator
+
+
+def _to_entry(response):
+    meta = getattr(response, 'meta', None)
+    if response.status_code != 200 or response.streaming or not meta or meta.get('code') != 2000:
+        return None
+    return response.status_code, response['Content-Type'], response.content, meta
+
+
+def _from_entry(entry):
+    status, content_type, content, meta = entry
+    response = HttpResponse(content, status=status, content_type=content_type)
+    return set_response_meta(response, meta['code'], meta['message'], meta.get('success', True))
+
+
+def apply_response_cache(operation):
+    """
+    按 @cache_response 声明包装 operation.run
+    """
+    options = getattr(operation.view_func, '_response_cache', None)
+    if options is None or getattr(operation, '_response_cache_applied', False) or is_async(operation.view_func):
+        return
+    operation._response_cache_applied = True
+    models = get_operation_models(operation, options['models'])
+    require_tracked(*models, usage=f"接口 {operation.path} 的响应缓存")
+    local_size = getattr(settings, 'RESPONSE_CACHE_LOCAL_SIZE', 1000)
+    timeout = options['timeout'] or getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+    run = operation.run
+
+    @wraps(run)
+    def cached_run(request, *args, **kwargs):
+        if request.method != 'GET':
+            return run(request, *args, **kwargs)
+        error = operation._run_checks(request)
+        if error:
+            return error
+        try:
+            key = get_cache_key(request, models)
+        except Exception as e:
+            return operation.api.on_exception(request, e)
+        entry = _local_get(_responses, key)
+        if entry is None:
+            entry = cache.get(key)
+            if entry is not None:
+                _local_set(_responses, key, entry, local_size)
+        if entry is not None:
+            return _from_entry(entry)
+        try:
+            temporal_response = operation.api.create_temporal_response(request)
+            values = operation._get_values(request, kwargs, temporal_response)
+            result = operation.view_func(request, **values)
+            response = operation._result_to_response(request, result, temporal_response)
+        except Exception as e:
+            return operation.api.on_exception(request, e)
+        entry = _to_entry(response)
+        if entry is not None:
+            cache.set(key, entry, timeout=timeout)
+            _local_set(_responses, key, entry, local_size)
+        return response
+
+    operation.run = cached_run
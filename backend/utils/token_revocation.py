@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+# @FileName: token_revocation.py
+# @Software: PyCharm
+"""
+token 注销(吊销)存储
+
+- 注销记录以 jti 为键写入缓存(Redis), 过期时间为 token 剩余有效期
+- 每个进程维护一份本地布隆过滤器, 通过 Redis pub/sub 同步新增的注销记录, 并定期从 Redis 全量重建
+- 绝大多数请求在内存中即可判定"未注销", 只有过滤器命中时才查询 Redis
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from django.core.cache import cache
+
+from fuadmin import settings
+
+logger = logging.getLogger(__name__)
+
+REVOKED_KEY_PREFIX = 'revoked_token:'
+REVOKED_CHANNEL = 'fuadmin:revoked_token'
+
+
+class BloomFilter:
+    """
+    简易布隆过滤器, 只增不删, 通过重建清理过期数据
+    """
+
+    def __init__(self, capacity=100000, error_rate=0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        digest = hashlib.sha256(value.encode('utf-8')).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:16], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class TokenRevocation:
+
+    def __init__(self, capacity=100000, error_rate=0.001, rebuild_interval=10 * 60):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.rebuild_interval = rebuild_interval
+        self.bloom = BloomFilter(capacity, error_rate)
+        # 本地过滤器是否与其它节点保持同步, 未同步时每次都查询缓存
+        self.synced = False
+        self._started = False
+        self._lock = threading.Lock()
+
+    def _redis(self):
+        try:
+            from django_redis import get_redis_connection
+            return get_redis_connection('default')
+        except Exception:
+            return None
+
+    def start(self):
+        """
+        首次使用时启动: 全量加载注销记录, 并启动 pub/sub 订阅线程
+        """
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            if self._redis() is None:
+                # 非 Redis 缓存(如本地内存缓存)只在本进程内生效, 本地过滤器即为全集
+                self.synced = True
+                return
+            thread = threading.Thread(target=self._listen, name='token-revocation', daemon=True)
+            thread.start()
+
+    def rebuild(self):
+        bloom = BloomFilter(self.capacity, self.error_rate)
+        for key in cache.iter_keys(f'{REVOKED_KEY_PREFIX}*'):
+            bloom.add(key[len(REVOKED_KEY_PREFIX):])
+        self.bloom = bloom
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._redis().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(REVOKED_CHANNEL)
+                self.rebuild()
+                self.synced = True
+                rebuild_at = time.time() + self.rebuild_interval
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get('type') == 'message':
+                        jti = message['data']
+                        self.bloom.add(jti.decode() if isinstance(jti, bytes) else jti)
+                    if time.time() >= rebuild_at:
+                        self.rebuild()
+                        rebuild_at = time.time() + self.rebuild_interval
+            except Exception as e:
+                self.synced = False
+                logger.warning(f"token 注销订阅中断, 5 秒后重连: {e}")
+                time.sleep(5)
+
+    def revoke(self, jti, valid_to):
+        """
+        注销 token, 记录保留到 token 过期
+        """
+        if not jti:
+            return
+        self.start()
+        timeout = int((valid_to or time.time() + settings.TOKEN_LIFETIME) - time.time())
+        if timeout <= 0:
+            return
+        cache.set(f'{REVOKED_KEY_PREFIX}{jti}', 1, timeout=timeout)
+        self.bloom.add(jti)
+        connection = self._redis()
+        if connection is not None:
+            connection.publish(REVOKED_CHANNEL, jti)
+
+    def is_revoked(self, jti):
+        if not jti:
+            return False
+        self.start()
+        if self.synced and jti not in self.bloom:
+            return False
+        return cache.get(f'{REVOKED_KEY_PREFIX}{jti}') is not None
+
+
+token_revocation = TokenRevocation(getattr(settings, 'TOKEN_REVOCATION_CAPACITY', 100000))
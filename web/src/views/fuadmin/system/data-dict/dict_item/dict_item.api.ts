@@ -22,6 +22,13 @@ export const getListByCode = (params) => {
   return defHttp.get({ url: DeptApi.prefix + '/by/code', params });
 };
 
+/**
+ * 批量获取字典项 { code: [item] }, 响应带 ETag, 浏览器自动携带 If-None-Match 重新验证
+ */
+export const getListByCodes = (codes: string[] = []) => {
+  return defHttp.get({ url: DeptApi.prefix + '/by/codes', params: { codes: codes.join(',') } });
+};
+
 /**
  * 保存或更新
  */